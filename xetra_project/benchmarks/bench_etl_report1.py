@@ -0,0 +1,182 @@
+"""
+Benchmark of extract, transform_report1 and load against a moto S3 stand-in
+
+Every scale runs in a fresh process so peak RSS is measured per scale; it
+includes the objects held in memory by moto. One
+JSON line per scale is appended to the output file, so results of different
+commits can be compared.
+
+Usage (from the xetra_project directory):
+    python -m benchmarks.bench_etl_report1 --scales 100x60x3 1000x120x3 \
+        --output benchmarks/results_etl_report1.jsonl
+"""
+
+import os
+import json
+import argparse
+import platform
+import subprocess
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+
+import boto3
+from moto import mock_s3
+
+from benchmarks.synthetic import SOURCE_CONFIG, TARGET_CONFIG, generate_xetra_frame
+from xetra.common import instrumentation
+from xetra.common.s3 import S3ConnectorFactory
+from xetra.common.constants import CsvEngine
+from xetra.transformers.xetra_transformer import XetraETL
+
+ENDPOINT_URL = 'https://s3.eu-central-1.amazonaws.com'
+SRC_BUCKET = 'xetra-benchmark-src'
+TRG_BUCKET = 'xetra-benchmark-trg'
+META_KEY = 'meta/report1/xetra_report1_meta_file.csv'
+FIRST_DATE = '2022-12-01'
+STAGES = ('extract', 'transform_report1', 'load',
+          's3.read_csv_to_df', 's3.write_df_to_s3')
+TYPED_DTYPES = {'ISIN': 'category', 'Mnemonic': 'category', 'Date': 'category',
+                'Time': 'category', 'StartPrice': 'float64', 'EndPrice': 'float64',
+                'MinPrice': 'float64', 'MaxPrice': 'float64', 'TradedVolume': 'int64'}
+
+
+def parse_scale(scale: str):
+    """
+    Parse a scale in the format ISINSxMINUTESxDAYS
+
+    :param scale: e.g. 100x60x3
+    """
+    isins, minutes, days = (int(value) for value in scale.split('x'))
+    return isins, minutes, days
+
+
+def shift_date(days: int):
+    """
+    Date a number of days after FIRST_DATE in format %Y-%m-%d
+    """
+    return (datetime.strptime(FIRST_DATE, '%Y-%m-%d') + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def upload_source_files(s3_resource, isins: int, minutes: int, days: int):
+    """
+    Upload synthetic source files in the Xetra layout, one csv file per date and hour
+
+    The first day only serves as previous day of the report.
+
+    returns:
+      source_bytes: total size of the uploaded csv files
+    """
+    source_bytes = 0
+    # Generated day by day to keep the generator out of the measured peak RSS
+    for day in range(days):
+        data_frame = generate_xetra_frame(isins, minutes, 1, first_date=FIRST_DATE, seed=day)
+        date = shift_date(day)
+        data_frame['Date'] = date
+        for hour, data_frame_hour in data_frame.groupby(data_frame['Time'].str[:2]):
+            body = data_frame_hour.to_csv(index=False).encode('utf-8')
+            source_bytes += len(body)
+            s3_resource.Bucket(SRC_BUCKET).put_object(
+                Body=body, Key=f'{date}/{date}_BINS_XETR{hour}.csv')
+    return source_bytes
+
+
+def run_scale(scale: str, workers: int, typed: bool, engine: str):
+    """
+    Run extract, transform_report1 and load for one scale on a mocked S3
+
+    :param scale: scale in the format ISINSxMINUTESxDAYS
+    :param workers: number of concurrent source file reads
+    :param typed: parse the source with explicit dtypes and the pyarrow csv engine
+    :param engine: value of TransformEngine
+
+    returns:
+      result: dictionary with the scale, settings and stage records
+    """
+    isins, minutes, days = parse_scale(scale)
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'KEY1')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'KEY2')
+    with mock_s3():
+        s3_resource = boto3.resource(service_name='s3', endpoint_url=ENDPOINT_URL)
+        for bucket in (SRC_BUCKET, TRG_BUCKET):
+            s3_resource.create_bucket(Bucket=bucket, CreateBucketConfiguration={
+                'LocationConstraint': 'eu-central-1'})
+        source_bytes = upload_source_files(s3_resource, isins, minutes, days)
+
+        factory = S3ConnectorFactory('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY',
+                                     max_pool_connections=max(10, workers))
+        source_config = SOURCE_CONFIG._replace(
+            src_first_extract_date=shift_date(1),
+            src_extract_workers=workers,
+            src_dtypes=TYPED_DTYPES if typed else None,
+            src_csv_engine=CsvEngine.PYARROW.value if typed else CsvEngine.C.value)
+        target_config = TARGET_CONFIG._replace(trg_transform_engine=engine)
+        xetra_etl = XetraETL(factory.connector(ENDPOINT_URL, SRC_BUCKET),
+                             factory.connector(ENDPOINT_URL, TRG_BUCKET),
+                             META_KEY, source_config, target_config)
+        recorder = instrumentation.enable()
+        data_frame = xetra_etl.extract()
+        data_frame = xetra_etl.transform_report1(data_frame)
+        xetra_etl.load(data_frame)
+        records = {record['stage']: record for record in recorder.report()}
+        instrumentation.disable()
+
+    stages = {stage: records[stage] for stage in STAGES if stage in records}
+    for record in stages.values():
+        record['rows_per_s'] = round(record['rows'] / record['wall_time_s'], 1) \
+            if record['wall_time_s'] else None
+    extract_time = stages['extract']['wall_time_s']
+    return {
+        'scale': scale, 'isins': isins, 'minutes_per_day': minutes, 'days': days,
+        'source_rows': isins * minutes * days, 'source_mb': round(source_bytes / 2 ** 20, 2),
+        'workers': workers, 'typed': typed, 'engine': engine,
+        'extract_mb_per_s': round(source_bytes / 2 ** 20 / extract_time, 2),
+        'total_wall_time_s': round(sum(stages[stage]['wall_time_s']
+                                       for stage in ('extract', 'transform_report1', 'load')), 6),
+        'peak_rss_mb': max(record['process_peak_rss_mb'] for record in stages.values()),
+        'stages': stages
+    }
+
+
+def current_commit():
+    """
+    Git commit of the benchmarked tree, None outside a git checkout
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    """
+    Run every scale in its own process and append the results as JSON lines
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the Xetra report 1 ETL.')
+    parser.add_argument('--scales', nargs='+', default=['100x60x3', '1000x120x3'],
+                        help='scales in the format ISINSxMINUTESxDAYS')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--typed', action='store_true')
+    parser.add_argument('--engine', default=TARGET_CONFIG.trg_transform_engine)
+    parser.add_argument('--output', default='benchmarks/results_etl_report1.jsonl')
+    args = parser.parse_args()
+
+    commit = current_commit()
+    context = multiprocessing.get_context('spawn')
+    for scale in args.scales:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_scale, scale, args.workers,
+                                     args.typed, args.engine).result()
+        result = {'commit': commit, 'timestamp': datetime.now().isoformat(timespec='seconds'),
+                  'python': platform.python_version(), **result}
+        with open(args.output, 'a', encoding='utf-8') as output:
+            output.write(json.dumps(result) + '\n')
+        print(f"{scale:>14}: {result['source_rows']:>11,} rows "
+              f"{result['total_wall_time_s']:8.2f} s "
+              f"{result['extract_mb_per_s']:8.2f} MiB/s extract "
+              f"{result['peak_rss_mb']:8.1f} MiB peak RSS")
+
+
+if __name__ == '__main__':
+    main()
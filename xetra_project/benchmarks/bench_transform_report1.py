@@ -0,0 +1,76 @@
+"""
+Benchmark of the transform_report1 aggregation engines
+
+Usage (from the xetra_project directory):
+    python -m benchmarks.bench_transform_report1 --isins 3510 --minutes 570 --days 5
+"""
+
+import argparse
+import time
+from unittest.mock import patch
+
+import pandas as pd
+
+from benchmarks.synthetic import SOURCE_CONFIG, TARGET_CONFIG, generate_xetra_frame
+from xetra.common.constants import TransformEngine
+from xetra.common.meta_process import MetaProcess
+from xetra.transformers.xetra_transformer import XetraETL
+
+
+ENCODED_COLUMNS = {'ISIN': 'category', 'Mnemonic': 'category', 'Date': 'category',
+                   'Time': 'category'}
+
+
+def create_etl(engine: str, extract_date: str, encoded: bool = False):
+    """
+    Create a XetraETL instance without S3 access for the given engine
+
+    :param engine: value of TransformEngine
+    :param extract_date: first date kept in the report
+    :param encoded: keep the categorical key columns in the result
+    """
+    with patch.object(MetaProcess, 'read_meta_file', return_value=pd.DataFrame()), \
+            patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, []]):
+        return XetraETL(None, None, None, SOURCE_CONFIG,
+                        TARGET_CONFIG._replace(trg_transform_engine=engine,
+                                               trg_encoded=encoded))
+
+
+def main():
+    """
+    Time every engine on plain and dictionary encoded synthetic data and
+    check the results are equal
+    """
+    parser = argparse.ArgumentParser(description='Benchmark transform_report1 engines.')
+    parser.add_argument('--isins', type=int, default=3510)
+    parser.add_argument('--minutes', type=int, default=570)
+    parser.add_argument('--days', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    data_frames = {False: generate_xetra_frame(args.isins, args.minutes, args.days)}
+    # Encoded like a source read with src_dtypes, outside of the timing
+    data_frames[True] = data_frames[False].astype(ENCODED_COLUMNS)
+    extract_date = sorted(data_frames[False]['Date'].unique())[min(1, args.days - 1)]
+    print(f'rows: {len(data_frames[False]):,}')
+    results = {}
+    for encoded, data_frame in data_frames.items():
+        for engine in TransformEngine:
+            xetra_etl = create_etl(engine.value, extract_date, encoded)
+            timings = []
+            for _ in range(args.repeat):
+                data_frame_copy = data_frame.copy()
+                start = time.perf_counter()
+                result = xetra_etl.transform_report1(data_frame_copy)
+                timings.append(time.perf_counter() - start)
+            name = f'{engine.value}{" encoded" if encoded else ""}'
+            results[name] = result.astype({'ISIN': str, 'Date': str})
+            print(f'{name:>20}: {min(timings):8.2f} s')
+    reference = results[TransformEngine.DEFAULT.value]
+    for name, result in results.items():
+        if not reference.equals(result):
+            raise AssertionError(f'{name} result differs from the default engine')
+
+
+if __name__ == '__main__':
+    main()
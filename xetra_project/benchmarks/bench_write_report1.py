@@ -0,0 +1,126 @@
+"""
+Benchmark of the compression and row-group layouts of the report 1 output
+
+Every layout serialises the same report 1 DataFrame. Write time, object size
+and the time of reading the object back as a downstream job would are
+compared. The read uses the csv parser of read_csv_to_df or pyarrow parquet,
+once with all columns and once with two columns only.
+
+Usage (from the xetra_project directory):
+    python -m benchmarks.bench_write_report1 --isins 3510 --minutes 10 --days 60 \
+        --output benchmarks/results_write_report1.jsonl
+"""
+
+import json
+import time
+import argparse
+from io import BytesIO
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.bench_etl_report1 import current_commit
+from benchmarks.bench_transform_report1 import create_etl
+from benchmarks.synthetic import TARGET_CONFIG, generate_xetra_frame
+from xetra.common.s3 import WriteOptions, serialize_df, parse_csv
+from xetra.common.constants import S3FileTypes, TransformEngine
+
+LAYOUTS = {
+    'csv': (S3FileTypes.CSV.value, WriteOptions()),
+    'csv gzip': (S3FileTypes.CSV.value, WriteOptions(compression='gzip')),
+    'csv zstd': (S3FileTypes.CSV.value, WriteOptions(compression='zstd')),
+    'parquet snappy': (S3FileTypes.PARQUET.value, WriteOptions()),
+    'parquet none': (S3FileTypes.PARQUET.value, WriteOptions(compression='none')),
+    'parquet gzip': (S3FileTypes.PARQUET.value, WriteOptions(compression='gzip')),
+    'parquet zstd': (S3FileTypes.PARQUET.value, WriteOptions(compression='zstd')),
+    'parquet zstd 9': (S3FileTypes.PARQUET.value,
+                       WriteOptions(compression='zstd', compression_level=9)),
+    'parquet zstd plain': (S3FileTypes.PARQUET.value,
+                           WriteOptions(compression='zstd', use_dictionary=False)),
+    'parquet zstd sorted': (S3FileTypes.PARQUET.value,
+                            WriteOptions(compression='zstd', row_group_size=100_000,
+                                         sort_by=['ISIN', 'Date']))
+}
+READ_COLUMNS = ['ISIN', TARGET_CONFIG.trg_col_clos_price]
+
+
+def create_report(isins: int, minutes: int, days: int):
+    """
+    Create a report 1 DataFrame from synthetic source data
+
+    returns:
+      data_frame: report 1 with isins * (days - 1) rows
+    """
+    data_frame = generate_xetra_frame(isins, minutes, days)
+    extract_date = sorted(data_frame['Date'].unique())[min(1, days - 1)]
+    xetra_etl = create_etl(TransformEngine.SINGLE_PASS.value, extract_date)
+    return xetra_etl.transform_report1(data_frame)
+
+
+def read_body(body: bytes, file_format: str, options: WriteOptions, columns: list = None):
+    """
+    Read a serialised report back like a downstream job
+
+    :param columns: columns to be read, all columns if None
+    """
+    if file_format == S3FileTypes.CSV.value:
+        compression = options.csv_compression.value if options.csv_compression else None
+        return parse_csv(BytesIO(body), usecols=columns, compression=compression)
+    return pd.read_parquet(BytesIO(body), columns=columns)
+
+
+def time_call(function, repeat: int):
+    """
+    Best wall time of repeat calls and the result of the last call
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    """
+    Time every layout and append the results as JSON lines
+    """
+    parser = argparse.ArgumentParser(description='Benchmark report 1 output layouts.')
+    parser.add_argument('--isins', type=int, default=3510)
+    parser.add_argument('--minutes', type=int, default=10)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    data_frame = create_report(args.isins, args.minutes, args.days)
+    print(f'report rows: {len(data_frame):,}')
+    commit = current_commit()
+    for name, (file_format, options) in LAYOUTS.items():
+        write_time, body = time_call(
+            lambda file_format=file_format, options=options:
+            serialize_df(data_frame, file_format, options), args.repeat)
+        read_time, df_result = time_call(
+            lambda body=body, file_format=file_format, options=options:
+            read_body(body, file_format, options), args.repeat)
+        read_columns_time, _ = time_call(
+            lambda body=body, file_format=file_format, options=options:
+            read_body(body, file_format, options, READ_COLUMNS), args.repeat)
+        if len(df_result) != len(data_frame):
+            raise AssertionError(f'{name} read {len(df_result)} of {len(data_frame)} rows')
+        result = {'layout': name, 'format': file_format, 'options': options._asdict(),
+                  'rows': len(data_frame), 'size_mb': round(len(body) / 2 ** 20, 3),
+                  'write_s': round(write_time, 4), 'read_s': round(read_time, 4),
+                  'read_columns_s': round(read_columns_time, 4)}
+        print(f"{name:>20}: {result['size_mb']:8.2f} MiB  write {write_time:7.3f} s  "
+              f"read {read_time:7.3f} s  read {len(READ_COLUMNS)} columns "
+              f"{read_columns_time:7.3f} s")
+        if args.output:
+            result = {'commit': commit,
+                      'timestamp': datetime.now().isoformat(timespec='seconds'), **result}
+            with open(args.output, 'a', encoding='utf-8') as output:
+                output.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Peak memory of S3BucketConnector.read_csv_to_df measured with memory_profiler
+
+Compares the former read path (body bytes -> decoded str -> StringIO -> parser)
+with the streaming read path of read_csv_to_df on a moto bucket.
+
+Usage (from the xetra_project directory):
+    python -m benchmarks.mprof_read_csv --isins 2000 --minutes 60
+"""
+
+import argparse
+import gc
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+
+import boto3
+import pandas as pd
+from memory_profiler import memory_usage
+from moto import mock_s3
+
+from benchmarks.synthetic import generate_xetra_frame
+from xetra.common.s3 import S3BucketConnector
+
+BUCKET = 'mprof-bucket'
+KEY = '2022-12-01/2022-12-01_BINS_XETR08.csv'
+
+
+def read_csv_decoded(s3_resource, key: str):
+    """
+    Former read path of read_csv_to_df holding bytes, str and StringIO copies
+    """
+    csv_obj = s3_resource.Object(BUCKET, key).get().get('Body').read().decode('utf-8')
+    return pd.read_csv(StringIO(csv_obj))
+
+
+def peak_increment(func, *args):
+    """
+    Peak memory in MiB above the memory before calling func
+    """
+    baseline = memory_usage(-1, interval=0.01, timeout=0.1, max_usage=True)
+    peak = memory_usage((func, args), interval=0.01, max_usage=True)
+    return peak - baseline
+
+
+def measure(path: str, isins: int, minutes: int):
+    """
+    Upload one synthetic source file to moto and measure the peak memory of a read path
+
+    :param path: 'decoded' or 'streamed'
+    :param isins: number of ISINs in the file
+    :param minutes: number of minutes in the file
+
+    returns:
+      size: object size in MiB
+      peak: peak memory increment in MiB
+    """
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'KEY1')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'KEY2')
+    with mock_s3():
+        s3_resource = boto3.resource(service_name='s3', region_name='us-east-1')
+        s3_resource.create_bucket(Bucket=BUCKET)
+        csv_content = generate_xetra_frame(isins, minutes, 1)\
+            .to_csv(index=False).encode('utf-8')
+        s3_resource.Bucket(BUCKET).put_object(Body=csv_content, Key=KEY)
+        del csv_content
+        gc.collect()
+        s3_bucket = S3BucketConnector('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY',
+                                      None, BUCKET)
+        size = s3_resource.Object(BUCKET, KEY).content_length / 2 ** 20
+        if path == 'decoded':
+            return size, peak_increment(read_csv_decoded, s3_resource, KEY)
+        return size, peak_increment(s3_bucket.read_csv_to_df, KEY)
+
+
+def main():
+    """
+    Measure both read paths, each in a fresh process so freed memory is not reused
+    """
+    parser = argparse.ArgumentParser(description='Peak memory of the csv read paths.')
+    parser.add_argument('--isins', type=int, default=2000)
+    parser.add_argument('--minutes', type=int, default=60)
+    args = parser.parse_args()
+
+    for path in ['decoded', 'streamed']:
+        with ProcessPoolExecutor(max_workers=1,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            size, peak = executor.submit(measure, path, args.isins, args.minutes).result()
+        print(f'{path:>8}: {peak:8.1f} MiB peak for a {size:.1f} MiB object')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Synthetic Xetra source data for benchmarks
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from xetra.transformers.xetra_transformer import XetraSourceConfig, XetraTargetConfig
+
+SRC_COLUMNS = ['ISIN', 'Mnemonic', 'Date', 'Time', 'StartPrice',
+               'EndPrice', 'MinPrice', 'MaxPrice', 'TradedVolume']
+SOURCE_CONFIG = XetraSourceConfig(
+    src_first_extract_date='2022-12-01', src_columns=SRC_COLUMNS, src_col_date='Date',
+    src_col_isin='ISIN', src_col_time='Time', src_col_start_price='StartPrice',
+    src_col_min_price='MinPrice', src_col_max_price='MaxPrice',
+    src_col_traded_vol='TradedVolume')
+TARGET_CONFIG = XetraTargetConfig(
+    trg_col_date='date', trg_col_isin='isin', trg_col_op_price='opening_price_eur',
+    trg_col_clos_price='closing_price_eur', trg_col_min_price='minimum_price_eur',
+    trg_col_max_price='maximum_price_eur', trg_col_dail_trad_vol='daily_traded_volume',
+    trg_col_ch_prev_clos='change_prev_closing_%', trg_key='report1/xetra_daily_report1_',
+    trg_key_date_format='%Y%m%d_%H%M%S', trg_format='parquet')
+
+
+def generate_xetra_frame(isin_count: int, minutes_per_day: int, days: int,
+                         first_date: str = '2022-12-01', seed: int = 0):
+    """
+    Create a DataFrame shaped like concatenated Xetra source files
+
+    Rows are ordered by date and time and hold one row per ISIN and minute.
+
+    :param isin_count: number of distinct ISINs
+    :param minutes_per_day: number of trading minutes per day, starting 08:00
+    :param days: number of consecutive days starting with first_date
+    :param first_date: first date in format %Y-%m-%d
+    :param seed: seed of the random number generator
+
+    returns:
+      data_frame: Pandas DataFrame with the Xetra source columns
+    """
+    rng = np.random.default_rng(seed)
+    start = datetime.strptime(first_date, '%Y-%m-%d')
+    dates = np.array([(start + timedelta(days=day)).strftime('%Y-%m-%d')
+                      for day in range(days)], dtype=object)
+    times = np.array([f'{8 + minute // 60:02d}:{minute % 60:02d}'
+                      for minute in range(minutes_per_day)], dtype=object)
+    isins = np.array([f'DE{number:010d}' for number in range(isin_count)], dtype=object)
+    rows = isin_count * minutes_per_day * days
+    start_price = rng.uniform(5, 500, rows).round(2)
+    spread = rng.uniform(0, 1, rows).round(2)
+    return pd.DataFrame({
+        'ISIN': np.tile(isins, minutes_per_day * days),
+        'Mnemonic': np.tile(np.array([f'M{number}' for number in range(isin_count)],
+                                     dtype=object), minutes_per_day * days),
+        'Date': np.repeat(dates, isin_count * minutes_per_day),
+        'Time': np.tile(np.repeat(times, isin_count), days),
+        'StartPrice': start_price,
+        'EndPrice': (start_price + spread).round(2),
+        'MinPrice': (start_price - spread).round(2),
+        'MaxPrice': (start_price + 2 * spread).round(2),
+        'TradedVolume': rng.integers(1, 10000, rows)
+    }, columns=SRC_COLUMNS)
@@ -0,0 +1,47 @@
+"""
+Run the compaction of the Xetra report 1 objects
+"""
+
+import argparse
+import logging
+import logging.config
+import yaml
+
+from run import create_connectors
+from xetra.common import instrumentation
+from xetra.transformers.xetra_transformer import XetraSourceConfig, XetraTargetConfig
+from xetra.transformers.xetra_compactor import XetraCompactor, XetraCompactionConfig
+
+
+def main():
+    """
+    Entry point to compact the report objects written by the xetra ETL job.
+    """
+
+    # Parse YAML file as an argument object, the same file as for run.py
+    parser = argparse.ArgumentParser(description='Compact the Xetra report 1 objects.')
+    parser.add_argument('config', help='A configuration file in YAML format.')
+    args = parser.parse_args()
+    config = yaml.safe_load(open(args.config, encoding="utf8"))
+
+    # Configure and create instance of logging.
+    logging.config.dictConfig(config['logging'])
+    logger = logging.getLogger(__name__)
+
+    # Enable optional instrumentation of the compaction
+    instrumentation_config = config.get('instrumentation', {})
+    if instrumentation_config.get('enabled'):
+        instrumentation.enable(output_path=instrumentation_config.get('output_path'))
+
+    logger.info('Xetra compaction job started.')
+    _, s3_bucket_trg = create_connectors(config['S3'])
+    xetra_compactor = XetraCompactor(s3_bucket_trg, XetraSourceConfig(**config['source']),
+                                     XetraTargetConfig(**config['target']),
+                                     XetraCompactionConfig(**config.get('compaction', {})))
+    xetra_compactor.compact()
+    logger.info('Xetra compaction job finished.')
+    instrumentation.report()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,133 @@
 Run the Xetra ETL application
 """
 
+import os
 import argparse
 import logging
 import logging.config
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import yaml
 
-from xetra.common.s3 import S3BucketConnector
+from xetra.common.s3 import S3ConnectorFactory
+from xetra.common.local import LocalBucketConnector
+from xetra.common.constants import ConnectorType
+from xetra.common import instrumentation
+from xetra.common.cache import LocalObjectCache
+from xetra.common.fetch import ResilientFetcher
+from xetra.common.lease import DateLeaseStore
 from xetra.transformers.xetra_transformer import XetraETL, XetraSourceConfig, XetraTargetConfig
+from xetra.transformers.xetra_multi_report import XetraMultiReportETL, XetraReportConfig
+
+def create_connectors(s3_config: dict):
+    """
+    Create the source and target bucket connectors from the S3 configuration
+
+    :param s3_config: S3 block of the configuration file
+
+    returns:
+      s3_bucket_src: connector to the source bucket
+      s3_bucket_trg: connector to the target bucket
+    """
+    if s3_config.get('connector', ConnectorType.S3.value) == ConnectorType.LOCAL.value:
+        # Local mirrors of the buckets, one directory per bucket below local_root
+        s3_bucket_src = LocalBucketConnector(root_dir=s3_config['local_root'],
+                                             bucket=s3_config['src_bucket'])
+        s3_bucket_trg = LocalBucketConnector(root_dir=s3_config['local_root'],
+                                             bucket=s3_config['trg_bucket'])
+        return s3_bucket_src, s3_bucket_trg
+
+    # Create optional local cache for the immutable source files
+    src_cache = None
+    if s3_config.get('src_cache_dir'):
+        src_cache = LocalObjectCache(cache_dir=s3_config['src_cache_dir'],
+                                     max_size_mb=s3_config['src_cache_size_mb'])
+
+    # Create optional retries and hedged requests for the GETs of both connectors
+    fetcher = None
+    if s3_config.get('fetch'):
+        fetcher = ResilientFetcher(**s3_config['fetch'])
+
+    # Create S3Bucket connector classes for source and target sharing one session
+    s3_factory = S3ConnectorFactory(access_key=s3_config['access_key'],
+                                    secret_key=s3_config['secret_key'],
+                                    max_pool_connections=s3_config.get('max_pool_connections', 10),
+                                    connect_timeout=s3_config.get('connect_timeout', 60),
+                                    read_timeout=s3_config.get('read_timeout', 60),
+                                    tcp_keepalive=s3_config.get('tcp_keepalive', False))
+    s3_bucket_src = s3_factory.connector(endpoint_url=s3_config['src_endpoint_url'],
+                                         bucket=s3_config['src_bucket'],
+                                         cache=src_cache,
+                                         fetcher=fetcher)
+    s3_bucket_trg = s3_factory.connector(endpoint_url=s3_config['trg_endpoint_url'],
+                                         bucket=s3_config['trg_bucket'],
+                                         fetcher=fetcher)
+    return s3_bucket_src, s3_bucket_trg
+
+
+def create_xetra_etl(config: dict):
+    """
+    Create the XetraETL instance of report 1 from the configuration
+
+    :param config: parsed configuration file
+    """
+    s3_bucket_src, s3_bucket_trg = create_connectors(config['S3'])
+    return XetraETL(s3_bucket_src, s3_bucket_trg, config['meta']['meta_key'],
+                    XetraSourceConfig(**config['source']), XetraTargetConfig(**config['target']))
+
+
+def run_backfill_shard(config: dict, first_date: str, last_date: str):
+    """
+    Run report 1 for one backfill shard, executed in a worker process
+
+    :param config: parsed configuration file
+    :param first_date: first date of the shard
+    :param last_date: last date of the shard
+    """
+    logging.config.dictConfig(config['logging'])
+    return create_xetra_etl(config).etl_report1_shard(first_date, last_date)
+
+
+def run_backfill(config: dict):
+    """
+    Run report 1 for all missing dates as date shards on a process pool and
+    merge the meta updates of all shards at the end
+
+    :param config: parsed configuration file
+    """
+    logger = logging.getLogger(__name__)
+    backfill_config = config.get('backfill', {})
+    xetra_etl = create_xetra_etl(config)
+    shards = xetra_etl.backfill_shards(backfill_config.get('shard_days', 30))
+    workers = backfill_config.get('workers') or os.cpu_count()
+    logger.info('Xetra backfill of %s shards with %s worker processes started.',
+                len(shards), workers)
+    # Fresh interpreters, boto3 sessions must not be inherited through fork
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        shard_results = list(executor.map(run_backfill_shard,
+                                          [config] * len(shards),
+                                          [first_date for first_date, _ in shards],
+                                          [last_date for _, last_date in shards]))
+    # Only reached if every shard succeeded
+    xetra_etl.merge_backfill_shards(shard_results)
+
+
+def run_coordinated(config: dict):
+    """
+    Run report 1 as one of several workers sharing the missing dates, the date
+    shards are claimed through lease objects in the target bucket
+
+    :param config: parsed configuration file
+    """
+    coordination_config = config.get('coordination', {})
+    xetra_etl = create_xetra_etl(config)
+    lease_store = DateLeaseStore(xetra_etl.s3_bucket_trg,
+                                 lease_prefix=coordination_config['lease_prefix'],
+                                 lease_ttl_s=coordination_config.get('lease_ttl_s', 3600),
+                                 worker_id=coordination_config.get('worker_id'))
+    xetra_etl.etl_report1_coordinated(lease_store, coordination_config.get('shard_days', 7))
+
 
 def main():
     """
@@ -18,6 +138,11 @@ def main():
     # Parse YAML file as an argument object
     parser = argparse.ArgumentParser(description='Run the Xetra ETL Job.')
     parser.add_argument('config', help='A configuration file in YAML format.')
+    parser.add_argument('--backfill', action='store_true',
+                        help='Process the missing dates as date shards on a process pool.')
+    parser.add_argument('--coordinated', action='store_true',
+                        help='Process the date shards claimed by this worker out of several '
+                             'workers sharing the target bucket.')
     args = parser.parse_args()
 
 #   config_path = '/Users/macbook/Documents/Github/Data-Engineering/xetra_project/configs/xetra_report1_config.yml'
@@ -32,36 +157,34 @@ def main():
     logging.config.dictConfig(log_config)
     logger = logging.getLogger(__name__)
 
-    # Read S3 configuration
-    s3_config = config['S3']
-
-    # Create S3Bucket connector classes for source and target
-    s3_bucket_src = S3BucketConnector(access_key=s3_config['access_key'],
-                                      secret_key=s3_config['secret_key'],
-                                      endpoint_url=s3_config['src_endpoint_url'],
-                                      bucket=s3_config['src_bucket'])
-    s3_bucket_trg = S3BucketConnector(access_key=s3_config['access_key'],
-                                      secret_key=s3_config['secret_key'],
-                                      endpoint_url=s3_config['trg_endpoint_url'],
-                                      bucket=s3_config['trg_bucket'])
-
-    # Read source configuration
-    source_config = XetraSourceConfig(**config['source'])
+    # Enable optional instrumentation of the ETL stages
+    instrumentation_config = config.get('instrumentation', {})
+    if instrumentation_config.get('enabled'):
+        instrumentation.enable(output_path=instrumentation_config.get('output_path'))
 
-    # Read target configuration
-    target_config = XetraTargetConfig(**config['target'])
-
-    # Read meta file configuration
-    meta_config = config['meta']
-
-    # Create instance of XetraETL class
     logger.info('Xetra ETL job started.')
-    xetra_etl = XetraETL(s3_bucket_src, s3_bucket_trg,
-                         meta_config['meta_key'], source_config, target_config)
-
-    # Run etl job for xetra report 1
-    xetra_etl.etl_report1()
+    if args.backfill:
+        run_backfill(config)
+    elif args.coordinated:
+        run_coordinated(config)
+    elif config.get('reports'):
+        # Several reports sharing one extract, each overriding the target configuration
+        s3_bucket_src, s3_bucket_trg = create_connectors(config['S3'])
+        target_config = XetraTargetConfig(**config['target'])
+        report_configs = [XetraReportConfig(report=report['report'],
+                                            meta_key=report['meta_key'],
+                                            trg_args=target_config._replace(
+                                                **report.get('target', {})))
+                          for report in config['reports']]
+        xetra_etl = XetraMultiReportETL(s3_bucket_src, s3_bucket_trg,
+                                        XetraSourceConfig(**config['source']), report_configs)
+        xetra_etl.etl_reports()
+    else:
+        # Create instance of XetraETL class and run etl job for xetra report 1
+        xetra_etl = create_xetra_etl(config)
+        xetra_etl.etl_report1()
     logger.info('Xetra ETL job finished.')
+    instrumentation.report()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,80 @@
+"""
+TestLocalObjectCacheMethods
+"""
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+
+from xetra.common.cache import LocalObjectCache
+
+
+class TestLocalObjectCacheMethods(unittest.TestCase):
+    """
+    Testing the LocalObjectCache class
+    """
+
+    def setUp(self):
+        """
+        Set up the environment
+        """
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = LocalObjectCache(self.cache_dir, max_size_mb=1)
+
+    def test_get_put(self):
+        """
+        Test a miss, a put and a hit for the same ETag and a miss for a new ETag
+        """
+        # Expected results
+        content_exp = b'col1,col2\nval1,val2'
+
+        # Method execution
+        path_miss = self.cache.get('bucket', 'key.csv', '"etag1"')
+        with self.cache.put('bucket', 'key.csv', '"etag1"', BytesIO(content_exp)) as cached_put:
+            content_put = cached_put.read()
+            path_put = cached_put.name
+        path_hit = self.cache.get('bucket', 'key.csv', '"etag1"')
+        path_new_etag = self.cache.get('bucket', 'key.csv', '"etag2"')
+
+        # Test after method execution
+        self.assertIsNone(path_miss)
+        self.assertEqual(content_exp, content_put)
+        self.assertEqual(path_put, path_hit)
+        self.assertIsNone(path_new_etag)
+        with open(path_hit, 'rb') as cached_file:
+            self.assertEqual(content_exp, cached_file.read())
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(2, self.cache.misses)
+
+    def test_put_evicts_least_recently_used(self):
+        """
+        Test the least recently used entry is evicted above the size cap
+        """
+        # Test init
+        content = b'x' * 400 * 1024
+        for key in ['a', 'b']:
+            self.cache.put('bucket', key, 'etag', BytesIO(content)).close()
+            time.sleep(0.01)
+        # Touch a, so b becomes least recently used
+        self.cache.get('bucket', 'a', 'etag')
+
+        # Method execution
+        with self.cache.put('bucket', 'c', 'etag', BytesIO(content)) as cached_c:
+            content_c = cached_c.read()
+
+        # Test after method execution
+        self.assertTrue(os.path.exists(self.cache.entry_path('bucket', 'a', 'etag')))
+        self.assertFalse(os.path.exists(self.cache.entry_path('bucket', 'b', 'etag')))
+        self.assertTrue(os.path.exists(self.cache.entry_path('bucket', 'c', 'etag')))
+        self.assertEqual(content, content_c)
+
+    def tearDown(self):
+        """
+        Execute after unit tests
+        """
+        shutil.rmtree(self.cache_dir)
+
+if __name__ == "__main__":
+    unittest.main()
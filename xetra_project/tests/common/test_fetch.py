@@ -0,0 +1,126 @@
+"""
+TestResilientFetcherMethods
+"""
+import time
+import unittest
+
+from botocore.exceptions import ClientError
+
+from xetra.common.fetch import ResilientFetcher, is_retryable
+
+
+class FaultyRequest():
+    """
+    Stand-in for a GET injecting errors and delays into its first calls
+    """
+
+    def __init__(self, faults: list, response: bytes = b'col1\n1\n'):
+        """
+        :param faults: per call an error code to raise, a delay in seconds or None
+        :param response: returned once the call is not faulted
+        """
+        self.faults = list(faults)
+        self.response = response
+        self.calls = 0
+
+    def __call__(self):
+        fault = self.faults[self.calls] if self.calls < len(self.faults) else None
+        self.calls += 1
+        if isinstance(fault, str):
+            raise ClientError({'Error': {'Code': fault, 'Message': fault}}, 'GetObject')
+        if fault:
+            time.sleep(fault)
+        return self.response
+
+
+class TestResilientFetcherMethods(unittest.TestCase):
+    """
+    Testing the ResilientFetcher class
+    """
+
+    def setUp(self):
+        """
+        Set up the environment
+        """
+        self.fetcher = ResilientFetcher(max_attempts=3, base_delay_s=0.001, max_delay_s=0.01)
+
+    def test_fetch_retries(self):
+        """
+        Tests that throttling and server errors are retried with backoff
+        """
+        # Test init
+        request = FaultyRequest(['SlowDown', '503'])
+        # Method execution
+        with self.assertLogs() as logm:
+            result = self.fetcher.fetch(request)
+        # Test after method execution
+        self.assertEqual(b'col1\n1\n', result)
+        self.assertEqual(3, request.calls)
+        self.assertEqual(2, self.fetcher.stats['retries'])
+        self.assertEqual(2, self.fetcher.stats['errors'])
+        self.assertIn('Attempt 1 of 3 failed', logm.output[0])
+
+    def test_fetch_fails(self):
+        """
+        Tests that other errors and exhausted attempts are raised
+        """
+        # Test init
+        request_missing = FaultyRequest(['NoSuchKey'])
+        request_throttled = FaultyRequest(['SlowDown'] * 3)
+        # Method execution and test after method execution
+        with self.assertRaises(ClientError):
+            self.fetcher.fetch(request_missing)
+        with self.assertRaises(ClientError):
+            self.fetcher.fetch(request_throttled)
+        self.assertEqual(1, request_missing.calls)
+        self.assertEqual(3, request_throttled.calls)
+        self.assertEqual(2, self.fetcher.stats['failures'])
+        self.assertTrue(is_retryable(ConnectionResetError()))
+        self.assertFalse(is_retryable(ValueError()))
+
+    def test_fetch_hedged(self):
+        """
+        Tests that a slow attempt gets a hedged duplicate once enough latencies
+        are recorded and the latencies appear in the histogram
+        """
+        # Test init
+        fetcher = ResilientFetcher(hedge_percentile=50, hedge_min_samples=5)
+        for _ in range(5):
+            fetcher.fetch(FaultyRequest([]))
+        request = FaultyRequest([2.0])
+        # Method execution
+        start = time.perf_counter()
+        result = fetcher.fetch(request)
+        elapsed = time.perf_counter() - start
+        with self.assertLogs() as logm:
+            stats = fetcher.log_histogram()
+        # Test after method execution
+        self.assertEqual(b'col1\n1\n', result)
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(2, request.calls)
+        self.assertEqual((1, 1), (stats['hedges'], stats['hedge_wins']))
+        self.assertEqual(6, stats['histogram']['<=10ms'])
+        self.assertIn('Fetch latency per attempt: <=10ms: 6', logm.output[0])
+
+    def test_fetch_hedged_fails(self):
+        """
+        Tests that a hedged attempt failing with an error that is not retryable is
+        raised at once instead of waiting for the slow attempt
+        """
+        # Test init
+        fetcher = ResilientFetcher(hedge_percentile=50, hedge_min_samples=5)
+        for _ in range(5):
+            fetcher.fetch(FaultyRequest([]))
+        request = FaultyRequest([2.0, 'NoSuchKey'])
+        # Method execution and test after method execution
+        start = time.perf_counter()
+        with self.assertRaises(ClientError):
+            fetcher.fetch(request)
+        self.assertLess(time.perf_counter() - start, 1.0)
+        with self.assertRaises(ValueError):
+            fetcher.fetch(lambda: int('x'))
+        self.assertEqual(1, fetcher.stats['failures'])
+
+
+if __name__ == '__main__':
+    unittest.main()
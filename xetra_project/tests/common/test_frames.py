@@ -0,0 +1,45 @@
+"""
+TestFramesMethods
+"""
+import unittest
+
+import pandas as pd
+
+from xetra.common.frames import concat_frames
+
+class TestFramesMethods(unittest.TestCase):
+    """
+    Testing the methods combining DataFrames
+    """
+
+    def test_concat_frames_categorical(self):
+        """
+        Tests that concat_frames keeps categorical columns with the sorted union of
+        the categories and leaves mixed columns to pandas
+        """
+        # Test init
+        df_first = pd.DataFrame({'isin': pd.Categorical(['DE1', 'AT1']),
+                                 'date': pd.Categorical(['2022-12-17', '2022-12-17']),
+                                 'price': [1.5, 2.5]})
+        df_second = pd.DataFrame({'isin': pd.Categorical(['CH1']),
+                                  'date': ['2022-12-18'],
+                                  'price': [3.5]})
+        # Method execution
+        df_result = concat_frames([df_first, df_second])
+        # Test after method execution
+        self.assertEqual(['AT1', 'CH1', 'DE1'], list(df_result['isin'].cat.categories))
+        self.assertEqual(['DE1', 'AT1', 'CH1'], list(df_result['isin']))
+        self.assertEqual(object, df_result['date'].dtype)
+        self.assertEqual([1.5, 2.5, 3.5], list(df_result['price']))
+
+    def test_concat_frames_empty(self):
+        """
+        Tests that concat_frames returns an empty DataFrame for no DataFrames
+        """
+        # Method execution
+        df_result = concat_frames([])
+        # Test after method execution
+        self.assertTrue(df_result.empty)
+
+if __name__ == '__main__':
+    unittest.main()
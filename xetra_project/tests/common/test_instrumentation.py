@@ -0,0 +1,89 @@
+"""
+TestInstrumentationMethods
+"""
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from xetra.common import instrumentation
+
+
+@instrumentation.instrument('outer')
+def outer_stage(rows: int):
+    """
+    Stage counting rows and calling a nested stage
+    """
+    instrumentation.count(rows=rows)
+    return inner_stage()
+
+
+@instrumentation.instrument('inner')
+def inner_stage():
+    """
+    Stage counting bytes
+    """
+    instrumentation.count(bytes_read=10, bytes_written=5)
+    return True
+
+
+class TestInstrumentationMethods(unittest.TestCase):
+    """
+    Testing the instrumentation module
+    """
+
+    def setUp(self):
+        """
+        Set up the environment
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.output_path = os.path.join(self.tmp_dir, 'instrumentation.json')
+
+    def test_instrument_enabled(self):
+        """
+        Tests the stage records and JSON file of an enabled instrumentation
+        """
+        # Test init
+        instrumentation.enable(output_path=self.output_path)
+        # Method execution
+        outer_stage(3)
+        outer_stage(4)
+        with self.assertLogs() as logm:
+            records = instrumentation.report()
+        # Test after method execution
+        stages = {record['stage']: record for record in records}
+        self.assertEqual(2, stages['outer']['calls'])
+        self.assertEqual(7, stages['outer']['rows'])
+        self.assertEqual(20, stages['outer']['bytes_read'])
+        self.assertEqual(10, stages['outer']['bytes_written'])
+        self.assertEqual(20, stages['inner']['bytes_read'])
+        self.assertEqual(10, stages['inner']['bytes_written'])
+        self.assertGreater(stages['inner']['process_peak_rss_mb'], 0)
+        self.assertGreaterEqual(stages['outer']['wall_time_s'], stages['inner']['wall_time_s'])
+        self.assertIn('Stage outer:', logm.output[1])
+        self.assertEqual(stages['outer'], logm.records[1].instrumentation)
+        with open(self.output_path, encoding='utf-8') as output:
+            self.assertEqual(records, json.load(output))
+
+    def test_instrument_disabled(self):
+        """
+        Tests that a disabled instrumentation records nothing
+        """
+        # Method execution
+        result = outer_stage(3)
+        # Test after method execution
+        self.assertTrue(result)
+        self.assertIsNone(instrumentation.report())
+        self.assertFalse(os.path.exists(self.output_path))
+
+    def tearDown(self):
+        """
+        Executing after unittests
+        """
+        instrumentation.disable()
+        shutil.rmtree(self.tmp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+TestDateLeaseStoreMethods
+"""
+import os
+import unittest
+from unittest.mock import patch
+
+import boto3
+from botocore.exceptions import ClientError
+from moto import mock_s3
+
+from xetra.common.s3 import S3BucketConnector
+from xetra.common.lease import DateLeaseStore
+from xetra.common.constants import LeaseState
+
+def enforce_put_preconditions(s3_bucket_connector: S3BucketConnector):
+    """
+    Reject conditional PutObject requests with a failed precondition like S3,
+    moto does not evaluate If-None-Match and If-Match on PutObject
+    """
+    client = s3_bucket_connector._bucket.meta.client
+
+    def check_preconditions(params, context, **kwargs):
+        conditions = dict(context.get('conditional_headers', {}))
+        conditions.update({header: params[name] for name, header in
+                           {'IfNoneMatch': 'If-None-Match', 'IfMatch': 'If-Match'}.items()
+                           if name in params})
+        if not conditions:
+            return
+        try:
+            etag = client.head_object(Bucket=params['Bucket'], Key=params['Key'])['ETag']
+        except ClientError:
+            etag = None
+        if ('If-None-Match' in conditions and etag is not None) \
+                or ('If-Match' in conditions and conditions['If-Match'] != etag):
+            raise ClientError({'Error': {'Code': 'PreconditionFailed'},
+                               'ResponseMetadata': {'HTTPStatusCode': 412}}, 'PutObject')
+
+    client.meta.events.register('before-parameter-build.s3.PutObject', check_preconditions)
+
+
+class TestDateLeaseStoreMethods(unittest.TestCase):
+    """
+    Testing the DateLeaseStore class
+    """
+
+    def setUp(self):
+        """
+        Set up the environment
+        """
+        # Mocking s3 connection start
+        self.mock_s3 = mock_s3()
+        self.mock_s3.start()
+        # Defining the class arguments
+        self.s3_access_key = 'AWS_ACCESS_KEY_ID'
+        self.s3_secret_key = 'AWS_SECRET_ACCESS_KEY'
+        self.s3_endpoint_url = 'https://s3.eu-central-1.amazonaws.com'
+        self.s3_bucket_name = 'test-bucket'
+        # Creating s3 access keys as environment variables
+        os.environ[self.s3_access_key] = 'KEY1'
+        os.environ[self.s3_secret_key] = 'KEY2'
+        # Creating a bucket on the mocked s3
+        self.s3 = boto3.resource(service_name='s3', endpoint_url=self.s3_endpoint_url)
+        self.s3.create_bucket(Bucket=self.s3_bucket_name,
+                              CreateBucketConfiguration={
+                                  'LocationConstraint': 'eu-central-1'})
+        self.s3_bucket_connector = S3BucketConnector(self.s3_access_key,
+                                                     self.s3_secret_key,
+                                                     self.s3_endpoint_url,
+                                                     self.s3_bucket_name)
+        enforce_put_preconditions(self.s3_bucket_connector)
+        self.lease_prefix = 'leases/'
+        self.lease_store_a = DateLeaseStore(self.s3_bucket_connector, self.lease_prefix,
+                                            worker_id='worker-a')
+        self.lease_store_b = DateLeaseStore(self.s3_bucket_connector, self.lease_prefix,
+                                            worker_id='worker-b')
+
+    def test_claim_held_and_done(self):
+        """
+        Tests that a held lease and a done lease covering the dates are not claimed
+        again, but a done lease is claimed for later dates of the shard
+        """
+        # Method execution
+        lease_a = self.lease_store_a.claim('2022-12-15_2022-12-21', '2022-12-15', '2022-12-17')
+        lease_b_held = self.lease_store_b.claim('2022-12-15_2022-12-21', '2022-12-15',
+                                                '2022-12-17')
+        lease_a = self.lease_store_a.complete(lease_a)
+        lease_b_done = self.lease_store_b.claim('2022-12-15_2022-12-21', '2022-12-15',
+                                                '2022-12-17')
+        lease_b_later = self.lease_store_b.claim('2022-12-15_2022-12-21', '2022-12-18',
+                                                 '2022-12-18')
+        lease_body = self.s3_bucket_connector.read_json_from_s3(
+            'leases/2022-12-15_2022-12-21.json')
+        # Test after method execution
+        self.assertEqual('leases/2022-12-15_2022-12-21.json', lease_a.key)
+        self.assertIsNone(lease_b_held)
+        self.assertIsNone(lease_b_done)
+        self.assertEqual(('2022-12-18', '2022-12-18'),
+                         (lease_b_later.first_date, lease_b_later.last_date))
+        self.assertEqual(('worker-b', LeaseState.HELD.value),
+                         (lease_body['owner'], lease_body['state']))
+
+    def test_claim_expired_and_released(self):
+        """
+        Tests that expired and released leases are taken over and that the former
+        holder can no longer complete its lease
+        """
+        # Test init
+        lease_store_expiring = DateLeaseStore(self.s3_bucket_connector, self.lease_prefix,
+                                              lease_ttl_s=-1, worker_id='worker-a')
+        # Method execution
+        lease_expired = lease_store_expiring.claim('2022-12-15_2022-12-21', '2022-12-15',
+                                                   '2022-12-21')
+        lease_taken_over = self.lease_store_b.claim('2022-12-15_2022-12-21', '2022-12-15',
+                                                    '2022-12-21')
+        lease_completed = lease_store_expiring.complete(lease_expired)
+        lease_released = self.lease_store_a.claim('2022-12-22_2022-12-28', '2022-12-22',
+                                                  '2022-12-28')
+        self.lease_store_a.release(lease_released)
+        lease_after_release = self.lease_store_b.claim('2022-12-22_2022-12-28', '2022-12-22',
+                                                       '2022-12-28')
+        # Test after method execution
+        self.assertIsNotNone(lease_taken_over)
+        self.assertIsNone(lease_completed)
+        self.assertIsNotNone(lease_after_release)
+        self.assertEqual('worker-b', self.s3_bucket_connector.read_json_from_s3(
+            'leases/2022-12-15_2022-12-21.json')['owner'])
+
+    def test_claim_lost_race(self):
+        """
+        Tests that of two workers reading a missing lease only the first writer gets the lease
+        """
+        # Test init
+        missing = self.s3_bucket_connector.exceptions.NoSuchKey(
+            {'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+        # Method execution
+        lease_b = self.lease_store_b.claim('2022-12-15_2022-12-21', '2022-12-15', '2022-12-21')
+        with patch.object(self.s3_bucket_connector, 'read_object_with_etag',
+                          side_effect=missing):
+            lease_a = self.lease_store_a.claim('2022-12-15_2022-12-21', '2022-12-15',
+                                               '2022-12-21')
+        # Test after method execution
+        self.assertIsNotNone(lease_b)
+        self.assertIsNone(lease_a)
+        self.assertEqual('worker-b', self.s3_bucket_connector.read_json_from_s3(
+            'leases/2022-12-15_2022-12-21.json')['owner'])
+
+    def tearDown(self):
+        """
+        Execute after unit tests
+        """
+        # Mocking s3 connection stop
+        self.mock_s3.stop()
+
+if __name__ == '__main__':
+    unittest.main()
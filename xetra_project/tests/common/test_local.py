@@ -0,0 +1,168 @@
+"""
+TestLocalBucketConnectorMethods
+"""
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from xetra.common.local import LocalBucketConnector
+from xetra.common.meta_process import MetaProcess
+from xetra.common.custom_exceptions import WrongFormatException, ConditionalWriteException
+from xetra.transformers.xetra_transformer import XetraETL, XetraSourceConfig, XetraTargetConfig
+
+
+class TestLocalBucketConnectorMethods(unittest.TestCase):
+    """
+    Testing the LocalBucketConnector class
+    """
+
+    def setUp(self):
+        """
+        Set up the environment
+        """
+        self.root_dir = tempfile.mkdtemp()
+        self.bucket_name = 'test-bucket'
+        self.local_bucket_connector = LocalBucketConnector(self.root_dir, self.bucket_name)
+        self.df_src = pd.DataFrame({'col1': ['A', 'B', 'C'], 'col2': [1.5, 2.5, 3.5]})
+
+    def write_file(self, key: str, body: bytes):
+        """
+        Write a file below the bucket directory
+        """
+        path = os.path.join(self.root_dir, self.bucket_name, *key.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(body)
+
+    def test_list_files(self):
+        """
+        Tests list_files_in_prefix and list_files_in_range
+        """
+        # Test init
+        for key in ['2022-12-15/a.csv', '2022-12-16/b.csv', '2022-12-16/c.csv',
+                    '2022-12-17/d.csv', 'meta/meta.csv']:
+            self.write_file(key, b'col1\n1\n')
+        # Method execution
+        prefix_result = self.local_bucket_connector.list_files_in_prefix('2022-12-16/')
+        range_result = self.local_bucket_connector.list_files_in_range('2022-12-16',
+                                                                       '2022-12-17')
+        missing_result = self.local_bucket_connector.list_files_in_prefix('missing/')
+        # Test after method execution
+        self.assertEqual(['2022-12-16/b.csv', '2022-12-16/c.csv'], prefix_result)
+        self.assertEqual(['2022-12-16/b.csv', '2022-12-16/c.csv', '2022-12-17/d.csv'],
+                         range_result)
+        self.assertEqual([], missing_result)
+
+    def test_read_csv_to_df(self):
+        """
+        Tests read_csv_to_df with both parsers and a compressed file
+        """
+        # Test init
+        body = self.df_src.to_csv(index=False).encode('utf-8')
+        self.write_file('data.csv', body)
+        self.write_file('data.csv.gz', gzip.compress(body))
+        # Method execution
+        df_c = self.local_bucket_connector.read_csv_to_df('data.csv')
+        df_pyarrow = self.local_bucket_connector.read_csv_to_df(
+            'data.csv.gz', engine='pyarrow', dtype={'col1': 'category'})
+        # Test after method execution
+        self.assertTrue(self.df_src.equals(df_c))
+        self.assertEqual('category', df_pyarrow['col1'].dtype.name)
+        self.assertEqual(list(self.df_src['col1']), list(df_pyarrow['col1']))
+        with self.assertRaises(self.local_bucket_connector.exceptions.NoSuchKey):
+            self.local_bucket_connector.read_csv_to_df('missing.csv')
+
+    def test_write_df_json_and_delete(self):
+        """
+        Tests write_df_to_s3, the json methods and delete_prefix
+        """
+        # Method execution
+        self.local_bucket_connector.write_df_to_s3(self.df_src, 'out/data.csv', 'csv')
+        self.local_bucket_connector.write_df_to_s3(self.df_src, 'out/data.parquet', 'parquet')
+        self.local_bucket_connector.write_json_to_s3({'keys': [1, 2]}, 'out/data.json')
+        # Test after method execution
+        self.assertTrue(self.df_src.equals(
+            self.local_bucket_connector.read_csv_to_df('out/data.csv')))
+        self.assertTrue(self.df_src.equals(
+            self.local_bucket_connector.read_parquet_to_df('out/data.parquet')))
+        self.assertEqual({'keys': [1, 2]},
+                         self.local_bucket_connector.read_json_from_s3('out/data.json'))
+        self.assertIsNone(self.local_bucket_connector.write_df_to_s3(
+            pd.DataFrame(), 'out/empty.csv', 'csv'))
+        with self.assertRaises(WrongFormatException):
+            self.local_bucket_connector.write_df_to_s3(self.df_src, 'out/data.txt', 'txt')
+        self.assertEqual(3, len(self.local_bucket_connector.delete_prefix('out/')))
+        self.assertEqual([], self.local_bucket_connector.list_files_in_prefix('out/'))
+
+    def test_write_object_conditional(self):
+        """
+        Tests that write_object_conditional only writes files unchanged since they were read
+        """
+        # Test init
+        key = 'leases/2022-12-17.json'
+        # Method execution
+        etag_created = self.local_bucket_connector.write_object_conditional(b'first', key)
+        with self.assertRaises(ConditionalWriteException):
+            self.local_bucket_connector.write_object_conditional(b'other', key)
+        etag_updated = self.local_bucket_connector.write_object_conditional(b'second', key,
+                                                                            etag_created)
+        with self.assertRaises(ConditionalWriteException):
+            self.local_bucket_connector.write_object_conditional(b'stale', key, etag_created)
+        # Test after method execution
+        self.assertEqual((b'second', etag_updated),
+                         self.local_bucket_connector.read_object_with_etag(key))
+        self.assertEqual([key], self.local_bucket_connector.list_files_in_prefix('leases/'))
+
+    def test_etl_report1_local(self):
+        """
+        Tests the full etl_report1 run on local bucket directories
+        """
+        # Test init
+        columns_src = ['ISIN', 'Mnemonic', 'Date', 'Time', 'StartPrice',
+                       'EndPrice', 'MinPrice', 'MaxPrice', 'TradedVolume']
+        data = [['AT0000A0E9W5', 'SANT', '2022-12-16', '15:00', 18.27, 21.19, 18.27, 21.34, 987],
+                ['AT0000A0E9W5', 'SANT', '2022-12-17', '13:00', 20.21, 18.27, 18.21, 20.42, 633],
+                ['AT0000A0E9W5', 'SANT', '2022-12-17', '14:00', 18.27, 21.19, 18.27, 21.34, 455]]
+        df_src = pd.DataFrame(data, columns=columns_src)
+        local_src = LocalBucketConnector(self.root_dir, 'src-bucket')
+        local_trg = LocalBucketConnector(self.root_dir, 'trg-bucket')
+        for index, key in enumerate(['2022-12-16/2022-12-16_BINS_XETR15.csv',
+                                     '2022-12-17/2022-12-17_BINS_XETR13.csv',
+                                     '2022-12-17/2022-12-17_BINS_XETR14.csv']):
+            local_src.write_df_to_s3(df_src.loc[index:index], key, 'csv')
+        source_config = XetraSourceConfig(
+            src_first_extract_date='2022-12-17', src_columns=columns_src, src_col_date='Date',
+            src_col_isin='ISIN', src_col_time='Time', src_col_start_price='StartPrice',
+            src_col_min_price='MinPrice', src_col_max_price='MaxPrice',
+            src_col_traded_vol='TradedVolume', src_extract_workers=2)
+        target_config = XetraTargetConfig(
+            trg_col_date='date', trg_col_isin='isin', trg_col_op_price='opening_price_eur',
+            trg_col_clos_price='closing_price_eur', trg_col_min_price='minimum_price_eur',
+            trg_col_max_price='maximum_price_eur', trg_col_dail_trad_vol='daily_traded_volume',
+            trg_col_ch_prev_clos='change_prev_closing_%', trg_key='report1/xetra_daily_report1_',
+            trg_key_date_format='%Y%m%d_%H%M%S', trg_format='parquet')
+        # Method execution
+        xetra_etl = XetraETL(local_src, local_trg, 'meta/meta.csv', source_config, target_config)
+        xetra_etl.etl_report1()
+        # Test after method execution
+        trg_file = local_trg.list_files_in_prefix('report1/')[0]
+        df_result = local_trg.read_parquet_to_df(trg_file)
+        df_meta = MetaProcess.read_meta_file('meta/meta.csv', local_trg)
+        self.assertEqual(['2022-12-17'], list(df_result['Date']))
+        self.assertEqual(1088, df_result['daily_traded_volume'][0])
+        self.assertEqual(10.62, df_result['change_prev_closing_%'][0])
+        self.assertIn('2022-12-17', list(df_meta['source_date']))
+
+    def tearDown(self):
+        """
+        Executing after unittests
+        """
+        shutil.rmtree(self.root_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
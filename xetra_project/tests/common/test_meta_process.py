@@ -1,6 +1,7 @@
 """TestMetaProcessMethods"""
 import os
 import unittest
+from unittest.mock import patch
 from io import StringIO
 from datetime import datetime, timedelta
 
@@ -11,7 +12,7 @@ from moto import mock_s3
 from xetra.common.s3 import S3BucketConnector
 from xetra.common.meta_process import MetaProcess
 from xetra.common.constants import MetaProcessFormat
-from xetra.common.custom_exceptions import WrongMetaFileException
+from xetra.common.custom_exceptions import WrongMetaFileException, ConditionalWriteException
 
 
 class TestMetaProcessMethods(unittest.TestCase):
@@ -162,6 +163,47 @@ class TestMetaProcessMethods(unittest.TestCase):
             }
         )
 
+    def test_update_meta_file_conditional(self):
+        """
+        Tests that conditional updates of the csv meta file merge the dates of
+        workers that read the meta file before each other's update
+        """
+        # Expected results
+        date_list_exp = ['2022-12-18', '2022-12-20', '2022-12-19']
+
+        # Test init
+        meta_key = 'meta.csv'
+        df_meta_stale = MetaProcess.read_meta_file(meta_key, self.s3_bucket_meta)
+        MetaProcess.update_meta_file(date_list_exp[:1], meta_key, self.s3_bucket_meta)
+
+        # Method execution
+        MetaProcess.update_meta_file(date_list_exp[1:2], meta_key, self.s3_bucket_meta,
+                                     df_meta=df_meta_stale, conditional=True)
+        write_object_conditional = self.s3_bucket_meta.write_object_conditional
+        writes = []
+
+        def write_conflicting_once(body, key, etag):
+            # Another worker updates the meta file between the first read and write
+            writes.append(etag)
+            if len(writes) == 1:
+                raise ConditionalWriteException(key)
+            return write_object_conditional(body, key, etag)
+
+        with patch('xetra.common.s3.time.sleep'), \
+                patch.object(self.s3_bucket_meta, 'write_object_conditional',
+                             side_effect=write_conflicting_once):
+            MetaProcess.update_meta_file(date_list_exp[2:], meta_key, self.s3_bucket_meta,
+                                         conditional=True)
+        df_meta_result = MetaProcess.read_meta_file(meta_key, self.s3_bucket_meta)
+
+        # Test after method execution
+        self.assertEqual(2, len(writes))
+        self.assertEqual(date_list_exp,
+                         list(df_meta_result[MetaProcessFormat.META_SOURCE_DATE_COL.value]))
+
+        # Cleanup after test
+        self.s3_bucket.delete_objects(Delete={'Objects': [{'Key': meta_key}]})
+
     def test_update_meta_file_meta_file_wrong(self):
         """
         Tests update_meta_file method when with wrong meta file
@@ -332,6 +374,72 @@ class TestMetaProcessMethods(unittest.TestCase):
             }
         )
 
+    def test_return_missing_date_spans(self):
+        """
+        Tests return_missing_date_spans method with gaps in the meta file
+        """
+        # Expected results
+        spans_exp = [(self.dates[6], self.dates[5]), (self.dates[2], self.dates[2]),
+                     (self.dates[0], self.dates[0])]
+        # Test init
+        meta_key = 'meta.csv'
+        meta_content = (
+          f'{MetaProcessFormat.META_SOURCE_DATE_COL.value},'
+          f'{MetaProcessFormat.META_PROCESS_COL.value}\n'
+          f'{self.dates[4]},{self.dates[0]}\n'
+          f'{self.dates[3]},{self.dates[0]}\n'
+          f'{self.dates[1]},{self.dates[0]}'
+        )
+        self.s3_bucket.put_object(Body=meta_content, Key=meta_key)
+        # Method execution
+        spans_return = MetaProcess.return_missing_date_spans(self.dates[6], meta_key,
+                                                             self.s3_bucket_meta)
+        spans_no_meta = MetaProcess.return_missing_date_spans(self.dates[6], 'no_meta.csv',
+                                                              self.s3_bucket_meta)
+        # Test after method execution
+        self.assertEqual(spans_exp, spans_return)
+        self.assertEqual([(self.dates[6], self.dates[0])], spans_no_meta)
+
+    def test_parquet_meta_store_ok(self):
+        """
+        Tests update_meta_file and return_date_list with the parquet meta store
+        """
+        # Expected results
+        min_date_exp = self.dates[1]
+        date_list_exp = [self.dates[2], self.dates[1], self.dates[0]]
+        # Test init
+        meta_key = 'meta.parquet'
+        # Method execution
+        MetaProcess.update_meta_file([self.dates[4], self.dates[3]], meta_key,
+                                     self.s3_bucket_meta)
+        MetaProcess.update_meta_file([self.dates[2]], meta_key, self.s3_bucket_meta)
+        MetaProcess.update_meta_file([], meta_key, self.s3_bucket_meta)
+        df_meta = MetaProcess.read_meta_file(meta_key, self.s3_bucket_meta)
+        min_date_return, date_list_return = MetaProcess.return_date_list(
+            self.dates[4], meta_key, self.s3_bucket_meta, df_meta=df_meta)
+        # Test after method execution
+        self.assertEqual(2, len(self.s3_bucket_meta.list_files_in_prefix(f'{meta_key}/')))
+        self.assertEqual(sorted([self.dates[4], self.dates[3], self.dates[2]]),
+                         sorted(df_meta[MetaProcessFormat.META_SOURCE_DATE_COL.value]))
+        self.assertEqual(min_date_exp, min_date_return)
+        self.assertEqual(date_list_exp, date_list_return)
+
+    def test_parquet_meta_store_compaction(self):
+        """
+        Tests that update_meta_file compacts the segments of the parquet meta store
+        """
+        # Test init
+        meta_key = 'meta.parquet'
+        # Method execution
+        with patch('xetra.common.meta_process.META_MAX_SEGMENTS', 2):
+            for date in self.dates[:3]:
+                MetaProcess.update_meta_file([date], meta_key, self.s3_bucket_meta)
+        df_meta = MetaProcess.read_meta_file(meta_key, self.s3_bucket_meta)
+        # Test after method execution
+        self.assertEqual(1, len(self.s3_bucket_meta.list_files_in_prefix(f'{meta_key}/')))
+        self.assertEqual(sorted(self.dates[:3]),
+                         list(df_meta[MetaProcessFormat.META_SOURCE_DATE_COL.value]))
+
     def tearDown(self):
         """
         Execute after unit tests
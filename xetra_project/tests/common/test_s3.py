@@ -2,15 +2,25 @@
 TestS3BucketConnectorMethods
 """
 import os
+import gzip
+import shutil
+import tempfile
 import unittest
+from unittest.mock import patch
 from io import StringIO, BytesIO
 
 import boto3
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
 from moto import mock_s3
 
-from xetra.common.s3 import S3BucketConnector
-from xetra.common.custom_exceptions import WrongFormatException
+from xetra.common.s3 import S3BucketConnector, S3ConnectorFactory, WriteOptions
+from xetra.common.fetch import ResilientFetcher
+from xetra.common.cache import LocalObjectCache
+from xetra.common.custom_exceptions import WrongFormatException, ConditionalWriteException
 
 class TestS3BucketConnectorMethods(unittest.TestCase):
     """
@@ -102,6 +112,96 @@ class TestS3BucketConnectorMethods(unittest.TestCase):
         # Tests after method execution
         self.assertTrue(not list_result)
 
+    def test_list_files_in_range(self):
+        """
+        Test the list_files_in_range method lists a date range in a single listing
+        """
+        # Expected results
+        keys = ['2022-12-15/a.csv', '2022-12-16/a.csv', '2022-12-16/b.csv',
+                '2022-12-17/a.csv', '2022-12-18/a.csv', 'report1/a.csv']
+        keys_exp = keys[1:4]
+
+        # Test init
+        for key in keys:
+            self.s3_bucket.put_object(Body='col1', Key=key)
+
+        # Method execution
+        list_result = self.s3_bucket_connector.list_files_in_range('2022-12-16', '2022-12-17')
+
+        # Tests after method execution
+        self.assertEqual(keys_exp, list_result)
+
+        # Clean up after tests
+        self.s3_bucket.delete_objects(Delete={'Objects': [{'Key': key} for key in keys]})
+
+    def test_list_files_with_manifest(self):
+        """
+        Test the list_files_with_manifest method refreshes the manifest incrementally
+        """
+        # Expected results
+        keys = ['2022-12-15/a.csv', '2022-12-16/a.csv', '2022-12-17/a.csv']
+        key_new = '2022-12-17/b.csv'
+        manifest_key = 'meta/keys.json'
+
+        # Test init
+        for key in keys:
+            self.s3_bucket.put_object(Body='col1', Key=key)
+        list_calls = []
+        self.s3_bucket_connector._bucket.meta.client.meta.events.register(
+            'provide-client-params.s3.ListObjects',
+            lambda params, **kwargs: list_calls.append(dict(params)))
+
+        # Method execution
+        list_first = self.s3_bucket_connector.list_files_with_manifest(
+            '2022-12-16', '2022-12-17', manifest_key, self.s3_bucket_connector)
+        self.s3_bucket.put_object(Body='col1', Key=key_new)
+        list_second = self.s3_bucket_connector.list_files_with_manifest(
+            '2022-12-16', '2022-12-17', manifest_key, self.s3_bucket_connector)
+        manifest_second = self.s3_bucket_connector.read_json_from_s3(manifest_key)
+        list_third = self.s3_bucket_connector.list_files_with_manifest(
+            '2022-12-17', '2022-12-17', manifest_key, self.s3_bucket_connector)
+        manifest_third = self.s3_bucket_connector.read_json_from_s3(manifest_key)
+
+        # Tests after method execution
+        self.assertEqual(keys[1:], list_first)
+        self.assertEqual(keys[1:] + [key_new], list_second)
+        self.assertEqual([keys[-1], key_new], list_third)
+        self.assertEqual(3, len(list_calls))
+        self.assertEqual(keys[-1], list_calls[1]['Marker'])
+        self.assertEqual(key_new, manifest_second['last_key'])
+        # Keys before the first prefix of the latest run are dropped
+        self.assertEqual(keys[1:] + [key_new], manifest_second['keys'])
+        self.assertEqual(('2022-12-17', [keys[-1], key_new]),
+                         (manifest_third['first_prefix'], manifest_third['keys']))
+
+        # Clean up after tests
+        self.s3_bucket.delete_objects(Delete={'Objects': [
+            {'Key': key} for key in keys + [key_new, manifest_key]]})
+
+    def test_connector_factory_shares_clients(self):
+        """
+        Tests that connectors of a S3ConnectorFactory share session and clients
+        """
+        # Test init
+        factory = S3ConnectorFactory(self.s3_access_key, self.s3_secret_key,
+                                     max_pool_connections=20, connect_timeout=5,
+                                     read_timeout=30, tcp_keepalive=True)
+        # Method execution
+        connector_src = factory.connector(self.s3_endpoint_url, self.s3_bucket_name)
+        connector_trg = factory.connector(self.s3_endpoint_url, self.s3_bucket_name)
+        # Test after method execution
+        self.assertIs(connector_src.session, connector_trg.session)
+        self.assertIs(connector_src._s3, connector_trg._s3)
+        client_config = connector_src._s3.meta.client.meta.config
+        self.assertEqual(20, client_config.max_pool_connections)
+        self.assertEqual(5, client_config.connect_timeout)
+        self.assertEqual(30, client_config.read_timeout)
+        # A missing key is caught without creating a new client
+        with patch.object(boto3.Session, 'client') as mock_client:
+            with self.assertRaises(connector_src.exceptions.NoSuchKey):
+                connector_src.read_csv_to_df('missing.csv')
+            mock_client.assert_not_called()
+
     def test_read_csv_to_df_ok(self):
         """
         Test the read_csv_to_df method for reading
@@ -143,6 +243,255 @@ class TestS3BucketConnectorMethods(unittest.TestCase):
             }
         )
 
+    def test_read_csv_to_df_fetcher(self):
+        """
+        Test the read_csv_to_df and read_parquet_to_df methods retrying
+        throttled GETs through a ResilientFetcher
+        """
+        # Test init
+        fetcher = ResilientFetcher(max_attempts=3, base_delay_s=0.001)
+        s3_bucket_connector = S3BucketConnector(self.s3_access_key, self.s3_secret_key,
+                                                self.s3_endpoint_url, self.s3_bucket_name,
+                                                fetcher=fetcher)
+        self.s3_bucket.put_object(Body='col1,col2\nval1,val2', Key='test.csv')
+        self.s3_bucket.put_object(Body=pd.DataFrame({'col1': [1]}).to_parquet(),
+                                  Key='test.parquet')
+        client = s3_bucket_connector._bucket.meta.client
+        get_object = client.get_object
+        throttled = []
+
+        def get_object_throttled(**kwargs):
+            # First GET of every key is throttled
+            if kwargs['Key'] not in throttled:
+                throttled.append(kwargs['Key'])
+                raise ClientError({'Error': {'Code': 'SlowDown', 'Message': 'Slow Down'}},
+                                  'GetObject')
+            return get_object(**kwargs)
+
+        # Method execution
+        with patch.object(client, 'get_object', side_effect=get_object_throttled):
+            df_csv = s3_bucket_connector.read_csv_to_df('test.csv')
+            df_parquet = s3_bucket_connector.read_parquet_to_df('test.parquet')
+        with self.assertLogs() as logm:
+            s3_bucket_connector.log_fetch_histogram()
+
+        # Test after method execution
+        self.assertEqual('val2', df_csv['col2'][0])
+        self.assertEqual(1, df_parquet['col1'][0])
+        self.assertEqual(2, fetcher.stats['retries'])
+        self.assertEqual(4, fetcher.stats['attempts'])
+        self.assertIn('2 retries', logm.output[0])
+
+    def test_read_csv_to_df_typed(self):
+        """
+        Test the read_csv_to_df method with column projection and
+        dtype schema for the pandas and the pyarrow parser
+        """
+
+        # Expected results
+        key_exp = 'test.csv'
+        columns_exp = ['ISIN', 'Time', 'StartPrice']
+        categories_exp = ['AT0000A0E9W5', 'DE0005190003']
+        times_exp = ['09:00', '08:00']
+
+        # Test init
+        csv_content = (
+            'ISIN,Mnemonic,Time,StartPrice\n'
+            'DE0005190003,BMW,09:00,85.5\n'
+            'AT0000A0E9W5,SANT,08:00,20.25'
+        )
+        dtype = {'ISIN': 'category', 'Time': 'category', 'StartPrice': 'float32'}
+        self.s3_bucket.put_object(Body=csv_content, Key=key_exp)
+
+        for engine in ['c', 'pyarrow']:
+            # Method execution
+            df_result = self.s3_bucket_connector.read_csv_to_df(
+                key_exp, usecols=columns_exp, dtype=dtype, engine=engine)
+
+            # Test after method execution
+            self.assertEqual(columns_exp, list(df_result.columns))
+            self.assertEqual(categories_exp, list(df_result['ISIN'].cat.categories))
+            self.assertEqual(times_exp, list(df_result['Time'].astype(str)))
+            self.assertEqual('float32', df_result['StartPrice'].dtype)
+
+        # Clean up after tests
+        self.s3_bucket.delete_objects(
+            Delete={
+                'Objects': [
+                    {
+                        'Key': key_exp
+                    },
+                ]
+            }
+        )
+
+    def test_read_csv_to_df_compressed(self):
+        """
+        Test the read_csv_to_df method for gzip and zstd compressed
+        csv files with the compression inferred from the key
+        """
+
+        # Expected results
+        values_exp = [['val1', 'val2'], ['val3', 'val4']]
+
+        # Test init
+        csv_content = b'col1,col2\nval1,val2\nval3,val4'
+        keys = []
+        for codec, extension in [('gzip', 'gz'), ('zstd', 'zst')]:
+            out_buffer = pa.BufferOutputStream()
+            with pa.CompressedOutputStream(out_buffer, codec) as stream:
+                stream.write(csv_content)
+            keys.append(f'test.csv.{extension}')
+            self.s3_bucket.put_object(Body=out_buffer.getvalue().to_pybytes(), Key=keys[-1])
+
+        for key in keys:
+            for engine in ['c', 'pyarrow']:
+                # Method execution
+                df_result = self.s3_bucket_connector.read_csv_to_df(key, engine=engine)
+
+                # Test after method execution
+                self.assertEqual(values_exp, df_result.values.tolist())
+
+        # Clean up after tests
+        self.s3_bucket.delete_objects(
+            Delete={
+                'Objects': [{'Key': key} for key in keys]
+            }
+        )
+
+    def test_write_json_and_delete_prefix(self):
+        """
+        Test the write_json_to_s3, read_json_from_s3 and delete_prefix methods
+        """
+        # Expected results
+        data_exp = {'partitions': {'2022-12-17': {'rows': 3}}}
+        keys_exp = ['dataset/date=2022-12-17/part-000.json',
+                    'dataset/date=2022-12-17/part-001.json']
+        key_kept = 'dataset/date=2022-12-18/part-000.json'
+
+        # Method execution
+        for key in keys_exp + [key_kept]:
+            self.s3_bucket_connector.write_json_to_s3(data_exp, key)
+        data_result = self.s3_bucket_connector.read_json_from_s3(keys_exp[0])
+        keys_result = self.s3_bucket_connector.delete_prefix('dataset/date=2022-12-17/')
+
+        # Test after method execution
+        self.assertEqual(data_exp, data_result)
+        self.assertEqual(keys_exp, keys_result)
+        self.assertEqual([key_kept], self.s3_bucket_connector.list_files_in_prefix('dataset/'))
+
+        # Clean up after tests
+        self.s3_bucket.delete_objects(Delete={'Objects': [{'Key': key_kept}]})
+
+    def test_write_object_conditional(self):
+        """
+        Tests that write_object_conditional sends the If-None-Match and If-Match
+        preconditions and raises ConditionalWriteException on a failed precondition
+        """
+        # Test init
+        key = 'leases/2022-12-17.json'
+        client = self.s3_bucket_connector._bucket.meta.client
+        headers = []
+
+        def record_headers(request, **kwargs):
+            headers.append({name: value for name, value in request.headers.items()
+                            if name in ('If-None-Match', 'If-Match')})
+
+        client.meta.events.register('before-sign.s3.PutObject', record_headers)
+        # Method execution
+        etag_created = self.s3_bucket_connector.write_object_conditional(b'first', key)
+        etag_updated = self.s3_bucket_connector.write_object_conditional(b'second', key,
+                                                                         etag_created)
+        body_result, etag_result = self.s3_bucket_connector.read_object_with_etag(key)
+        client.meta.events.unregister('before-sign.s3.PutObject', record_headers)
+        error = ClientError({'Error': {'Code': 'PreconditionFailed'},
+                             'ResponseMetadata': {'HTTPStatusCode': 412}}, 'PutObject')
+        with patch.object(client, 'put_object', side_effect=error):
+            with self.assertRaises(ConditionalWriteException):
+                self.s3_bucket_connector.write_object_conditional(b'third', key, etag_created)
+        # Test after method execution
+        self.assertEqual([{'If-None-Match': '*'}, {'If-Match': etag_created}], headers)
+        self.assertEqual((b'second', etag_updated), (body_result, etag_result))
+
+        # Clean up after tests
+        self.s3_bucket.delete_objects(Delete={'Objects': [{'Key': key}]})
+
+    def test_read_csv_to_df_cached(self):
+        """
+        Test the read_csv_to_df method downloads a listed file only once with a local cache
+        """
+        # Expected results
+        key_exp = '2022-12-16/test.csv'
+        values_exp = [['val1', 'val2']]
+
+        # Test init
+        cache_dir = tempfile.mkdtemp()
+        s3_bucket_connector = S3BucketConnector(self.s3_access_key,
+                                                self.s3_secret_key,
+                                                self.s3_endpoint_url,
+                                                self.s3_bucket_name,
+                                                cache=LocalObjectCache(cache_dir, 16))
+        self.s3_bucket.put_object(Body='col1,col2\nval1,val2', Key=key_exp)
+        get_calls = []
+        s3_bucket_connector._bucket.meta.client.meta.events.register(
+            'provide-client-params.s3.GetObject',
+            lambda params, **kwargs: get_calls.append(params['Key']))
+
+        # Method execution
+        s3_bucket_connector.list_files_in_prefix('2022-12-16/')
+        with self.assertLogs() as logm:
+            df_first = s3_bucket_connector.read_csv_to_df(key_exp)
+            df_second = s3_bucket_connector.read_csv_to_df(key_exp)
+            # Log test after method execution
+            self.assertIn('Cache miss', logm.output[1])
+            self.assertIn('Cache hit', logm.output[3])
+
+        # Test after method execution
+        self.assertEqual(values_exp, df_first.values.tolist())
+        self.assertEqual(values_exp, df_second.values.tolist())
+        self.assertEqual([key_exp], get_calls)
+
+        # Clean up after tests
+        shutil.rmtree(cache_dir)
+        self.s3_bucket.delete_objects(Delete={'Objects': [{'Key': key_exp}]})
+
+    def test_read_csv_to_df_cached_evicted(self):
+        """
+        Test the read_csv_to_df method reads a freshly cached file that another
+        worker evicts right after it was written
+        """
+        # Expected results
+        key_exp = '2022-12-16/test.csv'
+        values_exp = [['val1', 'val2']]
+
+        # Test init
+        cache_dir = tempfile.mkdtemp()
+        cache = LocalObjectCache(cache_dir, 16)
+        s3_bucket_connector = S3BucketConnector(self.s3_access_key,
+                                                self.s3_secret_key,
+                                                self.s3_endpoint_url,
+                                                self.s3_bucket_name,
+                                                cache=cache)
+        self.s3_bucket.put_object(Body='col1,col2\nval1,val2', Key=key_exp)
+        put = cache.put
+
+        def put_evicted(*args):
+            cached = put(*args)
+            # Eviction by a concurrent put of another worker
+            os.remove(cached.name)
+            return cached
+
+        # Method execution
+        with patch.object(cache, 'put', side_effect=put_evicted):
+            df_result = s3_bucket_connector.read_csv_to_df(key_exp)
+
+        # Test after method execution
+        self.assertEqual(values_exp, df_result.values.tolist())
+
+        # Clean up after tests
+        shutil.rmtree(cache_dir)
+        self.s3_bucket.delete_objects(Delete={'Objects': [{'Key': key_exp}]})
+
     def test_write_df_to_s3_empty(self):
         """
         Test write_df_to_s3 method with an empty DataFrame as input
@@ -242,6 +591,104 @@ class TestS3BucketConnectorMethods(unittest.TestCase):
             }
         )
 
+    def test_write_df_to_s3_multipart(self):
+        """
+        Test write_df_to_s3 method with a streaming multipart upload
+        of csv and parquet files larger than one part
+        """
+
+        # Expected results
+        rows = 400_000
+        rng = np.random.default_rng(0)
+        df_exp = pd.DataFrame({
+            'col1': rng.uniform(0, 100, rows),
+            'col2': rng.uniform(0, 100, rows),
+            'col3': rng.integers(0, 10 ** 9, rows)})
+        part_size = 5 * 2 ** 20
+
+        for file_format in ['csv', 'parquet']:
+            # Test init
+            key_exp = f'test_multipart.{file_format}'
+
+            # Method execution
+            result = self.s3_bucket_connector.write_df_to_s3(
+                df_exp, key_exp, file_format, part_size=part_size, max_concurrency=2)
+
+            # Test after method execution
+            s3_object = self.s3_bucket.Object(key=key_exp)
+            self.assertTrue(result)
+            self.assertGreater(s3_object.content_length, part_size)
+            self.assertIn('-', s3_object.e_tag)
+            data = BytesIO(s3_object.get().get('Body').read())
+            df_result = pd.read_csv(data) if file_format == 'csv' else pd.read_parquet(data)
+            pd.testing.assert_frame_equal(df_exp, df_result, check_exact=file_format != 'csv')
+
+            # Cleanup after test
+            self.s3_bucket.delete_objects(Delete={'Objects': [{'Key': key_exp}]})
+
+    def test_write_df_to_s3_options(self):
+        """
+        Test write_df_to_s3 method with compressed csv files, including a
+        multipart upload, and parquet files with codec, row groups and sort order
+        """
+
+        # Expected results
+        rows = 400_000
+        rng = np.random.default_rng(0)
+        df_exp = pd.DataFrame({
+            'col1': rng.uniform(0, 100, rows),
+            'col2': rng.integers(0, 10 ** 9, rows)})
+
+        # Method execution
+        self.s3_bucket_connector.write_df_to_s3(
+            df_exp, 'test.csv.gz', 'csv', options=WriteOptions(compression='gzip'))
+        self.s3_bucket_connector.write_df_to_s3(
+            df_exp, 'test_multipart.csv.zst', 'csv', part_size=5 * 2 ** 20,
+            options=WriteOptions(compression='zstd', compression_level=1))
+        self.s3_bucket_connector.write_df_to_s3(
+            df_exp, 'test.parquet', 'parquet',
+            options=WriteOptions(compression='zstd', compression_level=3,
+                                 row_group_size=100_000, use_dictionary=False,
+                                 sort_by=['col2']))
+
+        # Test after method execution
+        body = self.s3_bucket.Object(key='test.csv.gz').get().get('Body').read()
+        pd.testing.assert_frame_equal(df_exp, pd.read_csv(BytesIO(gzip.decompress(body))),
+                                      check_exact=False)
+        self.assertIn('-', self.s3_bucket.Object(key='test_multipart.csv.zst').e_tag)
+        pd.testing.assert_frame_equal(
+            df_exp, self.s3_bucket_connector.read_csv_to_df('test_multipart.csv.zst'),
+            check_exact=False)
+        body = self.s3_bucket.Object(key='test.parquet').get().get('Body').read()
+        metadata = pq.ParquetFile(BytesIO(body)).metadata
+        self.assertEqual(4, metadata.num_row_groups)
+        self.assertEqual('ZSTD', metadata.row_group(0).column(0).compression)
+        df_result = self.s3_bucket_connector.read_parquet_to_df('test.parquet')
+        self.assertTrue(df_result['col2'].is_monotonic_increasing)
+        self.assertEqual('csv.gz', WriteOptions(compression='gzip').key_extension('csv'))
+        self.assertEqual('parquet', WriteOptions(compression='gzip').key_extension('parquet'))
+        with self.assertRaises(WrongFormatException):
+            self.s3_bucket_connector.write_df_to_s3(
+                df_exp, 'test.csv', 'csv', options=WriteOptions(compression='snappy'))
+
+    def test_write_df_to_s3_multipart_aborted(self):
+        """
+        Test write_df_to_s3 method aborts the multipart upload when serialising fails
+        """
+        # Test init
+        df_exp = pd.DataFrame({'col1': [1, 2], 'col2': [object(), object()]})
+        key_exp = 'test_multipart.parquet'
+
+        # Method execution
+        with self.assertRaises(pa.ArrowInvalid):
+            self.s3_bucket_connector.write_df_to_s3(df_exp, key_exp, 'parquet',
+                                                    part_size=5 * 2 ** 20)
+
+        # Test after method execution
+        uploads = self.s3.meta.client.list_multipart_uploads(Bucket=self.s3_bucket_name)
+        self.assertFalse(uploads.get('Uploads'))
+        self.assertFalse(self.s3_bucket_connector.list_files_in_prefix(key_exp))
+
     def test_write_df_to_s3_wrong_format(self):
         """
         Test write_df_to_s3_parquet method with a not supported format
@@ -0,0 +1,196 @@
+"""
+TestXetraCompactorMethods
+"""
+import os
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+import boto3
+import pandas as pd
+from moto import mock_s3
+
+from xetra.common.s3 import S3BucketConnector
+from xetra.transformers.xetra_transformer import XetraSourceConfig, XetraTargetConfig
+from xetra.transformers.xetra_compactor import XetraCompactor, XetraCompactionConfig
+
+class TestXetraCompactorMethods(unittest.TestCase):
+    """
+    Test the XetraCompactor class.
+    """
+
+    def setUp(self):
+        """
+        Set up the environment
+        """
+        # MOCK s3 connection start
+        self.mock_s3 = mock_s3()
+        self.mock_s3.start()
+
+        # Define the class arguments
+        self.s3_access_key = 'AWS_ACCESS_KEY_ID'
+        self.s3_secret_key = 'AWS_SECRET_ACCESS_KEY'
+        self.s3_endpoint_url = 'https://s3.eu-west-2.amazonaws.com'
+        self.s3_bucket_name_trg = 'trg-bucket'
+
+        # Create s3 access keys as environment variables
+        os.environ[self.s3_access_key] = 'KEY1'
+        os.environ[self.s3_secret_key] = 'KEY2'
+
+        # Create the target bucket on the mocked s3
+        self.s3 = boto3.resource(service_name='s3', endpoint_url=self.s3_endpoint_url)
+        self.s3.create_bucket(Bucket=self.s3_bucket_name_trg,
+                              CreateBucketConfiguration={
+                                  'LocationConstraint': 'eu-central-1'})
+        self.s3_bucket_trg = S3BucketConnector(self.s3_access_key,
+                                               self.s3_secret_key,
+                                               self.s3_endpoint_url,
+                                               self.s3_bucket_name_trg)
+
+        # Create source, target and compaction configuration
+        self.source_config = XetraSourceConfig(
+            src_first_extract_date='2022-12-01', src_columns=['ISIN', 'Date'],
+            src_col_date='Date', src_col_isin='ISIN', src_col_time='Time',
+            src_col_start_price='StartPrice', src_col_min_price='MinPrice',
+            src_col_max_price='MaxPrice', src_col_traded_vol='TradedVolume')
+        self.target_config = XetraTargetConfig(
+            trg_col_isin='isin', trg_col_date='date', trg_col_op_price='opening_price_eur',
+            trg_col_clos_price='closing_price_eur', trg_col_min_price='minimum_price_eur',
+            trg_col_max_price='maximum_price_eur', trg_col_dail_trad_vol='daily_traded_volume',
+            trg_col_ch_prev_clos='change_prev_closing_%', trg_key='report1/xetra_daily_report1_',
+            trg_key_date_format='%Y%m%d_%H%M%S', trg_format='parquet')
+        self.compaction_config = XetraCompactionConfig(cmp_prefix='report1/compacted/')
+        self.columns_report = ['ISIN', 'Date', 'opening_price_eur', 'daily_traded_volume']
+
+    def write_report(self, timestamp: str, data: list):
+        """
+        Write a report object like XetraETL.load
+        """
+        self.s3_bucket_trg.write_df_to_s3(
+            pd.DataFrame(data, columns=self.columns_report),
+            f'report1/xetra_daily_report1_{timestamp}.parquet', 'parquet')
+
+    def test_compact_incremental(self):
+        """
+        Tests that compact deduplicates reprocessed ISIN-days and only reads new
+        report objects in a second run
+        """
+        # Test init
+        self.write_report('20221218_100000', [['AT0000A0E9W5', '2022-12-17', 20.21, 1088],
+                                              ['DE000A0D6554', '2022-12-17', 11.21, 455]])
+        self.write_report('20221219_100000', [['AT0000A0E9W5', '2022-12-18', 20.58, 10286]])
+        # Reprocessing of 2022-12-17 for one ISIN
+        self.write_report('20221219_120000', [['AT0000A0E9W5', '2022-12-17', 20.25, 1100]])
+        xetra_compactor = XetraCompactor(self.s3_bucket_trg, self.source_config,
+                                         self.target_config, self.compaction_config)
+        # Method execution
+        manifest_first = xetra_compactor.compact()
+        self.write_report('20221220_100000', [['AT0000A0E9W5', '2022-12-19', 23.58, 3586]])
+        with patch.object(self.s3_bucket_trg, 'read_parquet_to_df',
+                          wraps=self.s3_bucket_trg.read_parquet_to_df) as read_mock:
+            manifest_second = xetra_compactor.compact()
+        manifest_third = xetra_compactor.compact()
+        # Test after method execution
+        self.assertEqual(1, len(manifest_first['files']))
+        self.assertEqual('report1/xetra_daily_report1_20221219_120000.parquet',
+                         manifest_first['compacted_keys'][-1])
+        # The under-filled compacted file and the new report object were read
+        self.assertEqual(2, read_mock.call_count)
+        self.assertEqual(4, manifest_second['compacted_objects'])
+        self.assertEqual(manifest_second, manifest_third)
+        files = manifest_second['files']
+        self.assertEqual(1, len(files))
+        self.assertEqual(('2022-12-17', '2022-12-19', 4),
+                         (files[0]['first_date'], files[0]['last_date'], files[0]['rows']))
+        self.assertEqual(['report1/compacted/_manifest.json', files[0]['key']],
+                         self.s3_bucket_trg.list_files_in_prefix('report1/compacted/'))
+        df_result = self.s3_bucket_trg.read_parquet_to_df(files[0]['key'])
+        self.assertEqual(['2022-12-17', '2022-12-17', '2022-12-18', '2022-12-19'],
+                         list(df_result['Date']))
+        self.assertEqual([20.25, 11.21, 20.58, 23.58], list(df_result['opening_price_eur']))
+        self.assertEqual(1100, df_result['daily_traded_volume'][0])
+
+    def test_compact_target_size(self):
+        """
+        Tests that compacted files are split between dates at the target size and
+        full files are not rewritten
+        """
+        # Test init
+        self.write_report('20221218_100000', [['AT0000A0E9W5', '2022-12-17', 20.21, 1088],
+                                              ['AT0000A0E9W5', '2022-12-18', 20.58, 10286]])
+        xetra_compactor = XetraCompactor(self.s3_bucket_trg, self.source_config,
+                                         self.target_config,
+                                         self.compaction_config._replace(
+                                             cmp_target_size_mb=0, cmp_delete_sources=True))
+        # Method execution
+        manifest_first = xetra_compactor.compact()
+        first_files = list(manifest_first['files'])
+        self.write_report('20221220_100000', [['AT0000A0E9W5', '2022-12-19', 23.58, 3586]])
+        manifest_second = xetra_compactor.compact()
+        # Test after method execution
+        self.assertEqual([('2022-12-17', '2022-12-17'), ('2022-12-18', '2022-12-18')],
+                         [(entry['first_date'], entry['last_date']) for entry in first_files])
+        self.assertEqual(first_files, manifest_second['files'][:2])
+        self.assertEqual('2022-12-19', manifest_second['files'][2]['first_date'])
+        self.assertEqual([], self.s3_bucket_trg.list_files_in_prefix(
+            'report1/xetra_daily_report1_'))
+
+    def test_compact_late_object(self):
+        """
+        Tests that a report object becoming visible after an object with a later key
+        is compacted without replacing the rows of the later object
+        """
+        # Test init
+        self.write_report('20221219_120000', [['AT0000A0E9W5', '2022-12-17', 20.25, 1100]])
+        xetra_compactor = XetraCompactor(self.s3_bucket_trg, self.source_config,
+                                         self.target_config, self.compaction_config)
+        # Method execution
+        xetra_compactor.compact()
+        # Written before 20221219_120000, visible only after its compaction
+        self.write_report('20221219_100000', [['AT0000A0E9W5', '2022-12-17', 20.21, 1088],
+                                              ['DE000A0D6554', '2022-12-17', 11.21, 455]])
+        manifest = xetra_compactor.compact()
+        # Test after method execution
+        self.assertEqual(['report1/xetra_daily_report1_20221219_100000.parquet',
+                          'report1/xetra_daily_report1_20221219_120000.parquet'],
+                         manifest['compacted_keys'])
+        self.assertEqual(2, manifest['compacted_objects'])
+        df_result = self.s3_bucket_trg.read_parquet_to_df(manifest['files'][0]['key'])
+        self.assertEqual([['AT0000A0E9W5', 20.25], ['DE000A0D6554', 11.21]],
+                         df_result[['ISIN', 'opening_price_eur']].values.tolist())
+
+    def test_compact_empty_objects(self):
+        """
+        Tests that new report objects without rows are marked as compacted without
+        rewriting any file
+        """
+        # Test init
+        self.s3_bucket_trg.write_df_to_s3(
+            pd.DataFrame([['AT0000A0E9W5', '2022-12-17', 20.21, 1088]],
+                         columns=self.columns_report),
+            'report1/xetra_daily_report1_20221218_100000.parquet', 'parquet')
+        xetra_compactor = XetraCompactor(self.s3_bucket_trg, self.source_config,
+                                         self.target_config, self.compaction_config)
+        manifest_first = xetra_compactor.compact()
+        files_first = list(manifest_first['files'])
+        body = BytesIO()
+        pd.DataFrame(columns=self.columns_report).to_parquet(body)
+        self.s3.Bucket(self.s3_bucket_name_trg).put_object(
+            Body=body.getvalue(), Key='report1/xetra_daily_report1_20221219_100000.parquet')
+        # Method execution
+        with self.assertLogs() as logm:
+            manifest_second = xetra_compactor.compact()
+        # Test after method execution
+        self.assertTrue(any('New report objects are empty' in line for line in logm.output))
+        self.assertEqual(files_first, manifest_second['files'])
+        self.assertEqual(2, len(manifest_second['compacted_keys']))
+
+    def tearDown(self):
+        """
+        Execute after unit tests
+        """
+        # MOCK s3 connection stop
+        self.mock_s3.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,12 +7,18 @@ from unittest.mock import patch
 from io import BytesIO
 
 import boto3
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from moto import mock_s3
 
 from xetra.common.s3 import S3BucketConnector
 from xetra.common.meta_process import MetaProcess
+from xetra.common.lease import DateLeaseStore
+from xetra.common.custom_exceptions import WrongConfigException
 from xetra.transformers.xetra_transformer import XetraETL, XetraSourceConfig, XetraTargetConfig
+from xetra.transformers.xetra_multi_report import XetraMultiReportETL, XetraReportConfig
 
 class TestXetraETLMethods(unittest.TestCase):
     """
@@ -162,6 +168,29 @@ class TestXetraETLMethods(unittest.TestCase):
         # Test after method execution
         self.assertTrue(df_exp.equals(df_result))
 
+    def test_extract_files_concurrent(self):
+        """
+        Tests the extract method with concurrent downloads
+        """
+        # Expected results
+        df_exp = self.df_src.loc[1:8].reset_index(drop=True)
+        log_exp = 'Read 8 source files with 4 worker(s)'
+        # Test init
+        extract_date = '2022-12-17'
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19', '2022-12-20']
+        source_config = self.source_config._replace(src_extract_workers=4)
+        # Method execution
+        with patch.object(MetaProcess, "return_date_list",
+        return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                         self.meta_key, source_config, self.target_config)
+            with self.assertLogs() as logm:
+                df_result = xetra_etl.extract()
+                # Log test after method execution
+                self.assertTrue(any(log_exp in log for log in logm.output))
+        # Test after method execution
+        self.assertTrue(df_exp.equals(df_result))
+
     def test_transform_report1_empty_df(self):
         """
         Tests the transform_report1 method with empty DataFrame as input argument
@@ -209,6 +238,79 @@ class TestXetraETLMethods(unittest.TestCase):
         # Test after method execution
         self.assertTrue(df_exp.equals(df_result))
 
+    def test_transform_report1_single_pass(self):
+        """
+        Tests the transform_report1 method with the single pass engine
+        """
+        # Expected results
+        df_exp = self.df_report
+        # Test init
+        extract_date = '2022-12-17'
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        df_input = self.df_src.loc[1:8].reset_index(drop=True)
+        target_config = self.target_config._replace(trg_transform_engine='single_pass')
+        # Method execution
+        with patch.object(MetaProcess, "return_date_list",
+        return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                         self.meta_key, self.source_config, target_config)
+            df_result = xetra_etl.transform_report1(df_input)
+        # Test after method execution
+        self.assertTrue(df_exp.equals(df_result))
+
+    def test_transform_report1_streaming_ok(self):
+        """
+        Tests the transform_report1_streaming method with one DataFrame per source file
+        """
+        # Expected results
+        df_exp = self.df_report
+        # Test init
+        extract_date = '2022-12-17'
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        df_input = [self.df_src.loc[row:row] for row in range(1, 9)]
+        # Method execution
+        with patch.object(MetaProcess, "return_date_list",
+        return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                         self.meta_key, self.source_config, self.target_config)
+            df_result = xetra_etl.transform_report1_streaming(iter(df_input))
+        # Test after method execution
+        self.assertTrue(df_exp.equals(df_result))
+
+    def test_transform_report1_streaming_equals_batch(self):
+        """
+        Tests the transform_report1_streaming method returns the same result
+        as transform_report1 for shuffled multi-ISIN source data
+        """
+        # Test init
+        extract_date = '2022-12-17'
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        rng = np.random.default_rng(1)
+        rows = 600
+        df_input = pd.DataFrame({
+            'ISIN': rng.choice(['AT0000A0E9W5', 'DE0005190003', 'US0378331005'], rows),
+            'Mnemonic': 'SANT',
+            'Date': rng.choice(extract_date_list, rows),
+            'Time': [f'{hour:02d}:{minute:02d}' for hour, minute in
+                     zip(rng.integers(8, 17, rows), rng.integers(0, 60, rows))],
+            'StartPrice': rng.uniform(10, 30, rows).round(2),
+            'EndPrice': rng.uniform(10, 30, rows).round(2),
+            'MinPrice': rng.uniform(10, 30, rows).round(2),
+            'MaxPrice': rng.uniform(10, 30, rows).round(2),
+            'TradedVolume': rng.integers(1, 10000, rows)
+        }).drop_duplicates(subset=['ISIN', 'Date', 'Time']).reset_index(drop=True)
+        # Method execution
+        with patch.object(MetaProcess, "return_date_list",
+        return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                         self.meta_key, self.source_config, self.target_config)
+            df_exp = xetra_etl.transform_report1(df_input.copy())
+            df_result = xetra_etl.transform_report1_streaming(
+                df_input.iloc[start:start + 50] for start in range(0, len(df_input), 50))
+        # Test after method execution
+        self.assertTrue(df_exp.equals(df_result))
+        self.assertEqual(df_exp.to_parquet(index=False), df_result.to_parquet(index=False))
+
     def test_load(self):
         """
         Tests the load method
@@ -233,7 +335,7 @@ class TestXetraETLMethods(unittest.TestCase):
                 xetra_etl.load(df_input)
                 # Log test after method execution
                 self.assertIn(log1_exp, logm.output[1])
-                self.assertIn(log2_exp, logm.output[4])
+                self.assertIn(log2_exp, logm.output[3])
 
         # Test after method execution
         trg_file = self.s3_bucket_trg.list_files_in_prefix(self.target_config.trg_key)[0]
@@ -259,6 +361,71 @@ class TestXetraETLMethods(unittest.TestCase):
             }
         )
 
+    def test_load_compressed(self):
+        """
+        Tests that load writes the target file with the configured compression
+        and sort order
+        """
+        # Test init
+        target_config = self.target_config._replace(trg_format='csv', trg_compression='gzip',
+                                                    trg_sort_by=['daily_traded_volume'])
+        # Method execution
+        with patch.object(MetaProcess, "return_date_list",
+                          return_value=['2022-12-17', ['2022-12-16', '2022-12-17']]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                 self.meta_key, self.source_config, target_config)
+        xetra_etl.load(self.df_report)
+        # Test after method execution
+        trg_file = self.s3_bucket_trg.list_files_in_prefix(target_config.trg_key)[0]
+        df_result = self.s3_bucket_trg.read_csv_to_df(trg_file)
+        self.assertTrue(trg_file.endswith('.csv.gz'))
+        self.assertEqual([1088, 3586, 10286], list(df_result['daily_traded_volume']))
+
+    def test_load_partitioned(self):
+        """
+        Tests the load method with a date partitioned and ISIN bucketed target dataset
+        """
+        # Expected results
+        dates_exp = ['2022-12-17', '2022-12-18', '2022-12-19']
+        df_rerun = self.df_report.loc[1:1].reset_index(drop=True)
+        df_rerun['opening_price_eur'] = 99.99
+
+        # Test init
+        extract_date = '2022-12-17'
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        target_config = self.target_config._replace(trg_layout='partitioned',
+                                                    trg_isin_buckets=4)
+        prefix = target_config.trg_dataset_prefix
+
+        # Method execution
+        with patch.object(MetaProcess, "return_date_list",
+        return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                         self.meta_key, self.source_config, target_config)
+            xetra_etl.load(self.df_report)
+            files_first = {key: self.trg_bucket.Object(key=key).e_tag for key in
+                           self.s3_bucket_trg.list_files_in_prefix(f'{prefix}date=')}
+            xetra_etl.load(df_rerun)
+
+        # Test after method execution
+        manifest = self.s3_bucket_trg.read_json_from_s3(f'{prefix}_manifest.json')
+        self.assertEqual(dates_exp, list(manifest['partitions']))
+        self.assertEqual(3, len(files_first))
+        for key in files_first:
+            self.assertRegex(key, r'date=\d{4}-\d{2}-\d{2}/bucket-00[0-3]\.parquet$')
+        files_second = self.s3_bucket_trg.list_files_in_prefix(f'{prefix}date=')
+        for key in files_second:
+            if 'date=2022-12-18/' not in key:
+                self.assertEqual(files_first[key], self.trg_bucket.Object(key=key).e_tag)
+        rerun_key = manifest['partitions']['2022-12-18']['files'][0]['key']
+        df_result = pd.read_parquet(
+            BytesIO(self.trg_bucket.Object(key=rerun_key).get().get('Body').read()))
+        self.assertTrue(df_rerun.equals(df_result))
+        df_dataset = pd.concat([pd.read_parquet(
+            BytesIO(self.trg_bucket.Object(key=key).get().get('Body').read()))
+                                for key in sorted(files_second)], ignore_index=True)
+        self.assertEqual(dates_exp, list(df_dataset['Date']))
+
     def test_etl_report1(self):
         """
         Tests the etl_report1 method
@@ -302,6 +469,531 @@ class TestXetraETLMethods(unittest.TestCase):
             }
         )
 
+    def test_etl_report1_streaming(self):
+        """
+        Tests the etl_report1 method in streaming extract mode
+        """
+        # Expected results
+        df_exp = self.df_report
+
+        # Test init
+        extract_date = '2022-12-17'
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        source_config = self.source_config._replace(src_extract_mode='streaming',
+                                                    src_extract_workers=2)
+
+        # Method execution
+        with patch.object(MetaProcess, "return_date_list",
+        return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                         self.meta_key, source_config, self.target_config)
+            xetra_etl.etl_report1()
+
+        # Test after method execution
+        trg_file = self.s3_bucket_trg.list_files_in_prefix(self.target_config.trg_key)[0]
+        data = self.trg_bucket.Object(key=trg_file).get().get('Body').read()
+        df_result = pd.read_parquet(BytesIO(data))
+        self.assertTrue(df_exp.equals(df_result))
+
+    def test_etl_report1_typed_source(self):
+        """
+        Tests the etl_report1 method with a dtype schema and the pyarrow parser
+        in batch and streaming extract mode
+        """
+        # Expected results
+        df_exp = self.df_report
+
+        # Test init
+        extract_date = '2022-12-17'
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        src_dtypes = {'ISIN': 'category', 'Mnemonic': 'category', 'Date': 'category',
+                      'Time': 'category', 'StartPrice': 'float64', 'EndPrice': 'float64',
+                      'MinPrice': 'float64', 'MaxPrice': 'float64'}
+
+        for extract_mode in ['batch', 'streaming']:
+            source_config = self.source_config._replace(src_extract_mode=extract_mode,
+                                                        src_dtypes=src_dtypes,
+                                                        src_csv_engine='pyarrow')
+            # Method execution
+            with patch.object(MetaProcess, "return_date_list",
+            return_value=[extract_date, extract_date_list]):
+                xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                             self.meta_key, source_config, self.target_config)
+                if extract_mode == 'batch':
+                    df_result = xetra_etl.transform_report1(xetra_etl.extract())
+                else:
+                    df_result = xetra_etl.transform_report1_streaming(xetra_etl.extract_iter())
+
+            # Test after method execution
+            self.assertTrue(df_exp.equals(df_result))
+
+    def test_etl_report1_pyarrow_untyped_source(self):
+        """
+        Tests the etl_report1 method with the pyarrow parser and no dtype schema
+        """
+        # Expected results
+        df_exp = self.df_report
+
+        # Test init
+        extract_date = '2022-12-17'
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        source_config = self.source_config._replace(src_csv_engine='pyarrow')
+
+        # Method execution
+        with patch.object(MetaProcess, "return_date_list",
+                          return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                 self.meta_key, source_config, self.target_config)
+            df_result = xetra_etl.transform_report1(xetra_etl.extract())
+
+        # Test after method execution
+        self.assertTrue(df_exp.equals(df_result))
+
+    def test_transform_report1_categorical_unsorted_isins(self):
+        """
+        Tests that reports of categorical sources are sorted by ISIN and date with
+        both engines if the first source file lists the ISINs out of order
+        """
+        # Expected results
+        df_exp = self.df_report
+        keys_exp = [('AT0000A0E9W5', '2022-12-17'), ('AT0000A0E9W5', '2022-12-18'),
+                    ('AT0000A0E9W5', '2022-12-19'), ('DE000A0D6554', '2022-12-17')]
+
+        # Test init
+        extract_date = '2022-12-17'
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        data_de = [['DE000A0D6554', 'FLN', '2022-12-16', '12:00', 10.20, 10.30, 10.10, 10.40, 50],
+                   ['DE000A0D6554', 'FLN', '2022-12-17', '12:00', 10.50, 10.60, 10.40, 10.70, 40]]
+        df_de = pd.DataFrame(data_de, columns=self.df_src.columns)
+        self.s3_bucket_src.write_df_to_s3(pd.concat([df_de.loc[0:0], self.df_src.loc[1:1]]),
+                                          '2022-12-16/2022-12-16_BINS_XETR15.csv', 'csv')
+        self.s3_bucket_src.write_df_to_s3(pd.concat([df_de.loc[1:1], self.df_src.loc[2:2]]),
+                                          '2022-12-17/2022-12-17_BINS_XETR13.csv', 'csv')
+        src_dtypes = {'ISIN': 'category', 'Mnemonic': 'category', 'Date': 'category',
+                      'Time': 'category'}
+
+        for engine in ['default', 'single_pass']:
+            # Method execution
+            with patch.object(MetaProcess, "return_date_list",
+                              return_value=[extract_date, extract_date_list]):
+                xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key,
+                                     self.source_config._replace(src_dtypes=src_dtypes),
+                                     self.target_config._replace(trg_transform_engine=engine))
+                df_result = xetra_etl.transform_report1(xetra_etl.extract())
+
+            # Test after method execution
+            self.assertEqual(keys_exp, list(zip(df_result['ISIN'], df_result['Date'])))
+            self.assertTrue(df_exp.equals(df_result.loc[0:2]))
+
+    def test_etl_reports_single_extract(self):
+        """
+        Tests that XetraMultiReportETL reads every source file once for two reports
+        in batch and streaming extract mode
+        """
+        # Expected results
+        df_exp = self.df_report
+
+        # Test init
+        extract_date = '2022-12-17'
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        report_configs = [
+            XetraReportConfig('report1', 'meta/parquet.csv', self.target_config),
+            XetraReportConfig('report1', 'meta/csv.csv', self.target_config._replace(
+                trg_key='report1_csv/xetra_daily_report1_', trg_format='csv'))]
+
+        for extract_mode in ['batch', 'streaming']:
+            source_config = self.source_config._replace(src_extract_mode=extract_mode)
+            # Method execution
+            with patch.object(MetaProcess, "return_date_list",
+            return_value=[extract_date, extract_date_list]), \
+                    patch.object(self.s3_bucket_src, 'read_csv_to_df',
+                                 wraps=self.s3_bucket_src.read_csv_to_df) as mock_read:
+                xetra_etl = XetraMultiReportETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                                source_config, report_configs)
+                xetra_etl.etl_reports()
+
+            # Test after method execution
+            self.assertEqual(8, mock_read.call_count)
+            trg_parquet = self.s3_bucket_trg.list_files_in_prefix('report1/')[-1]
+            trg_csv = self.s3_bucket_trg.list_files_in_prefix('report1_csv/')[-1]
+            df_parquet = pd.read_parquet(BytesIO(
+                self.trg_bucket.Object(key=trg_parquet).get().get('Body').read()))
+            df_csv = self.s3_bucket_trg.read_csv_to_df(trg_csv)
+            self.assertTrue(df_exp.equals(df_parquet))
+            self.assertTrue(df_exp.equals(df_csv))
+            self.assertEqual(['meta/csv.csv', 'meta/parquet.csv'],
+                             self.s3_bucket_trg.list_files_in_prefix('meta/'))
+            self.s3_bucket_trg.delete_prefix('report1')
+
+    def test_etl_reports_unsupported_mode(self):
+        """
+        Tests that XetraMultiReportETL rejects the pipelined extract mode and
+        checkpoints instead of falling back to batch
+        """
+        # Test init
+        report_configs = [XetraReportConfig('report1', 'meta/parquet.csv', self.target_config)]
+        source_configs = [
+            self.source_config._replace(src_extract_mode='pipelined'),
+            self.source_config._replace(src_checkpoint_prefix='checkpoints/report1/')]
+        # Method execution and test after method execution
+        for source_config in source_configs:
+            with self.assertRaises(WrongConfigException):
+                XetraMultiReportETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                    source_config, report_configs)
+
+    def test_etl_report1_backfill_shards(self):
+        """
+        Tests that backfill shards with one day overlap equal a single run
+        and that their meta updates are merged into one meta file
+        """
+        # Expected results
+        df_exp = self.df_report
+        dates_exp = ['2022-12-17', '2022-12-18', '2022-12-19']
+
+        # Test init
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        with patch.object(MetaProcess, "return_date_list",
+        return_value=['2022-12-17', extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                 self.meta_key, self.source_config, self.target_config)
+            xetra_etl_shard = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                       self.meta_key, self.source_config, self.target_config)
+
+        # Method execution
+        shards = xetra_etl.backfill_shards(2)
+        shard_results = [xetra_etl_shard.etl_report1_shard(first_date, last_date)
+                         for first_date, last_date in shards]
+        xetra_etl.merge_backfill_shards(shard_results)
+
+        # Test after method execution
+        self.assertEqual([('2022-12-17', '2022-12-18'), ('2022-12-19', '2022-12-19')], shards)
+        trg_files = self.s3_bucket_trg.list_files_in_prefix(self.target_config.trg_key)
+        self.assertEqual(2, len(trg_files))
+        df_result = pd.concat([pd.read_parquet(BytesIO(
+            self.trg_bucket.Object(key=trg_file).get().get('Body').read()))
+                               for trg_file in trg_files], ignore_index=True)
+        df_result = df_result.sort_values(by=['Date']).reset_index(drop=True)
+        self.assertTrue(df_exp.equals(df_result))
+        df_meta = MetaProcess.read_meta_file(self.meta_key, self.s3_bucket_trg)
+        self.assertEqual(dates_exp, list(df_meta['source_date']))
+
+    def test_etl_report1_coordinated(self):
+        """
+        Tests that coordinated workers skip the shards leased by other workers and
+        merge their dates into the meta file without clobbering each other
+        """
+        # Expected results
+        df_exp = self.df_report
+        shards_exp = [('2022-12-17_2022-12-18/2022-12-17_2022-12-18', '2022-12-17', '2022-12-18'),
+                      ('2022-12-19_2022-12-20/2022-12-19_2022-12-19', '2022-12-19', '2022-12-19')]
+
+        # Test init
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        with patch.object(MetaProcess, "return_date_list",
+                          return_value=['2022-12-17', extract_date_list]):
+            xetra_etl_a = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                   self.meta_key, self.source_config, self.target_config)
+            xetra_etl_b = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                   self.meta_key, self.source_config, self.target_config)
+        lease_store_a = DateLeaseStore(self.s3_bucket_trg, 'leases/', worker_id='worker-a')
+        lease_store_b = DateLeaseStore(self.s3_bucket_trg, 'leases/', worker_id='worker-b')
+        # Worker b holds the first shard while worker a runs
+        lease_store_b.claim(*shards_exp[0])
+
+        # Method execution
+        shards = xetra_etl_a.coordinated_shards(2)
+        dates_a = xetra_etl_a.etl_report1_coordinated(lease_store_a, 2)
+        dates_b = xetra_etl_b.etl_report1_coordinated(lease_store_b, 2)
+
+        # Test after method execution
+        self.assertEqual(shards_exp, shards)
+        self.assertEqual(['2022-12-19'], dates_a)
+        self.assertEqual(['2022-12-17', '2022-12-18'], dates_b)
+        trg_files = self.s3_bucket_trg.list_files_in_prefix(self.target_config.trg_key)
+        df_result = pd.concat([self.s3_bucket_trg.read_parquet_to_df(trg_file)
+                               for trg_file in trg_files], ignore_index=True)
+        df_result = df_result.sort_values(by=['Date']).reset_index(drop=True)
+        self.assertTrue(df_exp.equals(df_result))
+        df_meta = MetaProcess.read_meta_file(self.meta_key, self.s3_bucket_trg)
+        self.assertEqual(['2022-12-19', '2022-12-17', '2022-12-18'],
+                         list(df_meta['source_date']))
+        self.assertEqual(['done', 'done'],
+                         [self.s3_bucket_trg.read_json_from_s3(lease)['state']
+                          for lease in self.s3_bucket_trg.list_files_in_prefix('leases/')])
+
+    def test_etl_report1_coordinated_lost_lease(self):
+        """
+        Tests that a worker losing its lease deletes the partition files it wrote and
+        the new holder writes every partition once
+        """
+        # Expected results
+        df_exp = self.df_report
+
+        # Test init
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        target_config = self.target_config._replace(trg_layout='partitioned')
+        prefix = target_config.trg_dataset_prefix
+        with patch.object(MetaProcess, "return_date_list",
+                          return_value=['2022-12-17', extract_date_list]):
+            xetra_etl_a = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                   self.meta_key, self.source_config, target_config)
+            xetra_etl_b = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                   self.meta_key, self.source_config, target_config)
+        # The leases of worker a expire at once and are taken over before the renewal
+        lease_store_a = DateLeaseStore(self.s3_bucket_trg, 'leases/', lease_ttl_s=-1,
+                                       worker_id='worker-a')
+        lease_store_b = DateLeaseStore(self.s3_bucket_trg, 'leases/', worker_id='worker-b')
+
+        # Method execution
+        with patch.object(lease_store_a, 'renew', return_value=None), \
+                self.assertLogs(level='WARNING') as logm:
+            dates_a = xetra_etl_a.etl_report1_coordinated(lease_store_a, 2)
+        files_a = self.s3_bucket_trg.list_files_in_prefix(f'{prefix}date=')
+        dates_b = xetra_etl_b.etl_report1_coordinated(lease_store_b, 2)
+
+        # Test after method execution
+        self.assertEqual([], dates_a)
+        self.assertEqual([], files_a)
+        self.assertIn('Lost the lease of shard', logm.output[0])
+        self.assertEqual(['2022-12-17', '2022-12-18', '2022-12-19'], dates_b)
+        manifest = self.s3_bucket_trg.read_json_from_s3(f'{prefix}_manifest.json')
+        files_b = self.s3_bucket_trg.list_files_in_prefix(f'{prefix}date=')
+        self.assertEqual(sorted(file['key'] for partition in manifest['partitions'].values()
+                                for file in partition['files']), files_b)
+        df_result = pd.concat([self.s3_bucket_trg.read_parquet_to_df(key) for key in files_b],
+                              ignore_index=True)
+        self.assertTrue(df_exp.equals(df_result))
+
+    def test_shards_skip_processed_dates(self):
+        """
+        Tests that backfill and coordinated shards only cover the spans of dates
+        missing in the meta file
+        """
+        # Test init
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        with patch.object(MetaProcess, "return_date_list",
+                          return_value=['2022-12-17', extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                 self.meta_key, self.source_config, self.target_config)
+
+        # Method execution
+        with patch.object(MetaProcess, "return_missing_date_spans",
+                          return_value=[('2022-12-17', '2022-12-17'),
+                                        ('2022-12-19', '2022-12-19')]):
+            backfill_shards = xetra_etl.backfill_shards(2)
+            coordinated_shards = xetra_etl.coordinated_shards(2)
+            # Grid cell 2022-12-17 to 2022-12-20 with 2022-12-18 processed
+            coordinated_shards_cell = xetra_etl.coordinated_shards(4)
+
+        # Test after method execution
+        self.assertEqual([('2022-12-17', '2022-12-17'), ('2022-12-19', '2022-12-19')],
+                         backfill_shards)
+        self.assertEqual([('2022-12-17_2022-12-18/2022-12-17_2022-12-17',
+                           '2022-12-17', '2022-12-17'),
+                          ('2022-12-19_2022-12-20/2022-12-19_2022-12-19',
+                           '2022-12-19', '2022-12-19')],
+                         coordinated_shards)
+        self.assertEqual([('2022-12-17_2022-12-20/2022-12-17_2022-12-17',
+                           '2022-12-17', '2022-12-17'),
+                          ('2022-12-17_2022-12-20/2022-12-19_2022-12-19',
+                           '2022-12-19', '2022-12-19')],
+                         coordinated_shards_cell)
+
+    def test_etl_report1_pipelined(self):
+        """
+        Tests that the pipelined etl_report1 writes one file per day equal to a batch run
+        """
+        # Expected results
+        df_exp = self.df_report
+
+        # Test init
+        extract_date = '2022-12-17'
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        source_config = self.source_config._replace(src_extract_mode='pipelined',
+                                                    src_pipeline_depth=1)
+
+        # Method execution
+        with patch.object(MetaProcess, "return_date_list",
+        return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                 self.meta_key, source_config, self.target_config)
+        with self.assertLogs() as logm:
+            overlap = xetra_etl.etl_report1_pipelined()
+
+        # Test after method execution
+        trg_files = self.s3_bucket_trg.list_files_in_prefix(self.target_config.trg_key)
+        self.assertEqual(3, len(trg_files))
+        df_result = pd.concat([pd.read_parquet(BytesIO(
+            self.trg_bucket.Object(key=trg_file).get().get('Body').read()))
+                               for trg_file in trg_files], ignore_index=True)
+        self.assertTrue(df_exp.equals(df_result))
+        self.assertEqual({'download', 'transform', 'upload'}, set(overlap))
+        self.assertTrue(any('Pipeline stage download' in log for log in logm.output))
+        df_meta = MetaProcess.read_meta_file(self.meta_key, self.s3_bucket_trg)
+        self.assertEqual(['2022-12-17', '2022-12-18', '2022-12-19'],
+                         list(df_meta['source_date']))
+
+    def test_etl_report1_pipelined_failure(self):
+        """
+        Tests that a failing stage stops the pipeline without updating the meta file
+        """
+        # Test init
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        source_config = self.source_config._replace(src_extract_mode='pipelined',
+                                                    src_pipeline_depth=1)
+        with patch.object(MetaProcess, "return_date_list",
+        return_value=['2022-12-17', extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                 self.meta_key, source_config, self.target_config)
+
+        # Method execution
+        with patch.object(xetra_etl, '_load_file', side_effect=ValueError('upload failed')):
+            with self.assertRaises(ValueError):
+                xetra_etl.etl_report1()
+
+        # Test after method execution
+        self.assertEqual([], self.s3_bucket_trg.list_files_in_prefix(self.meta_key))
+
+    def test_etl_report1_encoded(self):
+        """
+        Tests that encoded key columns are written as dictionary encoded parquet
+        columns with the values of a plain run in all extract modes
+        """
+        # Expected results
+        df_exp = self.df_report
+
+        # Test init
+        extract_date = '2022-12-17'
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        src_dtypes = {'ISIN': 'category', 'Mnemonic': 'category', 'Date': 'category',
+                      'Time': 'category'}
+        target_config = self.target_config._replace(trg_encoded=True)
+
+        for extract_mode in ['batch', 'streaming', 'pipelined']:
+            source_config = self.source_config._replace(src_extract_mode=extract_mode,
+                                                        src_dtypes=src_dtypes,
+                                                        src_csv_engine='pyarrow')
+            # Method execution
+            with patch.object(MetaProcess, "return_date_list",
+            return_value=[extract_date, extract_date_list]):
+                xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                     self.meta_key, source_config, target_config)
+            xetra_etl.etl_report1()
+
+            # Test after method execution
+            trg_files = self.s3_bucket_trg.list_files_in_prefix(target_config.trg_key)
+            tables = [pq.read_table(BytesIO(
+                self.trg_bucket.Object(key=trg_file).get().get('Body').read()))
+                      for trg_file in trg_files]
+            for table in tables:
+                self.assertTrue(pa.types.is_dictionary(table.schema.field('ISIN').type))
+                self.assertTrue(pa.types.is_dictionary(table.schema.field('Date').type))
+            df_result = pd.concat([table.to_pandas() for table in tables], ignore_index=True)
+            df_result = df_result.astype({'ISIN': str, 'Date': str})
+            self.assertTrue(df_exp.equals(df_result))
+            self.s3_bucket_trg.delete_prefix(target_config.trg_key)
+
+    def test_etl_report1_closing_state(self):
+        """
+        Tests that the closing state replaces the extraction of the day before
+        and is not used once it does not end on that day
+        """
+        # Expected results
+        df_exp = self.df_report.loc[2:2].reset_index(drop=True)
+
+        # Test init
+        state_key = 'meta/report1/closing_state.parquet'
+        for mode in ['batch', 'pipelined']:
+            source_config = self.source_config._replace(src_extract_mode=mode)
+            runs = [('2022-12-17', ['2022-12-16', '2022-12-17', '2022-12-18'], 'first'),
+                    ('2022-12-19', ['2022-12-18', '2022-12-19'], 'state'),
+                    ('2022-12-19', ['2022-12-18', '2022-12-19'], 'stale')]
+            reads = {}
+            for extract_date, extract_date_list, run in runs:
+                target_config = self.target_config._replace(
+                    trg_key=f'{mode}/{run}/xetra_daily_report1_',
+                    trg_state_key=f'{mode}/{state_key}')
+                # Method execution
+                with patch.object(MetaProcess, "return_date_list",
+                                  return_value=[extract_date, extract_date_list]):
+                    xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                         self.meta_key, source_config, target_config)
+                with patch.object(self.s3_bucket_src, 'read_csv_to_df',
+                                  wraps=self.s3_bucket_src.read_csv_to_df) as read_mock:
+                    xetra_etl.etl_report1()
+                reads[run] = read_mock.call_count
+                trg_file = self.s3_bucket_trg.list_files_in_prefix(target_config.trg_key)[0]
+                df_result = self.s3_bucket_trg.read_parquet_to_df(trg_file)
+                # Test after method execution
+                if run != 'first':
+                    self.assertTrue(df_exp.equals(df_result))
+            df_state = self.s3_bucket_trg.read_parquet_to_df(f'{mode}/{state_key}')
+            # Only the three files of 2022-12-19 are read with the state of 2022-12-18
+            self.assertEqual({'first': 5, 'state': 3, 'stale': 5}, reads)
+            self.assertEqual([['AT0000A0E9W5', '2022-12-19', 23.58]], df_state.values.tolist())
+
+    def test_etl_report1_checkpoint_resume(self):
+        """
+        Tests that a failed etl_report1 run resumes from the checkpoint of every
+        completed date and removes the checkpoints after success
+        """
+        # Expected results
+        df_exp = self.df_report
+
+        # Test init
+        extract_date = '2022-12-17'
+        extract_date_list = ['2022-12-16', '2022-12-17', '2022-12-18', '2022-12-19']
+        source_config = self.source_config._replace(src_checkpoint_prefix='checkpoints/report1/')
+        read_csv_to_df = self.s3_bucket_src.read_csv_to_df
+
+        def read_failing(key, **kwargs):
+            if key == '2022-12-19/2022-12-19_BINS_XETR08.csv':
+                raise ConnectionError('Connection reset')
+            return read_csv_to_df(key, **kwargs)
+
+        # Method execution
+        with patch.object(MetaProcess, "return_date_list",
+                          return_value=[extract_date, extract_date_list]):
+            xetra_etl_failing = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                         self.meta_key, source_config, self.target_config)
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                                 self.meta_key, source_config, self.target_config)
+        with patch.object(self.s3_bucket_src, 'read_csv_to_df', side_effect=read_failing):
+            with self.assertRaises(ConnectionError):
+                xetra_etl_failing.etl_report1()
+        checkpoints = self.s3_bucket_trg.read_json_from_s3('checkpoints/report1/_manifest.json')
+        with patch.object(self.s3_bucket_src, 'read_csv_to_df',
+                          wraps=read_csv_to_df) as read_mock:
+            xetra_etl.etl_report1()
+
+        # Test after method execution
+        self.assertEqual(['2022-12-16', '2022-12-17', '2022-12-18'], list(checkpoints))
+        self.assertEqual(['2022-12-17/2022-12-17_BINS_XETR13.csv',
+                          '2022-12-17/2022-12-17_BINS_XETR14.csv'],
+                         checkpoints['2022-12-17']['files'])
+        # Only the files of the unfinished date 2022-12-19 are read again
+        self.assertEqual(3, read_mock.call_count)
+        trg_file = self.s3_bucket_trg.list_files_in_prefix(self.target_config.trg_key)[0]
+        df_result = self.s3_bucket_trg.read_parquet_to_df(trg_file)
+        self.assertTrue(df_exp.equals(df_result))
+        self.assertEqual([], self.s3_bucket_trg.list_files_in_prefix('checkpoints/'))
+
+    def test_checkpoint_prefix_invalid(self):
+        """
+        Tests that a checkpoint prefix that could delete other objects is rejected
+        before anything is deleted
+        """
+        # Test init
+        self.s3_bucket_trg.write_json_to_s3({}, 'report1/keep.json')
+        # Method execution and test after method execution
+        for prefix in ['', '/', 'checkpoints']:
+            source_config = self.source_config._replace(src_checkpoint_prefix=prefix)
+            with self.assertRaises(WrongConfigException):
+                XetraETL(self.s3_bucket_src, self.s3_bucket_trg,
+                         self.meta_key, source_config, self.target_config)
+        self.assertEqual(['report1/keep.json'],
+                         self.s3_bucket_trg.list_files_in_prefix('report1/'))
+
     def tearDown(self):
         """
         Execute after unit tests
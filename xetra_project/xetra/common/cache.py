@@ -0,0 +1,123 @@
+"""
+Local on-disk cache for immutable S3 objects
+"""
+
+import os
+import shutil
+import logging
+import hashlib
+import tempfile
+import threading
+
+
+class LocalObjectCache():
+    """
+    Content-addressed cache of S3 objects on the local disk
+
+    Objects are stored under a hash of bucket, key and ETag, so a changed object
+    never hits a stale entry. The least recently used entries are evicted once
+    the cache grows beyond its size cap.
+    """
+    def __init__(self, cache_dir: str, max_size_mb: int):
+        """
+        Constructor for LocalObjectCache
+
+        :param cache_dir: directory of the cached objects, created if missing
+        :param max_size_mb: size cap of the cache in MiB
+        """
+        self._logger = logging.getLogger(__name__)
+        self.cache_dir = cache_dir
+        self.max_size = max_size_mb * 2 ** 20
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in os.scandir(cache_dir)
+                         if entry.is_file() and not entry.name.startswith('.'))
+
+    def entry_path(self, bucket: str, key: str, etag: str):
+        """
+        Path of the cache entry of an object
+
+        :param bucket: S3 bucket name
+        :param key: key of the object
+        :param etag: ETag of the object
+        """
+        digest = hashlib.sha256(f'{bucket}/{key}/{etag}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest)
+
+    def get(self, bucket: str, key: str, etag: str):
+        """
+        Look up an object in the cache
+
+        :param bucket: S3 bucket name
+        :param key: key of the object
+        :param etag: ETag of the object
+
+        returns:
+            path: path of the cached object or None on a miss
+        """
+        path = self.entry_path(bucket, key, etag)
+        try:
+            # The modification time orders the entries for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            self._logger.info('Cache miss for %s/%s (hits: %s, misses: %s)',
+                              bucket, key, self.hits, self.misses)
+            return None
+        with self._lock:
+            self.hits += 1
+        self._logger.info('Cache hit for %s/%s (hits: %s, misses: %s)',
+                          bucket, key, self.hits, self.misses)
+        return path
+
+    def put(self, bucket: str, key: str, etag: str, body):
+        """
+        Stream an object into the cache and open the cached object
+
+        The entry is opened before other threads can evict it, the open file
+        stays readable after an eviction.
+
+        :param bucket: S3 bucket name
+        :param key: key of the object
+        :param etag: ETag of the object
+        :param body: binary file-like object with the object content
+
+        returns:
+            cached: binary file object of the cached object, closed by the caller
+        """
+        path = self.entry_path(bucket, key, etag)
+        # Write to a hidden temporary file first, so readers never see partial entries
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.')
+        with os.fdopen(file_descriptor, 'wb') as tmp_file:
+            shutil.copyfileobj(body, tmp_file)
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            # Returned to the caller, who closes it
+            cached = open(path, 'rb')  # pylint: disable=consider-using-with
+            self._size += size - replaced
+            self.__evict(keep=path)
+        return cached
+
+    def __evict(self, keep: str):
+        """
+        Helper function for self.put() removing least recently used entries above the size cap
+
+        :param keep: path of the entry that was just written
+        """
+        if self._size <= self.max_size:
+            return
+        entries = sorted((entry for entry in os.scandir(self.cache_dir)
+                          if entry.is_file() and not entry.name.startswith('.')
+                          and entry.path != keep),
+                         key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if self._size <= self.max_size:
+                break
+            self._size -= entry.stat().st_size
+            os.remove(entry.path)
+            self._logger.info('Cache evicted %s', entry.name)
@@ -13,6 +13,40 @@ class S3FileTypes(Enum):
     PARQUET = 'parquet'
 
 
+class CsvEngine(Enum):
+    """
+    Supported csv parsers of S3BucketConnector.read_csv_to_df
+    """
+
+    C = 'c'
+    PYARROW = 'pyarrow'
+
+
+class CompressionTypes(Enum):
+    """
+    Supported compressions of S3BucketConnector
+    """
+
+    GZIP = 'gzip'
+    ZSTD = 'zstd'
+
+    @property
+    def extension(self):
+        """
+        Key extension of the compression
+        """
+        return {'gzip': '.gz', 'zstd': '.zst'}[self.value]
+
+
+class TargetLayout(Enum):
+    """
+    Layouts of the XetraETL target data
+    """
+
+    FILE = 'file'
+    PARTITIONED = 'partitioned'
+
+
 class MetaProcessFormat(Enum):
     """
     Formation for MetaProcessclass
@@ -23,3 +57,42 @@ class MetaProcessFormat(Enum):
     META_SOURCE_DATE_COL = 'source_date'
     META_PROCESS_COL = 'datetime_of_processing'
     META_FILE_FORMAT = 'csv'
+    META_PARQUET_FILE_FORMAT = 'parquet'
+
+
+class ExtractMode(Enum):
+    """
+    Extraction modes of XetraETL
+    """
+
+    BATCH = 'batch'
+    STREAMING = 'streaming'
+    PIPELINED = 'pipelined'
+
+
+class TransformEngine(Enum):
+    """
+    Aggregation engines of XetraETL.transform_report1
+    """
+
+    DEFAULT = 'default'
+    SINGLE_PASS = 'single_pass'
+
+
+class ConnectorType(Enum):
+    """
+    Supported storage backends of the bucket connectors
+    """
+
+    S3 = 's3'
+    LOCAL = 'local'
+
+
+class LeaseState(Enum):
+    """
+    States of the date shard leases of coordinated workers
+    """
+
+    HELD = 'held'
+    DONE = 'done'
+    RELEASED = 'released'
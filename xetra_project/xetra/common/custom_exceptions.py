@@ -15,3 +15,17 @@ class WrongMetaFileException(Exception):
 
     Exception raised when the meta file is not correct
     """
+
+class ConditionalWriteException(Exception):
+    """
+    ConditionalWriteException class
+
+    Exception raised when a conditional write finds the object changed by another writer
+    """
+
+class WrongConfigException(Exception):
+    """
+    WrongConfigException class
+
+    Exception raised when a configuration value is not valid
+    """
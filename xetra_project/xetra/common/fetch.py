@@ -0,0 +1,216 @@
+"""
+Resilient fetching of S3 objects with retries and hedged requests
+"""
+
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError,\
+    ReadTimeoutError, IncompleteReadError, ResponseStreamingError
+
+# Error codes of S3 worth another attempt: throttling and server side errors
+RETRYABLE_ERROR_CODES = {'SlowDown', 'Throttling', 'ThrottlingException', 'RequestTimeout',
+                         'RequestTimeTooSkewed', 'InternalError', 'ServiceUnavailable',
+                         '500', '502', '503', '504'}
+# Exceptions is_retryable() may accept, anything else is raised at once
+RETRYABLE_EXCEPTIONS = (ClientError, BotoConnectionError, ReadTimeoutError, IncompleteReadError,
+                        ResponseStreamingError, ConnectionError, TimeoutError)
+# Upper bounds in milliseconds of the latency histogram buckets, the last bucket is open
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Successful attempts the hedging percentile is computed from
+LATENCY_WINDOW = 1000
+
+
+def is_retryable(error: BaseException):
+    """
+    Whether a failed request is worth another attempt
+
+    :param error: exception raised by the request
+    """
+    if isinstance(error, ClientError):
+        response = error.response
+        return response.get('Error', {}).get('Code') in RETRYABLE_ERROR_CODES \
+            or response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500
+    return isinstance(error, RETRYABLE_EXCEPTIONS)
+
+
+class ResilientFetcher():
+    """
+    Class running requests with exponential backoff retries and hedged duplicates
+
+    A request is a callable without arguments returning the complete response,
+    e.g. the body of a GET read into memory. Retryable errors are retried with
+    full jitter backoff. With hedge_percentile set, an attempt still running
+    after that percentile of the recent attempt latencies gets a duplicate
+    request and the first successful response wins. Every attempt is recorded
+    in a latency histogram logged by log_histogram().
+    """
+    def __init__(self, max_attempts: int = 5, base_delay_s: float = 0.1,
+                 max_delay_s: float = 5.0, hedge_percentile: float = None,
+                 hedge_min_samples: int = 20, hedge_workers: int = 16):
+        """
+        Constructor for ResilientFetcher
+
+        :param max_attempts: attempts of a request including the first one
+        :param base_delay_s: backoff delay before the second attempt, doubled per attempt
+        :param max_delay_s: upper bound of the backoff delay
+        :param hedge_percentile: latency percentile after which a duplicate request is
+            sent, e.g. 95, None -> no hedged requests
+        :param hedge_min_samples: successful attempts needed before requests are hedged
+        :param hedge_workers: threads running hedged requests, at least twice the
+            number of concurrent callers
+        """
+        self._logger = logging.getLogger(__name__)
+        self.max_attempts = max_attempts
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_workers = hedge_workers
+        self.stats = {'requests': 0, 'attempts': 0, 'errors': 0, 'retries': 0,
+                      'hedges': 0, 'hedge_wins': 0, 'failures': 0}
+        self.histogram = np.zeros(len(LATENCY_BUCKETS_MS) + 1, dtype=np.int64)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def fetch(self, request):
+        """
+        Run a request with retries and, if enabled, hedged duplicates
+
+        :param request: callable without arguments returning the response
+
+        returns:
+          response: return value of the first successful attempt
+        """
+        self.__count(requests=1)
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return self.__attempt(request)
+            except RETRYABLE_EXCEPTIONS as error:
+                if attempt == self.max_attempts or not is_retryable(error):
+                    self.__count(failures=1)
+                    raise
+                delay = random.uniform(0, min(self.max_delay_s,
+                                              self.base_delay_s * 2 ** (attempt - 1)))
+                self._logger.warning('Attempt %s of %s failed with %r, retrying in %.3f s.',
+                                     attempt, self.max_attempts, error, delay)
+                self.__count(retries=1)
+                time.sleep(delay)
+        return None
+
+    def hedge_delay(self):
+        """
+        Seconds after which an attempt gets a hedged duplicate, None -> no hedging
+        """
+        if self.hedge_percentile is None:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            return float(np.percentile(self._latencies, self.hedge_percentile))
+
+    def log_histogram(self):
+        """
+        Log the latency histogram of all attempts and the retry and hedging counters
+
+        returns:
+          stats: counters and the histogram as bucket label to number of attempts
+        """
+        with self._lock:
+            histogram = self.histogram.tolist()
+            stats = dict(self.stats)
+            latencies = np.array(self._latencies)
+        labels = [f'<={bound}ms' for bound in LATENCY_BUCKETS_MS] \
+            + [f'>{LATENCY_BUCKETS_MS[-1]}ms']
+        stats['histogram'] = dict(zip(labels, histogram))
+        percentiles = ', '.join(
+            f'p{percentile} {np.percentile(latencies, percentile) * 1000:.1f} ms'
+            for percentile in (50, 95, 99)) if latencies.size else 'n/a'
+        self._logger.info('Fetch latency per attempt: %s; %s; %s requests, %s attempts, '
+                          '%s errors, %s retries, %s hedges (%s won), %s failures.',
+                          ' '.join(f'{label}: {count}' for label, count
+                                   in stats['histogram'].items() if count),
+                          percentiles, stats['requests'], stats['attempts'], stats['errors'],
+                          stats['retries'], stats['hedges'], stats['hedge_wins'],
+                          stats['failures'])
+        return stats
+
+    def __attempt(self, request):
+        """
+        Helper function running one attempt, hedged once it exceeds self.hedge_delay()
+
+        :param request: callable without arguments returning the response
+        """
+        delay = self.hedge_delay()
+        if delay is None:
+            return self.__timed(request)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.hedge_workers,
+                                                    thread_name_prefix='hedge')
+        primary = self._executor.submit(self.__timed, request)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        self.__count(hedges=1)
+        hedge = self._executor.submit(self.__timed, request)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.__count(hedge_wins=1)
+                    # The slower request finishes in the background, its result is dropped
+                    return future.result()
+                error = future.exception()
+                if not is_retryable(error):
+                    # The other request would fail the same way, e.g. on a missing key
+                    raise error
+        raise error
+
+    def __timed(self, request):
+        """
+        Helper function running a request and recording its latency
+
+        :param request: callable without arguments returning the response
+        """
+        start = time.perf_counter()
+        try:
+            response = request()
+        except Exception:
+            self.__record(time.perf_counter() - start, success=False)
+            raise
+        self.__record(time.perf_counter() - start, success=True)
+        return response
+
+    def __record(self, latency: float, success: bool):
+        """
+        Helper function adding an attempt to the histogram
+
+        :param latency: seconds of the attempt
+        :param success: False if the attempt raised an error
+        """
+        bucket = int(np.searchsorted(LATENCY_BUCKETS_MS, latency * 1000))
+        with self._lock:
+            self.histogram[bucket] += 1
+            self.stats['attempts'] += 1
+            if success:
+                self._latencies.append(latency)
+            else:
+                self.stats['errors'] += 1
+
+    def __count(self, **counters):
+        """
+        Helper function adding to the counters of self.stats
+        """
+        with self._lock:
+            for name, value in counters.items():
+                self.stats[name] += value
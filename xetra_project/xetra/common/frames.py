@@ -0,0 +1,31 @@
+"""
+Methods combining Pandas DataFrames
+"""
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+def concat_frames(data_frames: list):
+    """
+    Concatenate DataFrames keeping their categorical columns categorical
+
+    Categorical columns get the union of all categories, sorted, before
+    concatenating, otherwise pandas falls back to plain string columns.
+
+    :param data_frames: list of Pandas DataFrames with the same columns
+
+    returns:
+      data_frame: concatenated Pandas DataFrame, empty if data_frames is empty
+    """
+    if not data_frames:
+        return pd.DataFrame()
+    for column in data_frames[0].select_dtypes(include='category'):
+        if all(isinstance(data_frame[column].dtype, pd.CategoricalDtype)
+               for data_frame in data_frames):
+            categories = union_categoricals(
+                [data_frame[column] for data_frame in data_frames],
+                sort_categories=True).categories
+            for data_frame in data_frames:
+                data_frame[column] = data_frame[column].cat.set_categories(categories)
+    return pd.concat(data_frames, ignore_index=True)
@@ -0,0 +1,176 @@
+"""
+Opt-in instrumentation of the ETL stages
+"""
+
+import json
+import time
+import logging
+import resource
+import threading
+import functools
+
+# Active recorder, None while instrumentation is disabled
+_RECORDER = None
+
+
+class StageRecorder():
+    """
+    Class aggregating wall time, bytes and rows per stage
+
+    Counters go to the innermost open stage of the calling thread. Closing a
+    stage adds its bytes to the enclosing stage, so e.g. extract includes the
+    bytes of the nested reads. Rows are not passed on, every stage counts the
+    rows it returns itself. process_peak_rss_mb is the peak
+    RSS of the whole process up to the end of the stage (ru_maxrss), not the
+    memory of the stage itself: a stage following a larger one reports the
+    earlier peak.
+    """
+    COUNTERS = ('bytes_read', 'bytes_written', 'rows')
+    # Counters a closed stage adds to the enclosing stage
+    NESTED_COUNTERS = ('bytes_read', 'bytes_written')
+
+    def __init__(self, output_path: str = None):
+        """
+        Constructor for StageRecorder
+
+        :param output_path: path of the JSON file written by report(), None -> logs only
+        """
+        self._logger = logging.getLogger(__name__)
+        self.output_path = output_path
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _frames(self):
+        """
+        Stack of the counters of the open stages of the current thread
+        """
+        if not hasattr(self._local, 'frames'):
+            self._local.frames = []
+        return self._local.frames
+
+    def start(self):
+        """
+        Open a stage of the current thread
+        """
+        self._frames().append(dict.fromkeys(self.COUNTERS, 0))
+
+    def count(self, **counters):
+        """
+        Add counters to the innermost open stage of the current thread
+
+        :param counters: bytes_read, bytes_written and/or rows
+        """
+        frames = self._frames()
+        if frames:
+            for name, value in counters.items():
+                frames[-1][name] += value
+
+    def stop(self, stage: str, wall_time: float):
+        """
+        Close the innermost stage of the current thread and aggregate it
+
+        :param stage: name of the stage
+        :param wall_time: seconds spent in the stage
+        """
+        frames = self._frames()
+        counters = frames.pop()
+        if frames:
+            for name in self.NESTED_COUNTERS:
+                frames[-1][name] += counters[name]
+        # ru_maxrss is reported in KiB on Linux
+        process_peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+        with self._lock:
+            record = self.stages.setdefault(stage, {
+                'stage': stage, 'calls': 0, 'wall_time_s': 0.0,
+                **dict.fromkeys(self.COUNTERS, 0), 'process_peak_rss_mb': 0.0})
+            record['calls'] += 1
+            record['wall_time_s'] += wall_time
+            for name, value in counters.items():
+                record[name] += value
+            record['process_peak_rss_mb'] = max(record['process_peak_rss_mb'],
+                                                round(process_peak_rss_mb, 1))
+
+    def report(self):
+        """
+        Emit one structured log record per stage and write the JSON file
+
+        returns:
+            records: list of the stage records
+        """
+        with self._lock:
+            records = [dict(record, wall_time_s=round(record['wall_time_s'], 6))
+                       for record in self.stages.values()]
+        for record in records:
+            self._logger.info('Stage %s: %s', record['stage'], json.dumps(record),
+                              extra={'instrumentation': record})
+        if self.output_path:
+            with open(self.output_path, 'w', encoding='utf-8') as output:
+                json.dump(records, output, indent=2)
+        return records
+
+
+def enable(output_path: str = None):
+    """
+    Enable the instrumentation with a new StageRecorder
+
+    :param output_path: path of the JSON file written by report(), None -> logs only
+
+    returns:
+        recorder: the active StageRecorder
+    """
+    global _RECORDER  # pylint: disable=global-statement
+    _RECORDER = StageRecorder(output_path)
+    return _RECORDER
+
+
+def disable():
+    """
+    Disable the instrumentation
+    """
+    global _RECORDER  # pylint: disable=global-statement
+    _RECORDER = None
+
+
+def count(**counters):
+    """
+    Add counters to the current stage, no-op while disabled
+
+    :param counters: bytes_read, bytes_written and/or rows
+    """
+    if _RECORDER is not None:
+        _RECORDER.count(**counters)
+
+
+def report():
+    """
+    Report the recorded stages, no-op while disabled
+
+    returns:
+        records: list of the stage records, None while disabled
+    """
+    if _RECORDER is None:
+        return None
+    return _RECORDER.report()
+
+
+def instrument(stage: str):
+    """
+    Decorator recording a function call as stage, calls it directly while disabled
+
+    :param stage: name of the stage
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = _RECORDER
+            if recorder is None:
+                return func(*args, **kwargs)
+            recorder.start()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                recorder.stop(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
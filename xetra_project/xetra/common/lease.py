@@ -0,0 +1,154 @@
+"""
+Leases on date shards coordinating several workers through conditional writes
+"""
+
+import os
+import json
+import time
+import socket
+import logging
+from typing import NamedTuple
+
+from xetra.common.s3 import S3BucketConnector
+from xetra.common.constants import LeaseState
+from xetra.common.custom_exceptions import ConditionalWriteException
+
+
+class DateLease(NamedTuple):
+    """
+    Class for a lease held on a date shard
+
+    key: key of the lease object
+    etag: ETag of the lease object written by the holder
+    first_date: first date of the shard to be processed
+    last_date: last date of the shard to be processed
+    """
+
+    key: str
+    etag: str
+    first_date: str
+    last_date: str
+
+
+class DateLeaseStore():
+    """
+    Class claiming date shards through lease objects in a bucket
+
+    Every shard has a lease object {lease_prefix}{shard}.json. A worker claims a
+    shard by creating the lease object with If-None-Match or by replacing an
+    expired, released or outdated lease with If-Match on the ETag it read, so
+    exactly one of several racing workers gets the lease. The holder changes
+    the lease again with If-Match, which fails once another worker took over.
+    """
+    def __init__(self, s3_bucket: S3BucketConnector, lease_prefix: str, lease_ttl_s: int = 3600,
+                 worker_id: str = None):
+        """
+        Constructor for DateLeaseStore
+
+        :param s3_bucket: connection to the bucket with the lease objects
+        :param lease_prefix: prefix of the lease objects
+        :param lease_ttl_s: seconds after which a held lease may be taken over,
+            longer than processing a shard takes
+        :param worker_id: name of the worker in the lease objects, None -> host name and pid
+        """
+        self._logger = logging.getLogger(__name__)
+        self.s3_bucket = s3_bucket
+        self.lease_prefix = lease_prefix
+        self.lease_ttl_s = lease_ttl_s
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+
+    def claim(self, shard: str, first_date: str, last_date: str):
+        """
+        Claim a shard for the dates first_date to last_date
+
+        A done lease only covers the dates up to its last date, so a shard is
+        claimed again once later dates of the shard are missing. A restarted
+        worker with the same worker_id takes its own held leases back.
+
+        :param shard: name of the shard, e.g. the first and last date of its date range
+        :param first_date: first date of the shard to be processed
+        :param last_date: last date of the shard to be processed
+
+        returns:
+          lease: DateLease, None if another worker holds or completed the shard
+        """
+        key = f'{self.lease_prefix}{shard}.json'
+        try:
+            body, etag = self.s3_bucket.read_object_with_etag(key)
+        except self.s3_bucket.exceptions.NoSuchKey:
+            body, etag = None, None
+        if body is not None:
+            lease = json.loads(body)
+            if lease['state'] == LeaseState.DONE.value and lease['last_date'] >= last_date:
+                return None
+            if lease['state'] == LeaseState.HELD.value and lease['expires'] > time.time() \
+                    and lease['owner'] != self.worker_id:
+                self._logger.info('Shard %s is held by %s.', shard, lease['owner'])
+                return None
+        try:
+            etag = self.__write(key, LeaseState.HELD.value, first_date, last_date, etag)
+        except ConditionalWriteException:
+            self._logger.info('Shard %s was claimed by another worker.', shard)
+            return None
+        self._logger.info('Worker %s claimed shard %s for %s to %s.', self.worker_id, shard,
+                          first_date, last_date)
+        return DateLease(key, etag, first_date, last_date)
+
+    def renew(self, lease: DateLease):
+        """
+        Extend a held lease by lease_ttl_s
+
+        :param lease: DateLease returned by claim
+
+        returns:
+          lease: renewed DateLease, None if another worker took the lease over
+        """
+        return self.__replace(lease, LeaseState.HELD.value)
+
+    def complete(self, lease: DateLease):
+        """
+        Mark the dates of a lease as processed
+
+        :param lease: DateLease returned by claim or renew
+
+        returns:
+          lease: completed DateLease, None if another worker took the lease over
+        """
+        return self.__replace(lease, LeaseState.DONE.value)
+
+    def release(self, lease: DateLease):
+        """
+        Give a lease up, e.g. after a failure, so another worker can claim it at once
+
+        :param lease: DateLease returned by claim or renew
+        """
+        return self.__replace(lease, LeaseState.RELEASED.value)
+
+    def __replace(self, lease: DateLease, state: str):
+        """
+        Helper function changing the state of a lease still held by this worker
+
+        :param lease: DateLease returned by claim or renew
+        :param state: new LeaseState value
+        """
+        try:
+            etag = self.__write(lease.key, state, lease.first_date, lease.last_date, lease.etag)
+        except ConditionalWriteException:
+            self._logger.warning('Lease %s was taken over by another worker.', lease.key)
+            return None
+        return lease._replace(etag=etag)
+
+    def __write(self, key: str, state: str, first_date: str, last_date: str, etag: str):
+        """
+        Helper function writing a lease object conditionally on its ETag
+
+        :param key: key of the lease object
+        :param state: LeaseState value
+        :param first_date: first date of the shard to be processed
+        :param last_date: last date of the shard to be processed
+        :param etag: ETag the lease object must still have, None -> it must not exist
+        """
+        lease = {'owner': self.worker_id, 'state': state, 'first_date': first_date,
+                 'last_date': last_date, 'expires': time.time() + self.lease_ttl_s}
+        return self.s3_bucket.write_object_conditional(
+            json.dumps(lease, indent=2).encode('utf-8'), key, etag)
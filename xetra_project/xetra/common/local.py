@@ -0,0 +1,281 @@
+"""
+Connector to local filesystem mirrors of S3 buckets
+"""
+
+import os
+import contextlib
+import json
+import fcntl
+import hashlib
+import logging
+import tempfile
+from types import SimpleNamespace
+
+import pandas as pd
+import pyarrow as pa
+
+from xetra.common import instrumentation
+from xetra.common.s3 import WriteOptions, infer_compression, parse_csv, serialize_df
+from xetra.common.constants import S3FileTypes, CsvEngine
+from xetra.common.custom_exceptions import WrongFormatException, ConditionalWriteException
+
+
+class LocalBucketConnector():
+    """
+    Class for interacting with a local directory like with a S3 bucket
+
+    Offers the methods of S3BucketConnector used by XetraETL and MetaProcess.
+    Keys are paths relative to the bucket directory and files are read
+    through memory maps.
+    """
+    def __init__(self, root_dir: str, bucket: str):
+        """
+        Constructor for LocalBucketConnector
+
+        :param root_dir: directory holding one directory per bucket
+        :param bucket: bucket name, the directory below root_dir
+        """
+        self._logger = logging.getLogger(__name__)
+        self.endpoint_url = f'file://{os.path.abspath(root_dir)}'
+        self.bucket_dir = os.path.join(root_dir, bucket)
+        os.makedirs(self.bucket_dir, exist_ok=True)
+        # Same attribute as S3BucketConnector.exceptions for missing keys
+        self.exceptions = SimpleNamespace(NoSuchKey=FileNotFoundError)
+
+    def path(self, key: str):
+        """
+        Local path of a key
+
+        :param key: key of the file
+        """
+        return os.path.join(self.bucket_dir, *key.split('/'))
+
+    @instrumentation.instrument('local.list_files_in_prefix')
+    def list_files_in_prefix(self, prefix: str):
+        """
+        Listing all files with a prefix in the bucket directory
+
+        :param prefix: prefix in the bucket directory that should be filtered
+
+        returns:
+            files: sorted list of all file names containing the prefix in the key
+        """
+        # Only the directory part of the prefix has to be walked
+        top = self.path(prefix.rsplit('/', 1)[0]) if '/' in prefix else self.bucket_dir
+        files = []
+        for directory, _, names in os.walk(top):
+            relative = os.path.relpath(directory, self.bucket_dir).replace(os.sep, '/')
+            for name in names:
+                key = name if relative == '.' else f'{relative}/{name}'
+                if key.startswith(prefix) and not name.startswith('.'):
+                    files.append(key)
+        return sorted(files)
+
+    def list_files_in_range(self, first_prefix: str, last_prefix: str = None):
+        """
+        Listing all files from first_prefix up to and including last_prefix
+
+        :param first_prefix: first prefix in key order that should be listed
+        :param last_prefix: last prefix in key order that should be listed, None -> all
+
+        returns:
+            files: list of all file names in the range in key order
+        """
+        return [key for key in self.list_files_in_prefix('')
+                if key >= first_prefix
+                and (last_prefix is None or key[:len(last_prefix)] <= last_prefix)]
+
+    def list_files_with_manifest(self, first_prefix: str, last_prefix: str, manifest_key: str,
+                                 s3_bucket_manifest):
+        """
+        Listing all files from first_prefix up to and including last_prefix
+
+        Local listings are cheap, so the key manifest of S3BucketConnector is not used.
+
+        :param first_prefix: first prefix in key order that should be listed
+        :param last_prefix: last prefix in key order that should be listed
+        :param manifest_key: key of the key manifest, unused
+        :param s3_bucket_manifest: connector for the bucket with the manifest, unused
+
+        returns:
+            files: list of all file names in the range in key order
+        """
+        # pylint: disable=unused-argument
+        return self.list_files_in_range(first_prefix, last_prefix)
+
+    @instrumentation.instrument('local.read_csv_to_df')
+    def read_csv_to_df(self, key: str, encoding: str = 'utf-8', sep: str = ',',
+                       usecols: list = None, dtype: dict = None,
+                       engine: str = CsvEngine.C.value, compression: str = 'infer'):
+        """
+        Read csv file from the bucket directory through a memory map
+
+        :param key: key of file to be read
+        :encoding: encoding of the data inside csv file
+        :sep: separator of csv file
+        :usecols: columns to be parsed, all columns if None
+        :dtype: mapping of column name to dtype, inferred if None
+        :engine: csv parser, 'c' (pandas) or 'pyarrow'
+        :compression: 'gzip', 'zstd', None or 'infer' from the key extension
+
+        returns:
+            data-frame: Pandas Dataframe containing CSV file data
+        """
+        self._logger.info('Reading file %s/%s', self.bucket_dir, key)
+        if compression == 'infer':
+            compression = infer_compression(key)
+        with pa.memory_map(self.path(key), 'r') as data:
+            instrumentation.count(bytes_read=data.size())
+            data_frame = parse_csv(data, encoding, sep, usecols, dtype, engine, compression)
+        instrumentation.count(rows=len(data_frame))
+        return data_frame
+
+    def read_parquet_to_df(self, key: str):
+        """
+        Read parquet file from the bucket directory through a memory map
+
+        :param key: key of file to be read
+
+        returns:
+            data-frame: Pandas Dataframe containing parquet file data
+        """
+        self._logger.info('Reading file %s/%s', self.bucket_dir, key)
+        return pd.read_parquet(self.path(key), memory_map=True)
+
+    def read_json_from_s3(self, key: str):
+        """
+        Read a json object from the bucket directory
+
+        :param key: key of the json file
+        """
+        with open(self.path(key), encoding='utf-8') as json_file:
+            return json.load(json_file)
+
+    def write_json_to_s3(self, data, key: str):
+        """
+        Write a json object to the bucket directory
+
+        :param data: json serialisable object
+        :param key: target key of the json file
+        """
+        self.__write_file(json.dumps(data, indent=2).encode('utf-8'), key)
+        return True
+
+    def read_object_with_etag(self, key: str):
+        """
+        Read a file together with an ETag of its content for a following conditional write
+
+        :param key: key of the file
+
+        returns:
+            body: content of the file
+            etag: quoted MD5 hex digest of the content, like the ETag of a S3 PUT
+        """
+        with open(self.path(key), 'rb') as data:
+            body = data.read()
+        return body, f'"{hashlib.md5(body).hexdigest()}"'
+
+    def write_object_conditional(self, body: bytes, key: str, etag: str = None):
+        """
+        Write a file only if no other writer changed it since it was read
+
+        Writers are serialised by an exclusive lock on a hidden lock file next to
+        the file, so only POSIX filesystems are supported.
+
+        :param body: content of the file
+        :param key: target key of the file
+        :param etag: ETag the file must still have, None -> the file must not exist
+
+        returns:
+            etag: ETag of the written file
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock_path = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.lock')
+        with open(lock_path, 'a', encoding='utf-8') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                current = self.read_object_with_etag(key)[1]
+            except FileNotFoundError:
+                current = None
+            if current != etag:
+                raise ConditionalWriteException(key)
+            self.__write_file(body, key)
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def delete_prefix(self, prefix: str):
+        """
+        Delete all files with a prefix in the bucket directory
+
+        :param prefix: prefix in the bucket directory that should be deleted
+
+        returns:
+            keys: list of deleted keys
+        """
+        keys = self.delete_files(self.list_files_in_prefix(prefix))
+        if keys:
+            self._logger.info('Deleted %s files with prefix %s/%s',
+                              len(keys), self.bucket_dir, prefix)
+        return keys
+
+    def delete_files(self, keys: list):
+        """
+        Delete a list of files in the bucket directory
+
+        :param keys: keys of the files that should be deleted
+
+        returns:
+            keys: list of deleted keys
+        """
+        for key in keys:
+            # Missing files are skipped like missing objects by S3 delete_objects
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.path(key))
+        return keys
+
+    def log_fetch_histogram(self):
+        """
+        Local reads are not retried or hedged, there is no histogram to log
+        """
+
+    @instrumentation.instrument('local.write_df_to_s3')
+    def write_df_to_s3(self, data_frame: pd.DataFrame, key: str, file_format: str,
+                       part_size: int = None, max_concurrency: int = 4,
+                       options: WriteOptions = None):
+        """
+        Write pandas dataframe to the bucket directory
+        supported formats: .csv, .parquet
+
+        :data_frame: Pandas Dataframe that should be written
+        :key: target key of the saved file
+        :file_format: format of the saved file
+        :part_size: unused, files are always written in one piece
+        :max_concurrency: unused
+        :options: compression, row groups and sort order of the file, None -> defaults
+        """
+        # pylint: disable=unused-argument
+        if data_frame.empty:
+            self._logger.info('Dataframe is empty. No file to be written!')
+            return None
+        if file_format not in (S3FileTypes.CSV.value, S3FileTypes.PARQUET.value):
+            self._logger.info('Cannot write %s to S3. File format not supported!', file_format)
+            raise WrongFormatException
+        body = serialize_df(data_frame, file_format, options)
+        instrumentation.count(bytes_written=len(body), rows=len(data_frame))
+        self.__write_file(body, key)
+        return True
+
+    def __write_file(self, body: bytes, key: str):
+        """
+        Helper function writing a file atomically through a temporary file
+
+        :body: content of the file
+        :key: target key of the file
+        """
+        self._logger.info('Writing file to %s/%s', self.bucket_dir, key)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.')
+        with os.fdopen(file_descriptor, 'wb') as tmp_file:
+            tmp_file.write(body)
+        os.replace(tmp_path, path)
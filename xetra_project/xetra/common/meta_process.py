@@ -3,14 +3,19 @@ Methods for processing the meta file
 """
 
 import collections
-from datetime import datetime, timedelta
+from datetime import datetime
+from io import BytesIO
 
+import numpy as np
 import pandas as pd
 
-from xetra.common.s3 import S3BucketConnector
+from xetra.common.s3 import S3BucketConnector, update_object_conditional, serialize_df, parse_csv
 from xetra.common.constants import MetaProcessFormat
 from xetra.common.custom_exceptions import WrongMetaFileException
 
+# Segments of the parquet meta store before they are compacted into one
+META_MAX_SEGMENTS = 100
+META_SEGMENT_DATE_FORMAT = '%Y%m%d_%H%M%S_%f'
 
 
 class MetaProcess():
@@ -19,13 +24,51 @@ class MetaProcess():
     """
 
     @staticmethod
-    def update_meta_file(extract_date_list: list, meta_key: str, s3_bucket_meta: S3BucketConnector):
+    def read_meta_file(meta_key: str, s3_bucket_meta: S3BucketConnector):
+        """
+        Reading the meta file, a csv file or the segments of a parquet meta store
+
+        :param: meta_key -> key of the meta file on the S3 bucket,
+          keys ending with .parquet select the parquet meta store
+        :param: s3_bucket_meta -> S3BucketConnector for the bucket with the meta file
+
+        returns:
+          df_meta: DataFrame with the meta data, empty if no meta file exists
+        """
+        if meta_key.endswith(f'.{MetaProcessFormat.META_PARQUET_FILE_FORMAT.value}'):
+            segments = s3_bucket_meta.list_files_in_prefix(f'{meta_key}/')
+            if not segments:
+                return MetaProcess.__empty_meta()
+            df_meta = pd.concat([s3_bucket_meta.read_parquet_to_df(segment)
+                                 for segment in segments], ignore_index=True)
+            # Same representation as the csv meta file
+            df_meta[MetaProcessFormat.META_SOURCE_DATE_COL.value] = pd.to_datetime(
+                df_meta[MetaProcessFormat.META_SOURCE_DATE_COL.value])\
+                    .dt.strftime(MetaProcessFormat.META_DATE_FORMAT.value)
+            df_meta[MetaProcessFormat.META_PROCESS_COL.value] = pd.to_datetime(
+                df_meta[MetaProcessFormat.META_PROCESS_COL.value])\
+                    .dt.strftime(MetaProcessFormat.META_PROCESS_DATE_FORMAT.value)
+            return df_meta
+        try:
+            return s3_bucket_meta.read_csv_to_df(meta_key)
+        except s3_bucket_meta.exceptions.NoSuchKey:
+            return MetaProcess.__empty_meta()
+
+    @staticmethod
+    def update_meta_file(extract_date_list: list, meta_key: str, s3_bucket_meta: S3BucketConnector,
+                         df_meta: pd.DataFrame = None, conditional: bool = False):
         """
         Updating meta file with the processed Xetra dates and todays date as processed date
 
+        The csv meta file is rewritten with old and new rows, the parquet meta store
+        only gets a new segment with the new rows.
+
         :param: extract_date_list -> a list of dates that are extracted from the source
         :param: meta_key -> key of the meta file on the S3 bucket
         :param: s3_bucket_meta -> S3BucketConnector for the bucket with the meta file
+        :param: df_meta -> meta data already read with read_meta_file, read if None
+        :param: conditional -> rewrite the csv meta file with a conditional write that
+          is repeated until no other worker changed the file in between, df_meta is ignored
         """
 
         # Creating an empty DataFrame using the meta file column names
@@ -39,22 +82,104 @@ class MetaProcess():
         # Fill the processed column
         df_new[MetaProcessFormat.META_PROCESS_COL.value] = \
           datetime.today().strftime(MetaProcessFormat.META_PROCESS_DATE_FORMAT.value)
-        try:
-            # If meta file exists -> union DataFrame of old and new meta data is created
-            df_old = s3_bucket_meta.read_csv_to_df(meta_key)
-            if collections.Counter(df_old.columns) != collections.Counter(df_new.columns):
-                raise WrongMetaFileException
-            df_all = pd.concat([df_old, df_new])
-        except s3_bucket_meta.session.client('s3').exceptions.NoSuchKey:
-            # No meta file exists -> only the new data is used
-            df_all = df_new
+
+        if meta_key.endswith(f'.{MetaProcessFormat.META_PARQUET_FILE_FORMAT.value}'):
+            # Segments are separate objects, concurrent workers do not clobber each other
+            MetaProcess.__append_meta_segment(df_new, meta_key, s3_bucket_meta)
+            return True
+
+        if conditional:
+            update_object_conditional(
+                s3_bucket_meta, meta_key,
+                lambda body: serialize_df(MetaProcess.__union_meta(
+                    MetaProcess.__empty_meta() if body is None else parse_csv(BytesIO(body)),
+                    df_new), MetaProcessFormat.META_FILE_FORMAT.value))
+            return True
+
+        if df_meta is None:
+            df_meta = MetaProcess.read_meta_file(meta_key, s3_bucket_meta)
+        df_all = MetaProcess.__union_meta(df_meta, df_new)
 
         # Write data to S3
         s3_bucket_meta.write_df_to_s3(df_all, meta_key, MetaProcessFormat.META_FILE_FORMAT.value)
         return True
 
     @staticmethod
-    def return_date_list(first_date: str, meta_key: str, s3_bucket_meta: S3BucketConnector):
+    def __union_meta(df_meta: pd.DataFrame, df_new: pd.DataFrame):
+        """
+        Helper function for update_meta_file() adding the new rows to the meta data
+
+        :param: df_meta -> DataFrame with the existing meta data, empty if no meta file exists
+        :param: df_new -> DataFrame with the new meta rows
+        """
+        if df_meta.empty and df_meta.columns.empty:
+            # No meta file exists -> only the new data is used
+            return df_new
+        # If meta file exists -> union DataFrame of old and new meta data is created
+        if collections.Counter(df_meta.columns) != collections.Counter(df_new.columns):
+            raise WrongMetaFileException
+        return pd.concat([df_meta, df_new])
+
+    @staticmethod
+    def __append_meta_segment(df_new: pd.DataFrame, meta_key: str,
+                              s3_bucket_meta: S3BucketConnector):
+        """
+        Helper function for update_meta_file() writing the new rows as parquet segment
+
+        Segments store dates as date32 and timestamps, sorted by date. Once there
+        are more than META_MAX_SEGMENTS segments they are compacted into a new
+        segment and only the compacted segments are deleted, so segments appended
+        concurrently by other workers are kept.
+
+        :param: df_new -> DataFrame with the new meta rows
+        :param: meta_key -> key of the parquet meta store on the S3 bucket
+        :param: s3_bucket_meta -> S3BucketConnector for the bucket with the meta file
+        """
+        if df_new.empty:
+            return
+        segment_key = (
+            f'{meta_key}/{datetime.today().strftime(META_SEGMENT_DATE_FORMAT)}.'
+            f'{MetaProcessFormat.META_PARQUET_FILE_FORMAT.value}'
+        )
+        s3_bucket_meta.write_df_to_s3(MetaProcess.__to_segment(df_new), segment_key,
+                                      MetaProcessFormat.META_PARQUET_FILE_FORMAT.value)
+        segments = s3_bucket_meta.list_files_in_prefix(f'{meta_key}/')
+        if len(segments) > META_MAX_SEGMENTS:
+            df_all = pd.concat([s3_bucket_meta.read_parquet_to_df(segment)
+                                for segment in segments], ignore_index=True)
+            compacted_key = (
+                f'{meta_key}/{datetime.today().strftime(META_SEGMENT_DATE_FORMAT)}_compacted.'
+                f'{MetaProcessFormat.META_PARQUET_FILE_FORMAT.value}'
+            )
+            s3_bucket_meta.write_df_to_s3(MetaProcess.__to_segment(df_all), compacted_key,
+                                          MetaProcessFormat.META_PARQUET_FILE_FORMAT.value)
+            s3_bucket_meta.delete_files(segments)
+
+    @staticmethod
+    def __to_segment(df_meta: pd.DataFrame):
+        """
+        Helper function converting meta rows to the compact, date sorted segment layout
+
+        :param: df_meta -> DataFrame with meta rows
+        """
+        df_meta = pd.DataFrame({
+            MetaProcessFormat.META_SOURCE_DATE_COL.value: pd.to_datetime(
+                df_meta[MetaProcessFormat.META_SOURCE_DATE_COL.value]).dt.date,
+            MetaProcessFormat.META_PROCESS_COL.value: pd.to_datetime(
+                df_meta[MetaProcessFormat.META_PROCESS_COL.value])})
+        return df_meta.sort_values(by=[MetaProcessFormat.META_SOURCE_DATE_COL.value],
+                                   kind='stable').reset_index(drop=True)
+
+    @staticmethod
+    def __empty_meta():
+        """
+        Helper function returning a DataFrame without meta data
+        """
+        return pd.DataFrame()
+
+    @staticmethod
+    def return_date_list(first_date: str, meta_key: str, s3_bucket_meta: S3BucketConnector,
+                         df_meta: pd.DataFrame = None):
         """
         Create list of dates based on the input first_date and the already
         processed dates in the meta file
@@ -62,51 +187,79 @@ class MetaProcess():
         :param: first_date -> the earliest date Xetra data should be processed
         :param: meta_key -> key of the meta file on the S3 bucket
         :param: s3_bucket_meta -> S3BucketConnector for the bucket with the meta file
+        :param: df_meta -> meta data already read with read_meta_file, read if None
 
         returns:
           min_date: first date that should be processed
           return_date_list: list of all dates from min_date till today
         """
-        start = datetime.strptime(first_date,
-                                  MetaProcessFormat.META_DATE_FORMAT.value)\
-                                      .date() - timedelta(days=1)
-        today = datetime.today().date()
-        try:
-            # If meta file exists create return_date_list using content of meta file
-            df_meta = s3_bucket_meta.read_csv_to_df(meta_key)
-
-            # Creating a list of dates from first_date until today
-            dates = [start + timedelta(days=x) for x in range(0, (today - start).days + 1)]
-
-            # Creating set of all dates in meta file
-            src_dates = set(pd.to_datetime(
-              df_meta[MetaProcessFormat.META_SOURCE_DATE_COL.value]
-              ).dt.date)
-
-            #Store values unique to metafile as dates missing.
-            dates_missing = set(dates[1:]) - src_dates
-
-            if dates_missing:
-                # Determine the earliest date to extract
-                min_date = min(set(dates[1:]) - src_dates) - timedelta(days=1)
-
-                # Creating a list of dates from min_date until today
-                return_min_date = (min_date + timedelta(days=1))\
-                    .strftime(MetaProcessFormat.META_DATE_FORMAT.value)
-                return_dates = [
-                    date.strftime(MetaProcessFormat.META_DATE_FORMAT.value) \
-                        for date in dates if date >= min_date
-                        ]
-            else:
-                # Set ignore value for already processed dates
-                return_dates = []
-                return_min_date = datetime(9999, 1, 1).date()\
-                    .strftime(MetaProcessFormat.META_DATE_FORMAT.value)
-        except s3_bucket_meta.session.client('s3').exceptions.NoSuchKey:
+        if df_meta is None:
+            df_meta = MetaProcess.read_meta_file(meta_key, s3_bucket_meta)
+        # Dates from first_date - 1 day until today
+        dates = MetaProcess.__date_range(first_date)
+        if df_meta.empty and df_meta.columns.empty:
             # No meta file found -> creating a date list from first_date - 1 day untill today
-            return_min_date = first_date
-            return_dates = [
-              (start + timedelta(days=x)).strftime(MetaProcessFormat.META_DATE_FORMAT.value) \
-              for x in range(0, (today - start).days + 1)
-              ]
-        return return_min_date, return_dates
+            return first_date, np.datetime_as_string(dates, unit='D').tolist()
+        dates_missing = MetaProcess.__missing_dates(dates, df_meta)
+        if not dates_missing.size:
+            # Set ignore value for already processed dates
+            return datetime(9999, 1, 1).date()\
+                .strftime(MetaProcessFormat.META_DATE_FORMAT.value), []
+        # Creating a list of dates from the day before the earliest missing date until today
+        return_dates = dates[dates >= dates_missing[0] - 1]
+        return str(dates_missing[0]), np.datetime_as_string(return_dates, unit='D').tolist()
+
+    @staticmethod
+    def return_missing_date_spans(first_date: str, meta_key: str,
+                                  s3_bucket_meta: S3BucketConnector,
+                                  df_meta: pd.DataFrame = None):
+        """
+        Create the contiguous spans of dates since first_date missing in the meta file
+
+        :param: first_date -> the earliest date Xetra data should be processed
+        :param: meta_key -> key of the meta file on the S3 bucket
+        :param: s3_bucket_meta -> S3BucketConnector for the bucket with the meta file
+        :param: df_meta -> meta data already read with read_meta_file, read if None
+
+        returns:
+          spans: list of (first date, last date) tuples of the missing dates
+        """
+        if df_meta is None:
+            df_meta = MetaProcess.read_meta_file(meta_key, s3_bucket_meta)
+        dates = MetaProcess.__date_range(first_date)
+        if df_meta.empty and df_meta.columns.empty:
+            dates_missing = dates[1:]
+        else:
+            dates_missing = MetaProcess.__missing_dates(dates, df_meta)
+        if not dates_missing.size:
+            return []
+        # A new span starts wherever consecutive missing dates are more than a day apart
+        breaks = np.flatnonzero(np.diff(dates_missing) != np.timedelta64(1, 'D'))
+        starts = dates_missing[np.concatenate(([0], breaks + 1))]
+        ends = dates_missing[np.concatenate((breaks, [dates_missing.size - 1]))]
+        return list(zip(np.datetime_as_string(starts, unit='D').tolist(),
+                        np.datetime_as_string(ends, unit='D').tolist()))
+
+    @staticmethod
+    def __date_range(first_date: str):
+        """
+        Helper function returning the dates from first_date - 1 day until today
+
+        :param: first_date -> the earliest date Xetra data should be processed
+        """
+        start = np.datetime64(datetime.strptime(
+            first_date, MetaProcessFormat.META_DATE_FORMAT.value).date(), 'D') - 1
+        return np.arange(start, np.datetime64(datetime.today().date(), 'D') + 1)
+
+    @staticmethod
+    def __missing_dates(dates: np.ndarray, df_meta: pd.DataFrame):
+        """
+        Helper function returning the sorted dates after the first one missing in the meta data
+
+        :param: dates -> sorted dates from __date_range()
+        :param: df_meta -> DataFrame with the meta data
+        """
+        src_dates = np.unique(pd.to_datetime(
+          df_meta[MetaProcessFormat.META_SOURCE_DATE_COL.value]
+          ).to_numpy().astype('datetime64[D]'))
+        return np.setdiff1d(dates[1:], src_dates, assume_unique=True)
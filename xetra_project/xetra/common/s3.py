@@ -3,21 +3,404 @@ Connector and methods accessing S3
 """
 
 import os
+import json
+import contextlib
 import logging
-from io import StringIO, BytesIO
-from memory_profiler import profile
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import NamedTuple
 
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import csv as pa_csv
+
+from xetra.common import instrumentation
+from xetra.common.cache import LocalObjectCache
+from xetra.common.fetch import ResilientFetcher
+from xetra.common.constants import S3FileTypes, CsvEngine, CompressionTypes
+from xetra.common.custom_exceptions import WrongFormatException, ConditionalWriteException
+
+# S3 rejects multipart uploads with parts below 5 MiB, except for the last part
+MULTIPART_MIN_PART_SIZE = 5 * 2 ** 20
+# Rows serialised per chunk (parquet row group) of a multipart upload
+MULTIPART_CHUNK_ROWS = 100_000
+# Conditional PutObject parameters and their headers, not modeled by older botocore releases
+CONDITIONAL_PUT_HEADERS = {'IfNoneMatch': 'If-None-Match', 'IfMatch': 'If-Match'}
+# Error codes of a conditional write losing against another writer
+CONDITIONAL_WRITE_CONFLICTS = {'PreconditionFailed', 'ConditionalRequestConflict', 'NoSuchKey'}
+# Attempts of a conditional read-modify-write before giving up
+CONDITIONAL_WRITE_ATTEMPTS = 10
+
+
+class WriteOptions(NamedTuple):
+    """
+    Class for the layout of files written by write_df_to_s3
+
+    compression: parquet codec ('snappy', 'zstd', 'gzip' or 'none') or csv compression
+      ('gzip' or 'zstd'), None -> snappy for parquet, uncompressed csv
+    compression_level: level of the codec, None -> default level of the codec
+    row_group_size: rows per parquet row group, None -> pyarrow default
+    use_dictionary: dictionary encoding of the parquet columns
+    sort_by: columns the rows are sorted by before writing, None -> unsorted
+    """
+
+    compression: str = None
+    compression_level: int = None
+    row_group_size: int = None
+    use_dictionary: bool = True
+    sort_by: list = None
+
+    @property
+    def csv_compression(self):
+        """
+        CompressionTypes of a compressed csv file, None for uncompressed files
+
+        Raises WrongFormatException for codecs not supported for csv files.
+        """
+        if self.compression in (None, 'none'):
+            return None
+        if self.compression not in [compression.value for compression in CompressionTypes]:
+            raise WrongFormatException
+        return CompressionTypes(self.compression)
+
+    def parquet_kwargs(self):
+        """
+        Keyword arguments of the pyarrow parquet writer
+        """
+        return {'compression': self.compression or 'snappy',
+                'compression_level': self.compression_level,
+                'use_dictionary': self.use_dictionary}
+
+    def key_extension(self, file_format: str):
+        """
+        Extension of keys written with these options, e.g. 'csv.gz'
+
+        :param file_format: format of the written file
+        """
+        if file_format == S3FileTypes.CSV.value and self.csv_compression is not None:
+            return f'{file_format}{self.csv_compression.extension}'
+        return file_format
+
+
+def serialize_df(data_frame: pd.DataFrame, file_format: str, options: WriteOptions = None,
+                 header: bool = True):
+    """
+    Serialise a DataFrame into the content of a file
+
+    :param data_frame: Pandas DataFrame to be serialised
+    :param file_format: 'csv' or 'parquet'
+    :param options: layout of the file, None -> WriteOptions()
+    :param header: write the header line of a csv file
+
+    returns:
+        body: bytes of the file, compressed csv files as one gzip member or zstd frame
+    """
+    options = options or WriteOptions()
+    if options.sort_by:
+        data_frame = data_frame.sort_values(by=options.sort_by, kind='stable')
+    if file_format == S3FileTypes.CSV.value:
+        body = data_frame.to_csv(index=False, header=header).encode('utf-8')
+        if options.csv_compression is None:
+            return body
+        return pa.Codec(options.csv_compression.value,
+                        compression_level=options.compression_level)\
+            .compress(body, asbytes=True)
+    if file_format == S3FileTypes.PARQUET.value:
+        out_buffer = BytesIO()
+        data_frame.to_parquet(out_buffer, index=False, row_group_size=options.row_group_size,
+                              **options.parquet_kwargs())
+        return out_buffer.getvalue()
+    raise WrongFormatException
+
+
+def infer_compression(key: str):
+    """
+    Infer the compression of an object from the extension of its key
+
+    :param key: key of the object
+
+    returns:
+        compression: 'gzip', 'zstd' or None
+    """
+    for compression in CompressionTypes:
+        if key.endswith(compression.extension):
+            return compression.value
+    return None
+
+
+def parse_csv(data, encoding: str = 'utf-8', sep: str = ',', usecols: list = None,
+              dtype: dict = None, engine: str = CsvEngine.C.value, compression: str = None):
+    """
+    Parse a binary csv stream into a DataFrame
+
+    :param data: binary file-like object with the csv content
+    :param encoding: encoding of the data inside csv file
+    :param sep: separator of csv file
+    :param usecols: columns to be parsed, all columns if None
+    :param dtype: mapping of column name to dtype, inferred if None
+    :param engine: csv parser, 'c' (pandas) or 'pyarrow'
+    :param compression: 'gzip', 'zstd' or None
+
+    returns:
+        data-frame: Pandas Dataframe containing CSV file data
+    """
+    if compression:
+        # Decompress while parsing, pyarrow ships gzip and zstd codecs
+        if not isinstance(data, pa.NativeFile):
+            data = pa.PythonFile(data, mode='r')
+        data = pa.CompressedInputStream(data, compression)
+    if engine == CsvEngine.PYARROW.value:
+        data_frame = _read_csv_pyarrow(data, encoding, sep, usecols, dtype)
+    else:
+        data_frame = pd.read_csv(data, sep=sep, encoding=encoding,
+                                 usecols=usecols, dtype=dtype, engine=engine)
+    # Lexically sorted categories keep sorting and grouping in string order
+    for column in data_frame.select_dtypes(include='category'):
+        data_frame[column] = data_frame[column].cat.set_categories(
+            data_frame[column].cat.categories.sort_values())
+    return data_frame
+
+
+def _read_csv_pyarrow(data, encoding: str, sep: str, usecols: list, dtype: dict):
+    """
+    Helper function for parse_csv() parsing with pyarrow
+
+    Columns typed as category or string are kept as strings, so pyarrow
+    does not infer dates or times from them. Untyped date and time columns
+    become date32 and time32 columns.
+
+    :data: binary file-like object with the csv content
+    :encoding: encoding of the data inside csv file
+    :sep: separator of csv file
+    :usecols: columns to be parsed, all columns if None
+    :dtype: mapping of column name to dtype, inferred if None
+    """
+    dtype = dtype or {}
+    column_types = {}
+    for column, column_dtype in dtype.items():
+        if column_dtype == 'category':
+            column_types[column] = pa.dictionary(pa.int32(), pa.string())
+        elif column_dtype in ('str', 'string', 'object'):
+            column_types[column] = pa.string()
+        else:
+            column_types[column] = pa.from_numpy_dtype(np.dtype(column_dtype))
+    table = pa_csv.read_csv(
+        data,
+        read_options=pa_csv.ReadOptions(encoding=encoding),
+        parse_options=pa_csv.ParseOptions(delimiter=sep),
+        convert_options=pa_csv.ConvertOptions(include_columns=usecols,
+                                              column_types=column_types,
+                                              strings_can_be_null=True))
+    return table.to_pandas()
+
+
+def update_object_conditional(s3_bucket, key: str, update,
+                              max_attempts: int = CONDITIONAL_WRITE_ATTEMPTS):
+    """
+    Read-modify-write of an object that concurrent writers do not clobber
+
+    The object is written conditionally on the ETag it was read with and the
+    read-modify-write is repeated with a jittered backoff while other writers
+    change the object in between.
+
+    :param s3_bucket: S3BucketConnector or LocalBucketConnector with the object
+    :param key: key of the object
+    :param update: function from the current body, None if the object does not
+      exist, to the new body
+    :param max_attempts: read-modify-writes before ConditionalWriteException is raised
+
+    returns:
+      etag: ETag of the written object
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            body, etag = s3_bucket.read_object_with_etag(key)
+        except s3_bucket.exceptions.NoSuchKey:
+            body, etag = None, None
+        try:
+            return s3_bucket.write_object_conditional(update(body), key, etag)
+        except ConditionalWriteException:
+            if attempt == max_attempts:
+                raise
+            time.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** attempt)))
+    return None
+
+
+def _pop_conditional_params(params: dict, model, context: dict, **kwargs):
+    """
+    Helper function moving the conditional parameters of PutObject to the request
+    context if the installed botocore does not model them
+
+    Registered for before-parameter-build.s3.PutObject, so they pass the parameter validation.
+    """
+    # pylint: disable=unused-argument
+    for name, header in CONDITIONAL_PUT_HEADERS.items():
+        if name in params and name not in model.input_shape.members:
+            context.setdefault('conditional_headers', {})[header] = params.pop(name)
+
+
+def _add_conditional_headers(params: dict, context: dict, **kwargs):
+    """
+    Helper function adding the headers collected by _pop_conditional_params() to
+    the request, registered for before-call.s3.PutObject
+    """
+    # pylint: disable=unused-argument
+    params['headers'].update(context.get('conditional_headers', {}))
+
+
+class S3MultipartUpload():
+    """
+    Writable file-like object streaming its content to S3 as a multipart upload
+
+    Parts are uploaded in the background while the caller keeps writing. At most
+    max_concurrency parts are held in memory at once. The upload is completed
+    when the object is closed and aborted when the with block raises.
+    """
+    def __init__(self, client, bucket: str, key: str, part_size: int, max_concurrency: int):
+        """
+        Constructor for S3MultipartUpload
+
+        :param client: boto3 S3 client
+        :param bucket: S3 bucket name
+        :param key: target key of the object
+        :param part_size: bytes per part, at least 5 MiB except for the last part
+        :param max_concurrency: number of parts uploaded concurrently
+        """
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._part_size = max(part_size, MULTIPART_MIN_PART_SIZE)
+        self._buffer = bytearray()
+        self._position = 0
+        self._futures = []
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._upload_id = client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+        self.closed = False
+
+    @property
+    def parts(self):
+        """
+        Number of parts submitted so far
+        """
+        return len(self._futures)
+
+    def writable(self):
+        """
+        File-like interface, the object is write only
+        """
+        return True
+
+    def seekable(self):
+        """
+        File-like interface, the object is write only
+        """
+        return False
+
+    def tell(self):
+        """
+        Number of bytes written so far
+        """
+        return self._position
+
+    def flush(self):
+        """
+        File-like interface, parts are only uploaded once they are full
+        """
+
+    def write(self, data: bytes):
+        """
+        Buffer data and submit every full part for upload
+
+        :param data: bytes to be written
+        """
+        self._buffer += data
+        self._position += len(data)
+        while len(self._buffer) >= self._part_size:
+            self.__submit_part(bytes(self._buffer[:self._part_size]))
+            del self._buffer[:self._part_size]
+        return len(data)
+
+    def close(self):
+        """
+        Upload the remaining data as last part and complete the multipart upload
+        """
+        if self.closed:
+            return
+        if self._buffer or not self._futures:
+            self.__submit_part(bytes(self._buffer))
+            self._buffer = bytearray()
+        parts = [future.result() for future in self._futures]
+        self._executor.shutdown()
+        self._client.complete_multipart_upload(Bucket=self._bucket, Key=self._key,
+                                               UploadId=self._upload_id,
+                                               MultipartUpload={'Parts': parts})
+        self.closed = True
+
+    def abort(self):
+        """
+        Abort the multipart upload and discard the uploaded parts
+        """
+        self._executor.shutdown(cancel_futures=True)
+        self._client.abort_multipart_upload(Bucket=self._bucket, Key=self._key,
+                                            UploadId=self._upload_id)
+        self.closed = True
+
+    def __submit_part(self, data: bytes):
+        """
+        Helper function submitting one part, blocking while max_concurrency parts are in flight
+
+        :param data: content of the part
+        """
+        # Released by self.__upload_part() in the upload thread
+        self._slots.acquire()  # pylint: disable=consider-using-with
+        part_number = len(self._futures) + 1
+        self._futures.append(self._executor.submit(self.__upload_part, part_number, data))
+
+    def __upload_part(self, part_number: int, data: bytes):
+        """
+        Helper function uploading one part
+
+        :param part_number: number of the part starting with 1
+        :param data: content of the part
+        """
+        try:
+            response = self._client.upload_part(Bucket=self._bucket, Key=self._key,
+                                                UploadId=self._upload_id,
+                                                PartNumber=part_number, Body=data)
+            return {'ETag': response['ETag'], 'PartNumber': part_number}
+        finally:
+            self._slots.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+            return
+        try:
+            self.close()
+        except Exception:
+            self.abort()
+            raise
 
-from xetra.common.constants import S3FileTypes
-from xetra.common.custom_exceptions import WrongFormatException
 
 class S3BucketConnector():
     """
     Class for interacting with S3 buckets
     """
-    def __init__(self, access_key: str, secret_key: str, endpoint_url: str, bucket: str):
+    def __init__(self, access_key: str, secret_key: str, endpoint_url: str, bucket: str,
+                 cache: LocalObjectCache = None, session: boto3.Session = None,
+                 s3_resource=None, fetcher: ResilientFetcher = None):
         """
         Constructor (initialise attributes) for S3BucketConnector
 
@@ -25,16 +408,37 @@ class S3BucketConnector():
         :param secret_key: secretkey for accessing S3
         :param endpoint_url: endpoint url to S3
         :param bucket: S3 bucket name
+        :param cache: local cache for immutable objects read by read_csv_to_df, None -> no cache
+        :param session: shared boto3 session, a new session is created if None
+        :param s3_resource: shared S3 resource for endpoint_url, created from session if None
+        :param fetcher: retries and hedges the GETs of read_csv_to_df and read_parquet_to_df,
+            None -> single GETs streamed into the parser
         """
 
         self._logger = logging.getLogger(__name__)
         self.endpoint_url = endpoint_url
-        self.session = boto3.Session(aws_access_key_id=os.environ[access_key],
-                                     aws_secret_access_key=os.environ[secret_key])
-        self._s3 = self.session.resource(service_name='s3', endpoint_url=endpoint_url)
+        if session is None:
+            session = boto3.Session(aws_access_key_id=os.environ[access_key],
+                                    aws_secret_access_key=os.environ[secret_key])
+        self.session = session
+        if s3_resource is None:
+            s3_resource = self.session.resource(service_name='s3', endpoint_url=endpoint_url)
+        self._s3 = s3_resource
         self._bucket = self._s3.Bucket(bucket)
+        # Modeled exceptions of the client, e.g. exceptions.NoSuchKey
+        self.exceptions = self._s3.meta.client.exceptions
+        self._cache = cache
+        self.fetcher = fetcher
+        # ETags seen while listing, used as part of the cache key
+        self._etags = {}
+        # Conditional writes with botocore releases that do not model If-None-Match and If-Match
+        events = self._s3.meta.client.meta.events
+        events.register('before-parameter-build.s3.PutObject', _pop_conditional_params,
+                        unique_id='xetra-pop-conditional-params')
+        events.register('before-call.s3.PutObject', _add_conditional_headers,
+                        unique_id='xetra-add-conditional-headers')
 
-    @profile
+    @instrumentation.instrument('s3.list_files_in_prefix')
     def list_files_in_prefix(self, prefix: str):
         """
         List all files with a prefix on the the S3 bucket
@@ -44,17 +448,99 @@ class S3BucketConnector():
         returns:
             files: list of all files containing prefix in the key
         """
-        files = [obj.key for obj in self._bucket.objects.filter(Prefix=prefix)]
+        files = []
+        for obj in self._bucket.objects.filter(Prefix=prefix):
+            self._etags[obj.key] = obj.e_tag
+            files.append(obj.key)
+        return files
+
+    def list_files_in_range(self, first_prefix: str, last_prefix: str = None):
+        """
+        List all files from first_prefix up to the files starting with last_prefix
+        in a single paginated listing, e.g. all Xetra files of a date range
+
+        :param first_prefix: files sorting before first_prefix are skipped
+        :param last_prefix: files sorting after the files starting with last_prefix
+            are skipped, no upper bound if None
+
+        returns:
+            files: sorted list of all files in the range
+        """
+        files = []
+        for obj in self._bucket.objects.filter(Marker=first_prefix):
+            if last_prefix is not None and obj.key[:len(last_prefix)] > last_prefix:
+                break
+            self._etags[obj.key] = obj.e_tag
+            files.append(obj.key)
         return files
 
-    @profile
-    def read_csv_to_df(self, key: (str), encoding: str = 'utf-8', sep: str = ','):
+    def list_files_with_manifest(self, first_prefix: str, last_prefix: str, manifest_key: str,
+                                 s3_bucket_manifest: 'S3BucketConnector'):
+        """
+        List all files in a range using a persisted key manifest
+
+        The manifest holds the keys listed from its first prefix on and is refreshed
+        incrementally by listing only the keys after the last key it contains.
+        Keys sorting before first_prefix are dropped on every write, so the manifest
+        only grows with the range a run lists. Repeat runs cost one GET, one LIST
+        page and one PUT instead of one listing per prefix. Keys are expected to be
+        published in key order, as the Xetra files are.
+
+        :param first_prefix: files sorting before first_prefix are skipped
+        :param last_prefix: files sorting after the files starting with last_prefix are skipped
+        :param manifest_key: key of the manifest file
+        :param s3_bucket_manifest: S3BucketConnector for the bucket with the manifest file
+
+        returns:
+            files: sorted list of all files in the range
+        """
+        try:
+            manifest = s3_bucket_manifest.read_json_from_s3(manifest_key)
+        except s3_bucket_manifest.exceptions.NoSuchKey:
+            manifest = None
+        if manifest is None or first_prefix < manifest['first_prefix']:
+            # Full listing of the range when the manifest does not cover it
+            keys = self.list_files_in_range(first_prefix, last_prefix)
+            manifest = {'first_prefix': first_prefix}
+        else:
+            # Incremental listing after the last known key
+            new_keys = self.list_files_in_range(
+                manifest['last_key'] or manifest['first_prefix'], last_prefix)
+            # Keys before first_prefix are no longer needed by this or later runs
+            kept = [(key, etag) for key, etag in
+                    zip(manifest['keys'], manifest.get('etags', [None] * len(manifest['keys'])))
+                    if key >= first_prefix]
+            self._etags.update(kept)
+            keys = [key for key, _ in kept] + new_keys
+            if not new_keys and len(kept) == len(manifest['keys']):
+                manifest = None
+            else:
+                manifest['first_prefix'] = first_prefix
+        if manifest is not None:
+            manifest['last_key'] = keys[-1] if keys else None
+            manifest['keys'] = keys
+            manifest['etags'] = [self._etags.get(key) for key in keys]
+            s3_bucket_manifest.write_json_to_s3(manifest, manifest_key)
+        self._logger.info('Key manifest %s holds %s files.', manifest_key, len(keys))
+        return [key for key in keys
+                if key >= first_prefix and key[:len(last_prefix)] <= last_prefix]
+
+    @instrumentation.instrument('s3.read_csv_to_df')
+    def read_csv_to_df(self, key: (str), encoding: str = 'utf-8', sep: str = ',',
+                       usecols: list = None, dtype: dict = None,
+                       engine: str = CsvEngine.C.value, compression: str = 'infer'):
         """
         Read csv file from S3 bucket and return a dataframe
 
+        The object body is streamed into the parser without an intermediate copy.
+
         :param key: key of file to be read
         :encoding: encoding of the data inside csv file
         :sep: separator of csv file
+        :usecols: columns to be parsed, all columns if None
+        :dtype: mapping of column name to dtype, inferred if None
+        :engine: csv parser, 'c' (pandas) or 'pyarrow'
+        :compression: 'gzip', 'zstd', None or 'infer' from the key extension
 
         param prefix: prefix on the S3 bucket that should be filtered
 
@@ -62,13 +548,202 @@ class S3BucketConnector():
             data-frame: Pandas Dataframe containing CSV file data
         """
         self._logger.info('Reading file %s/%s/%s/', self.endpoint_url, self._bucket.name, key)
-        csv_obj = self._bucket.Object(key=key).get().get('Body').read().decode(encoding)
-        data = StringIO(csv_obj)
-        data_frame = pd.read_csv(data, sep=sep)
+        if compression == 'infer':
+            compression = infer_compression(key)
+        with self.__open_object(key) as body:
+            data_frame = parse_csv(body, encoding, sep, usecols, dtype, engine, compression)
+        instrumentation.count(rows=len(data_frame))
         return data_frame
 
-    @profile
-    def write_df_to_s3(self, data_frame: pd.DataFrame, key: str, file_format: str):
+    def __open_object(self, key: str):
+        """
+        Helper function for self.read_csv_to_df() opening an object as binary stream
+
+        With a cache the object is served from the local disk if its ETag is cached,
+        otherwise it is streamed into the cache first.
+
+        :key: key of the object
+        """
+        # The low-level client is thread-safe, unlike the bucket resource
+        client = self._bucket.meta.client
+        if self._cache is None:
+            if self.fetcher is not None:
+                body = self.__fetch_object(key)
+                instrumentation.count(bytes_read=len(body))
+                return BytesIO(body)
+            response = client.get_object(Bucket=self._bucket.name, Key=key)
+            instrumentation.count(bytes_read=response['ContentLength'])
+            return contextlib.closing(response.get('Body'))
+        etag = self._etags.get(key)
+        if etag is None:
+            etag = client.head_object(Bucket=self._bucket.name, Key=key)['ETag']
+            self._etags[key] = etag
+        path = self._cache.get(self._bucket.name, key, etag)
+        if path is not None:
+            try:
+                # Returned to the caller, who closes it
+                cached = open(path, 'rb')  # pylint: disable=consider-using-with
+                instrumentation.count(bytes_read=os.fstat(cached.fileno()).st_size)
+                return cached
+            except FileNotFoundError:
+                # Evicted between lookup and open
+                pass
+        if self.fetcher is not None:
+            cached = self._cache.put(self._bucket.name, key, etag,
+                                     BytesIO(self.__fetch_object(key, IfMatch=etag)))
+        else:
+            with contextlib.closing(client.get_object(Bucket=self._bucket.name, Key=key,
+                                                      IfMatch=etag).get('Body')) as body:
+                cached = self._cache.put(self._bucket.name, key, etag, body)
+        instrumentation.count(bytes_read=os.fstat(cached.fileno()).st_size)
+        return cached
+
+    def read_parquet_to_df(self, key: str):
+        """
+        Read parquet file from S3 bucket and return a dataframe
+
+        :param key: key of file to be read
+
+        returns:
+            data-frame: Pandas Dataframe containing parquet file data
+        """
+        self._logger.info('Reading file %s/%s/%s/', self.endpoint_url, self._bucket.name, key)
+        # Parquet needs a seekable file, the body is read into a single buffer
+        if self.fetcher is not None:
+            body = self.__fetch_object(key)
+        else:
+            body = self._bucket.meta.client.get_object(Bucket=self._bucket.name, Key=key)\
+                .get('Body').read()
+        return pd.read_parquet(BytesIO(body))
+
+    def __fetch_object(self, key: str, **kwargs):
+        """
+        Helper function reading the body of an object through self.fetcher
+
+        The body is read completely within every attempt, so a slow transfer
+        counts towards the latency an attempt is hedged after.
+
+        :key: key of the object
+        :kwargs: further arguments of get_object, e.g. IfMatch
+
+        returns:
+            body: content of the object
+        """
+        client = self._bucket.meta.client
+
+        def get_body():
+            """
+            Body of one GET read into memory
+            """
+            return client.get_object(Bucket=self._bucket.name, Key=key, **kwargs)['Body'].read()
+        return self.fetcher.fetch(get_body)
+
+    def log_fetch_histogram(self):
+        """
+        Log the latency histogram of the GETs of self.fetcher, if any
+        """
+        if self.fetcher is not None:
+            self.fetcher.log_histogram()
+
+    def read_json_from_s3(self, key: str):
+        """
+        Read a json object from the S3 bucket
+
+        :param key: key of the json object
+
+        returns:
+            data: deserialised json content
+        """
+        self._logger.info('Reading file %s/%s/%s/', self.endpoint_url, self._bucket.name, key)
+        body = self._bucket.meta.client.get_object(Bucket=self._bucket.name, Key=key)\
+            .get('Body')
+        return json.load(body)
+
+    def write_json_to_s3(self, data, key: str):
+        """
+        Write a json serialisable object to the S3 bucket
+
+        :param data: json serialisable object
+        :param key: target key of the saved file
+        """
+        self._logger.info('Writing file to %s/%s/%s/', self.endpoint_url, self._bucket.name, key)
+        self._bucket.put_object(Body=json.dumps(data, indent=2).encode('utf-8'), Key=key)
+        return True
+
+    def read_object_with_etag(self, key: str):
+        """
+        Read an object together with its ETag for a following conditional write
+
+        :param key: key of the object
+
+        returns:
+            body: content of the object
+            etag: ETag of the object
+        """
+        response = self._bucket.meta.client.get_object(Bucket=self._bucket.name, Key=key)
+        return response['Body'].read(), response['ETag']
+
+    def write_object_conditional(self, body: bytes, key: str, etag: str = None):
+        """
+        Write an object only if no other writer changed it since it was read
+
+        Uses the If-Match and If-None-Match preconditions of PutObject, the
+        write fails with ConditionalWriteException if the precondition fails.
+
+        :param body: content of the object
+        :param key: target key of the object
+        :param etag: ETag the object must still have, None -> the object must not exist
+
+        returns:
+            etag: ETag of the written object
+        """
+        self._logger.info('Writing file to %s/%s/%s/', self.endpoint_url, self._bucket.name, key)
+        condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+        try:
+            response = self._bucket.meta.client.put_object(Bucket=self._bucket.name, Key=key,
+                                                           Body=body, **condition)
+        except ClientError as error:
+            if error.response.get('Error', {}).get('Code') in CONDITIONAL_WRITE_CONFLICTS \
+                    or error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') \
+                    in (409, 412):
+                raise ConditionalWriteException(key) from error
+            raise
+        return response['ETag']
+
+    def delete_prefix(self, prefix: str):
+        """
+        Delete all objects with a prefix on the S3 bucket
+
+        :param prefix: prefix on the S3 bucket that should be deleted
+
+        returns:
+            keys: list of deleted keys
+        """
+        keys = self.delete_files(self.list_files_in_prefix(prefix))
+        if keys:
+            self._logger.info('Deleted %s files with prefix %s/%s/%s/',
+                              len(keys), self.endpoint_url, self._bucket.name, prefix)
+        return keys
+
+    def delete_files(self, keys: list):
+        """
+        Delete a list of objects on the S3 bucket
+
+        :param keys: keys of the objects that should be deleted
+
+        returns:
+            keys: list of deleted keys
+        """
+        # delete_objects accepts at most 1000 keys per request
+        for start in range(0, len(keys), 1000):
+            self._bucket.delete_objects(Delete={
+                'Objects': [{'Key': key} for key in keys[start:start + 1000]]})
+        return keys
+
+    @instrumentation.instrument('s3.write_df_to_s3')
+    def write_df_to_s3(self, data_frame: pd.DataFrame, key: str, file_format: str,
+                       part_size: int = None, max_concurrency: int = 4,
+                       options: WriteOptions = None):
         """
         Write pandas dataframe to S3 bucket
         supported formats: .csv, .parquet
@@ -76,33 +751,142 @@ class S3BucketConnector():
         :data_frame: Pandas Dataframe that should be written
         :key: target key of the saved file
         :file_format: format of the saved file
+        :part_size: bytes per part of a streaming multipart upload, single put if None
+        :max_concurrency: number of parts uploaded concurrently in a multipart upload
+        :options: compression, row groups and sort order of the file, None -> defaults
         """
         if data_frame.empty:
             self._logger.info('Dataframe is empty. No file to be written!')
             return None
 
-        if file_format == S3FileTypes.CSV.value:
-            out_buffer = StringIO()
-            data_frame.to_csv(out_buffer, index=False)
-            return self.__put_object(out_buffer,key)
+        if file_format not in (S3FileTypes.CSV.value, S3FileTypes.PARQUET.value):
+            self._logger.info('Cannot write %s to S3. File format not supported!', file_format)
+            raise WrongFormatException
+
+        if part_size:
+            return self.__write_df_multipart(data_frame, key, file_format,
+                                             part_size, max_concurrency, options)
+
+        instrumentation.count(rows=len(data_frame))
+        return self.__put_object(BytesIO(serialize_df(data_frame, file_format, options)), key)
+
+    def __write_df_multipart(self, data_frame: pd.DataFrame, key: str, file_format: str,
+                             part_size: int, max_concurrency: int, options: WriteOptions = None):
+        """
+        Helper function for self.write_df_to_s3() serialising the DataFrame
+        chunk by chunk into a streaming multipart upload
 
-        if file_format == S3FileTypes.PARQUET.value:
-            out_buffer = BytesIO()
-            data_frame.to_parquet(out_buffer, index=False)
-            return self.__put_object(out_buffer,key)
+        Every chunk of a compressed csv file is one gzip member or zstd frame,
+        every chunk of a parquet file one row group of options.row_group_size rows.
 
-        self._logger.info('Cannot write %s to S3. File format not supported!', file_format)
-        raise WrongFormatException
+        :data_frame: Pandas Dataframe that should be written
+        :key: target key of the saved file
+        :file_format: format of the saved file
+        :part_size: bytes per uploaded part
+        :max_concurrency: number of parts uploaded concurrently
+        :options: compression, row groups and sort order of the file, None -> defaults
+        """
+        options = options or WriteOptions()
+        self._logger.info('Writing file to %s/%s/%s/ as multipart upload',
+                          self.endpoint_url, self._bucket.name, key)
+        if options.sort_by:
+            data_frame = data_frame.sort_values(by=options.sort_by, kind='stable')
+        chunk_rows = options.row_group_size or MULTIPART_CHUNK_ROWS
+        chunks = (data_frame.iloc[start:start + chunk_rows]
+                  for start in range(0, len(data_frame), chunk_rows))
+        with S3MultipartUpload(self._bucket.meta.client, self._bucket.name, key,
+                               part_size, max_concurrency) as upload:
+            if file_format == S3FileTypes.CSV.value:
+                chunk_options = options._replace(sort_by=None)
+                for number, chunk in enumerate(chunks):
+                    upload.write(serialize_df(chunk, file_format, chunk_options,
+                                              header=number == 0))
+            else:
+                writer = None
+                for chunk in chunks:
+                    table = pa.Table.from_pandas(
+                        chunk, schema=writer.schema if writer else None, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(upload, table.schema,
+                                                  **options.parquet_kwargs())
+                    writer.write_table(table)
+                writer.close()
+        self._logger.info('Uploaded %s parts to %s/%s/%s/',
+                          upload.parts, self.endpoint_url, self._bucket.name, key)
+        instrumentation.count(bytes_written=upload.tell(), rows=len(data_frame))
+        return True
 
-    @profile
-    def __put_object(self, out_buffer: StringIO or BytesIO, key: str):
+    def __put_object(self, out_buffer: BytesIO, key: str):
         """
         Helper function for self.write_df_to_s3()
 
-        :out_buffer: StringIO | BytesIO that should be written
+        :out_buffer: BytesIO that should be written
         :key: target key of the saved file
         """
 
         self._logger.info('Writing file to %s/%s/%s/', self.endpoint_url, self._bucket.name, key)
-        self._bucket.put_object(Body=out_buffer.getvalue(), Key=key)
+        body = out_buffer.getvalue()
+        instrumentation.count(bytes_written=len(body))
+        self._bucket.put_object(Body=body, Key=key)
         return True
+
+
+class S3ConnectorFactory():
+    """
+    Class creating S3BucketConnectors that share one session and pooled clients
+    """
+    def __init__(self, access_key: str, secret_key: str, max_pool_connections: int = 10,
+                 connect_timeout: float = 60, read_timeout: float = 60,
+                 tcp_keepalive: bool = False):
+        """
+        Constructor for S3ConnectorFactory
+
+        :param access_key: accesskey for accessing S3
+        :param secret_key: secretkey for accessing S3
+        :param max_pool_connections: size of the HTTP connection pool of each client
+        :param connect_timeout: seconds until a connection attempt times out
+        :param read_timeout: seconds until a read from a connection times out
+        :param tcp_keepalive: enables TCP keep-alive on the pooled connections
+        """
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.session = boto3.Session(aws_access_key_id=os.environ[access_key],
+                                     aws_secret_access_key=os.environ[secret_key])
+        self.config = Config(max_pool_connections=max_pool_connections,
+                             connect_timeout=connect_timeout,
+                             read_timeout=read_timeout,
+                             tcp_keepalive=tcp_keepalive)
+        # One resource, and with it one client and connection pool, per endpoint
+        self._resources = {}
+        self._lock = threading.Lock()
+
+    def resource(self, endpoint_url: str):
+        """
+        Shared S3 resource for an endpoint, created on first use
+
+        :param endpoint_url: endpoint url to S3
+        """
+        with self._lock:
+            if endpoint_url not in self._resources:
+                self._resources[endpoint_url] = self.session.resource(
+                    service_name='s3', endpoint_url=endpoint_url, config=self.config)
+            return self._resources[endpoint_url]
+
+    def connector(self, endpoint_url: str, bucket: str, cache: LocalObjectCache = None,
+                  fetcher: ResilientFetcher = None):
+        """
+        Create a S3BucketConnector using the shared session and resource
+
+        :param endpoint_url: endpoint url to S3
+        :param bucket: S3 bucket name
+        :param cache: local cache for immutable objects read by read_csv_to_df, None -> no cache
+        :param fetcher: retries and hedges the GETs of the connector, None -> single GETs
+        """
+        return S3BucketConnector(access_key=self.access_key,
+                                 secret_key=self.secret_key,
+                                 endpoint_url=endpoint_url,
+                                 bucket=bucket,
+                                 cache=cache,
+                                 fetcher=fetcher,
+                                 session=self.session,
+                                 s3_resource=self.resource(endpoint_url))
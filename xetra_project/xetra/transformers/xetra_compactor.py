@@ -0,0 +1,267 @@
+"""
+Xetra Compaction Component
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import NamedTuple
+
+import pandas as pd
+
+from xetra.common import instrumentation
+from xetra.common.frames import concat_frames
+from xetra.common.s3 import S3BucketConnector, serialize_df
+from xetra.common.constants import S3FileTypes
+from xetra.transformers.xetra_transformer import XetraSourceConfig, XetraTargetConfig,\
+    DATASET_MANIFEST
+
+# Rows serialised to estimate the file size per row
+COMPACTION_SAMPLE_ROWS = 10000
+
+
+class XetraCompactionConfig(NamedTuple):
+    """
+    Class for compaction configuration data
+
+    cmp_prefix: prefix of the compacted files and their manifest, outside of trg_key
+    cmp_target_size_mb: target size of a compacted file in MiB
+    cmp_read_workers: number of report objects read concurrently
+    cmp_delete_sources: delete the report objects once they are compacted
+    """
+
+    cmp_prefix: str = 'report1/compacted/'
+    cmp_target_size_mb: int = 128
+    cmp_read_workers: int = 8
+    cmp_delete_sources: bool = False
+
+
+class XetraCompactor():
+    """
+    Merges the timestamped report objects written by XetraETL.load into
+    size-targeted files sorted by date
+
+    The manifest cmp_prefix/_manifest.json lists the compacted files with their
+    date ranges and the keys of the compacted report objects. A run only reads the
+    report objects missing in the manifest and rewrites the compacted files from
+    the first date they touch on, so earlier files stay untouched. Report objects
+    becoming visible after objects with later keys, e.g. of multipart uploads or
+    parallel backfill shards, are compacted by the next run.
+    """
+
+    def __init__(self, s3_bucket_trg: S3BucketConnector, src_args: XetraSourceConfig,
+                 trg_args: XetraTargetConfig, cmp_args: XetraCompactionConfig):
+        """
+        Constructor for XetraCompactor
+
+        :param s3_bucket_trg: connection to target S3 bucket with the report objects
+        :param src_args: NamedTouple class with source configuration data
+        :param trg_args: NamedTouple class with target configuration data
+        :param cmp_args: NamedTouple class with compaction configuration data
+        """
+        self._logger = logging.getLogger(__name__)
+        self.s3_bucket_trg = s3_bucket_trg
+        self.src_args = src_args
+        self.trg_args = trg_args
+        self.cmp_args = cmp_args
+        self.manifest_key = f'{self.cmp_args.cmp_prefix}{DATASET_MANIFEST}'
+
+    @instrumentation.instrument('compact')
+    def compact(self):
+        """
+        Compact the report objects added since the last compaction
+
+        Reprocessed ISIN-days keep the row of the latest report object. The
+        timestamp of trg_key_date_format in the keys orders the report objects
+        by processing time. Rows of report objects that became visible late, with
+        a key before the last compacted one, do not replace compacted rows.
+
+        :returns:
+          manifest: manifest of the compacted files
+        """
+        manifest = self._read_manifest()
+        keys = self._list_objects()
+        compacted_keys = set(manifest['compacted_keys'])
+        new_keys = [key for key in keys if key not in compacted_keys]
+        if not new_keys:
+            self._logger.info('No new report objects to compact.')
+            return manifest
+        self._logger.info('Compacting %s new report objects.', len(new_keys))
+        # Keys of deleted report objects drop out, they cannot reappear
+        manifest['compacted_keys'] = keys
+        manifest['compacted_objects'] += len(new_keys)
+        df_late, df_new = self._read_new_objects(new_keys, max(compacted_keys, default=None))
+        df_added = concat_frames([data_frame for data_frame in (df_late, df_new)
+                                  if not data_frame.empty])
+        if df_added.empty:
+            self._logger.info('New report objects are empty, no files rewritten.')
+            self.s3_bucket_trg.write_json_to_s3(manifest, self.manifest_key)
+            return manifest
+        rows_per_file = self._rows_per_file(df_added)
+        keep_files, rewrite_files = self._split_files(
+            manifest['files'], df_added[self.src_args.src_col_date].astype(str).min(),
+            rows_per_file)
+        data_frames = [df_late, self._read_objects([entry['key'] for entry in rewrite_files]),
+                       df_new]
+        data_frame = self._deduplicate(concat_frames(
+            [data_frame for data_frame in data_frames if not data_frame.empty]))
+        written_files = self._write_files(data_frame, rows_per_file)
+        # The manifest switches readers to the new files before anything is deleted
+        manifest['files'] = keep_files + written_files
+        self.s3_bucket_trg.write_json_to_s3(manifest, self.manifest_key)
+        written_keys = {entry['key'] for entry in written_files}
+        self.s3_bucket_trg.delete_files([entry['key'] for entry in rewrite_files
+                                         if entry['key'] not in written_keys])
+        if self.cmp_args.cmp_delete_sources:
+            self.s3_bucket_trg.delete_files(new_keys)
+        instrumentation.count(rows=len(data_frame))
+        self._logger.info('Compacted %s rows into %s files, %s files rewritten.',
+                          len(data_frame), len(written_files), len(rewrite_files))
+        return manifest
+
+    def _read_manifest(self):
+        """
+        Helper function reading the compaction manifest, an empty manifest before
+        the first compaction
+        """
+        try:
+            manifest = self.s3_bucket_trg.read_json_from_s3(self.manifest_key)
+        except self.s3_bucket_trg.exceptions.NoSuchKey:
+            return {'format': self.trg_args.trg_format, 'compacted_keys': [],
+                    'compacted_objects': 0, 'files': []}
+        if 'compacted_keys' not in manifest:
+            # Manifest with a watermark only, every report object up to it is compacted
+            last_key = manifest.pop('last_key')
+            manifest['compacted_keys'] = [key for key in self._list_objects()
+                                          if last_key is not None and key <= last_key]
+        return manifest
+
+    def _list_objects(self):
+        """
+        Helper function listing all report objects
+
+        :returns:
+          keys: keys of the report objects in processing order
+        """
+        prefix = self.trg_args.trg_key
+        return sorted(key for key in self.s3_bucket_trg.list_files_in_prefix(prefix)
+                      if key.startswith(prefix))
+
+    @staticmethod
+    def _split_files(files: list, first_new_date: str, rows_per_file: int):
+        """
+        Helper function splitting the compacted files into the files kept and the files
+        rewritten together with the new rows: the files from the first new date on
+        and an under-filled last file
+
+        :param files: manifest entries of the compacted files sorted by date
+        :param first_new_date: first date of the new rows
+        :param rows_per_file: target number of rows of a file
+
+        :returns:
+          keep_files: manifest entries of the files kept
+          rewrite_files: manifest entries of the files rewritten
+        """
+        keep_files = [entry for entry in files if entry['last_date'] < first_new_date]
+        if keep_files and keep_files[-1]['rows'] < rows_per_file:
+            keep_files.pop()
+        return keep_files, files[len(keep_files):]
+
+    def _read_new_objects(self, new_keys: list, last_compacted_key: str):
+        """
+        Helper function reading the new report objects, split at the last compacted one
+
+        :param new_keys: keys of the new report objects in processing order
+        :param last_compacted_key: last compacted report object, None before the first run
+
+        :returns:
+          df_late: rows of the new report objects with a key before last_compacted_key
+          df_new: rows of the other new report objects
+        """
+        late_keys = [key for key in new_keys
+                     if last_compacted_key is not None and key < last_compacted_key]
+        return self._read_objects(late_keys), self._read_objects(new_keys[len(late_keys):])
+
+    def _read_objects(self, keys: list):
+        """
+        Helper function reading report objects or compacted files concurrently
+
+        :param keys: keys of the files in processing order
+
+        :returns:
+          data_frame: Pandas DataFrame with the rows of all files in processing order
+        """
+        if not keys:
+            return pd.DataFrame()
+        with ThreadPoolExecutor(max_workers=self.cmp_args.cmp_read_workers) as executor:
+            data_frames = list(executor.map(self._read_object, keys))
+        data_frames = [data_frame for data_frame in data_frames if not data_frame.empty]
+        if not data_frames:
+            return pd.DataFrame()
+        return concat_frames(data_frames)
+
+    def _read_object(self, key: str):
+        """
+        Helper function reading one file in the target format
+
+        :param key: key of the file
+        """
+        if self.trg_args.trg_format == S3FileTypes.PARQUET.value:
+            return self.s3_bucket_trg.read_parquet_to_df(key)
+        return self.s3_bucket_trg.read_csv_to_df(key)
+
+    def _deduplicate(self, data_frame: pd.DataFrame):
+        """
+        Helper function keeping the latest row of every ISIN-day, sorted by date and ISIN
+
+        :param data_frame: Pandas DataFrame in processing order
+        """
+        keys = [self.src_args.src_col_date, self.src_args.src_col_isin]
+        return data_frame.drop_duplicates(subset=keys, keep='last')\
+            .sort_values(by=keys, kind='stable').reset_index(drop=True)
+
+    def _rows_per_file(self, data_frame: pd.DataFrame):
+        """
+        Helper function estimating the rows of a compacted file of cmp_target_size_mb
+        from a serialised sample
+
+        :param data_frame: Pandas DataFrame with report rows
+        """
+        sample = data_frame.head(COMPACTION_SAMPLE_ROWS)
+        sample_bytes = len(serialize_df(sample, self.trg_args.trg_format,
+                                        self.trg_args.write_options()))
+        return max(1, self.cmp_args.cmp_target_size_mb * 2 ** 20 * len(sample) // sample_bytes)
+
+    def _write_files(self, data_frame: pd.DataFrame, rows_per_file: int):
+        """
+        Helper function writing compacted files of about rows_per_file rows
+
+        Files are split between dates only, so every date is in exactly one file.
+
+        :param data_frame: Pandas DataFrame sorted by date
+        :param rows_per_file: target number of rows of a file
+
+        :returns:
+          files: manifest entries of the written files
+        """
+        dates = data_frame[self.src_args.src_col_date].astype(str)
+        # First row of every date and the rows up to it
+        date_starts = dates.ne(dates.shift()).to_numpy().nonzero()[0].tolist()
+        processed = datetime.today().strftime(self.trg_args.trg_key_date_format)
+        files = []
+        start = 0
+        for position, date_start in enumerate(date_starts[1:] + [len(data_frame)]):
+            if date_start - start < rows_per_file and position < len(date_starts) - 1:
+                continue
+            first_date, last_date = dates.iloc[start], dates.iloc[date_start - 1]
+            key = (f'{self.cmp_args.cmp_prefix}xetra_report1_{first_date}_{last_date}_'
+                   f'{processed}.{self.trg_args.key_extension()}')
+            self.s3_bucket_trg.write_df_to_s3(
+                data_frame.iloc[start:date_start].reset_index(drop=True), key,
+                self.trg_args.trg_format,
+                part_size=self.trg_args.trg_part_size_mb * 2 ** 20,
+                max_concurrency=self.trg_args.trg_upload_concurrency,
+                options=self.trg_args.write_options())
+            files.append({'key': key, 'rows': date_start - start,
+                          'first_date': first_date, 'last_date': last_date})
+            start = date_start
+        return files
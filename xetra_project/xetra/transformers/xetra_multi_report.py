@@ -0,0 +1,150 @@
+"""
+Xetra Multi Report Component
+"""
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+
+from xetra.common.s3 import S3BucketConnector
+from xetra.common.custom_exceptions import WrongConfigException
+from xetra.common.constants import ExtractMode
+from xetra.transformers.xetra_transformer import XetraETL, XetraSourceConfig, XetraTargetConfig
+
+
+class XetraReport(NamedTuple):
+    """
+    Class for a report of the report registry
+
+    transform: XetraETL method transforming the extracted DataFrame
+    transform_streaming: XetraETL method folding an iterable of source DataFrames
+    """
+
+    transform: Callable
+    transform_streaming: Callable
+
+
+# Registry of the reports XetraMultiReportETL can produce from one extract
+REPORTS = {
+    'report1': XetraReport(transform=XetraETL.transform_report1,
+                           transform_streaming=XetraETL.transform_report1_streaming)
+}
+
+
+class XetraReportConfig(NamedTuple):
+    """
+    Class for the configuration of one report of XetraMultiReportETL
+
+    report: name of the report in REPORTS
+    meta_key: key of the meta file of the report
+    trg_args: target configuration of the report
+    """
+
+    report: str
+    meta_key: str
+    trg_args: XetraTargetConfig
+
+
+class XetraMultiReportETL():
+    """
+    Produces several reports from a single extract of the Xetra source data
+    """
+
+    def __init__(self, s3_bucket_src: S3BucketConnector,
+                 s3_bucket_trg: S3BucketConnector, src_args: XetraSourceConfig,
+                 report_configs: list):
+        """
+        Constructor for XetraMultiReportETL
+
+        :param s3_bucket_src: connection to source S3 bucket
+        :param s3_bucket_trg: connection to target S3 bucket
+        :param src_args: NamedTouple class with source configuration data
+        :param report_configs: list of XetraReportConfig, one per report
+        """
+        self._logger = logging.getLogger(__name__)
+        # The shared extract runs in batch or streaming mode only, anything else
+        # would silently fall back to batch
+        if src_args.src_extract_mode not in (ExtractMode.BATCH.value,
+                                             ExtractMode.STREAMING.value):
+            raise WrongConfigException(f'src_extract_mode {src_args.src_extract_mode!r} is '
+                                       'not supported with several reports, use batch or '
+                                       'streaming')
+        if src_args.src_checkpoint_prefix:
+            raise WrongConfigException('src_checkpoint_prefix is not supported with several '
+                                       'reports')
+        self.src_args = src_args
+        # One XetraETL per report keeps the target and meta file of every report apart
+        self.reports = [(REPORTS[config.report],
+                         XetraETL(s3_bucket_src, s3_bucket_trg, config.meta_key,
+                                  src_args, config.trg_args))
+                        for config in report_configs]
+        # Every date list runs from its first date until today, so the longest list
+        # covers the dates of all reports
+        self._extractor = max((xetra_etl for _, xetra_etl in self.reports),
+                              key=lambda xetra_etl: len(xetra_etl.extract_date_list))
+
+    def etl_reports(self):
+        """
+        Extract the source data once, then transform and load every report
+
+        The extract runs in batch or streaming mode, other modes and checkpoints
+        are rejected by the constructor.
+        """
+        self._logger.info('Extracting Xetra source files once for %s reports.', len(self.reports))
+        if self.src_args.src_extract_mode == ExtractMode.STREAMING.value:
+            # One streaming pass feeding the streaming transformations of all reports
+            data_frames = self._fan_out(self._extractor.extract_iter())
+        else:
+            data_frame = self._extractor.extract()
+            data_frames = [report.transform(xetra_etl, data_frame)
+                           for report, xetra_etl in self.reports]
+        for (_, xetra_etl), data_frame in zip(self.reports, data_frames):
+            xetra_etl.load(data_frame)
+        return True
+
+    def _fan_out(self, source_frames):
+        """
+        Helper function passing every source DataFrame to the streaming
+        transformation of each report, each running in its own thread
+
+        :param source_frames: iterable of source DataFrames
+
+        :returns:
+          data_frames: list with the transformed DataFrame of each report
+        """
+        queues = [queue.Queue(maxsize=2) for _ in self.reports]
+        with ThreadPoolExecutor(max_workers=len(self.reports)) as executor:
+            futures = [executor.submit(report.transform_streaming, xetra_etl,
+                                       self._iter_queue(frame_queue))
+                       for (report, xetra_etl), frame_queue in zip(self.reports, queues)]
+            try:
+                for data_frame in source_frames:
+                    for frame_queue, future in zip(queues, futures):
+                        self._put(frame_queue, future, data_frame)
+            finally:
+                for frame_queue, future in zip(queues, futures):
+                    self._put(frame_queue, future, None)
+            return [future.result() for future in futures]
+
+    @staticmethod
+    def _put(frame_queue: queue.Queue, future, item):
+        """
+        Helper function for self._fan_out() putting an item into a bounded queue
+        unless its consumer has already stopped
+        """
+        while not future.done():
+            try:
+                frame_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    @staticmethod
+    def _iter_queue(frame_queue: queue.Queue):
+        """
+        Helper function for self._fan_out() yielding DataFrames until the None sentinel
+        """
+        data_frame = frame_queue.get()
+        while data_frame is not None:
+            yield data_frame
+            data_frame = frame_queue.get()
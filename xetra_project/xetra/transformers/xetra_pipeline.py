@@ -0,0 +1,221 @@
+"""
+Xetra Pipelined ETL Component
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from xetra.common import instrumentation
+from xetra.common.frames import concat_frames
+from xetra.common.constants import TargetLayout
+
+# Stages of the pipelined extract mode
+PIPELINE_STAGES = ('download', 'transform', 'upload')
+
+
+def _merge_intervals(intervals: list):
+    """
+    Merge overlapping (start, end) intervals into disjoint ones
+
+    :param intervals: list of (start, end) tuples
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class XetraPipelineMixin():
+    """
+    Pipelined extract mode of XetraETL overlapping download, transformation
+    and upload day by day
+
+    Mixed into XetraETL, whose extract, transform and load helpers it uses.
+    """
+
+    def etl_report1_pipelined(self):
+        """
+        Extract, transform and load report 1 day by day with the stages overlapping
+
+        A download thread reads the files of day N+1 while the calling thread
+        transforms day N and an upload thread writes day N-1. The stages are
+        connected by queues holding at most src_pipeline_depth days. Every day is
+        written to its own target file (date appended to the key) or partition,
+        the meta file is updated once all days are written.
+
+        :returns:
+          overlap: busy and overlapped seconds of every stage
+        """
+        files_by_date = self._list_source_files_by_date()
+        dates = [date for date in self.extract_date_list if date in files_by_date]
+        downloaded = queue.Queue(maxsize=self.src_args.src_pipeline_depth)
+        transformed = queue.Queue(maxsize=self.src_args.src_pipeline_depth)
+        stop = threading.Event()
+        busy = {stage: [] for stage in PIPELINE_STAGES}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            download = executor.submit(self._pipeline_download, dates, files_by_date,
+                                       downloaded, stop, busy['download'])
+            upload = executor.submit(self._pipeline_upload, transformed, stop, busy['upload'])
+            self._pipeline_transform(downloaded, transformed, stop, busy['transform'])
+            download.result()
+            partitions = upload.result()
+        wall_time = time.perf_counter() - start
+        self._update_dataset_manifest(partitions)
+        self._logger.info('Xetra target data successfully written.')
+        self._update_state_and_meta()
+        return self._report_overlap(busy, wall_time)
+
+    def _pipeline_download(self, dates: list, files_by_date: dict, downloaded: queue.Queue,
+                           stop: threading.Event, busy: list):
+        """
+        Helper function for self.etl_report1_pipelined() downloading one day at a time
+
+        :param dates: dates with source files in processing order
+        :param files_by_date: source file keys per date
+        :param downloaded: queue receiving (date, DataFrame) tuples, None at the end
+        :param stop: set once any stage failed
+        :param busy: receives the (start, end) time of every download
+        """
+        try:
+            for date in dates:
+                start = time.perf_counter()
+                data_frame = concat_frames(
+                    list(self._iter_source_files(files_by_date[date])))
+                busy.append((start, time.perf_counter()))
+                if not self._pipeline_put(downloaded, (date, data_frame), stop):
+                    return
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            self._pipeline_put(downloaded, None, stop)
+
+    def _pipeline_transform(self, downloaded: queue.Queue, transformed: queue.Queue,
+                            stop: threading.Event, busy: list):
+        """
+        Helper function for self.etl_report1_pipelined() transforming one day at a time
+
+        The last aggregated row of every ISIN is carried to the next day, so the
+        change to the previous closing price equals the one of transform_report1.
+
+        :param downloaded: queue with (date, DataFrame) tuples, None at the end
+        :param transformed: queue receiving (date, DataFrame) tuples, None at the end
+        :param stop: set once any stage failed
+        :param busy: receives the (start, end) time of every transformation
+        """
+        carry = None
+        try:
+            while True:
+                item = self._pipeline_get(downloaded, stop)
+                if item is None:
+                    return
+                date, data_frame = item
+                start = time.perf_counter()
+                data_frame = self._aggregate_report1(data_frame)
+                if carry is not None:
+                    data_frame = concat_frames([carry, data_frame])
+                carry = data_frame.drop_duplicates(subset=[self.src_args.src_col_isin],
+                                                   keep='last')
+                data_frame = self._finalize_report1(data_frame)
+                data_frame = data_frame[data_frame[self.src_args.src_col_date] == date]\
+                    .reset_index(drop=True)
+                busy.append((start, time.perf_counter()))
+                if not self._pipeline_put(transformed, (date, data_frame), stop):
+                    return
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            self._pipeline_put(transformed, None, stop)
+
+    def _pipeline_upload(self, transformed: queue.Queue, stop: threading.Event, busy: list):
+        """
+        Helper function for self.etl_report1_pipelined() writing one day at a time
+
+        :param transformed: queue with (date, DataFrame) tuples, None at the end
+        :param stop: set once any stage failed
+        :param busy: receives the (start, end) time of every upload
+
+        :returns:
+          partitions: manifest entries of the written dataset partitions
+        """
+        partitions = {}
+        try:
+            while True:
+                item = self._pipeline_get(transformed, stop)
+                if item is None:
+                    return partitions
+                date, data_frame = item
+                start = time.perf_counter()
+                if self.trg_args.trg_layout == TargetLayout.PARTITIONED.value:
+                    partitions.update(self._load_partitioned(data_frame))
+                else:
+                    self._load_file(data_frame, key_suffix=f'_{date}')
+                instrumentation.count(rows=len(data_frame))
+                busy.append((start, time.perf_counter()))
+        except BaseException:
+            stop.set()
+            raise
+
+    @staticmethod
+    def _pipeline_put(stage_queue: queue.Queue, item, stop: threading.Event):
+        """
+        Helper function putting an item into a pipeline queue unless a stage failed
+
+        :returns:
+          put: False if the pipeline was stopped
+        """
+        while not stop.is_set():
+            try:
+                stage_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _pipeline_get(stage_queue: queue.Queue, stop: threading.Event):
+        """
+        Helper function getting an item from a pipeline queue
+
+        :returns:
+          item: next item, None at the end or if a stage failed
+        """
+        while not stop.is_set():
+            try:
+                return stage_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _report_overlap(self, busy: dict, wall_time: float):
+        """
+        Helper function logging how much of the busy time of every pipeline stage
+        overlapped with the other stages
+
+        :param busy: (start, end) times per stage
+        :param wall_time: seconds of the whole pipeline
+
+        :returns:
+          overlap: busy and overlapped seconds of every stage
+        """
+        overlap = {}
+        for stage, intervals in busy.items():
+            others = [interval for other, other_intervals in busy.items() if other != stage
+                      for interval in other_intervals]
+            busy_time = sum(end - start for start, end in intervals)
+            overlapped = sum(max(0.0, min(end, other_end) - max(start, other_start))
+                             for start, end in intervals
+                             for other_start, other_end in _merge_intervals(others))
+            overlap[stage] = {'busy_s': busy_time, 'overlapped_s': overlapped}
+            self._logger.info('Pipeline stage %s: busy %.3f s, %.3f s (%.0f%%) overlapped '
+                              'with other stages.', stage, busy_time, overlapped,
+                              overlapped / busy_time * 100 if busy_time else 0)
+        self._logger.info('Pipeline finished in %.3f s for %.3f s of stage work.', wall_time,
+                          sum(stage['busy_s'] for stage in overlap.values()))
+        return overlap
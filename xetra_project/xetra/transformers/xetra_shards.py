@@ -0,0 +1,222 @@
+"""
+Xetra Backfill Shard Component
+"""
+import bisect
+import itertools
+from datetime import datetime, timedelta
+
+from xetra.common import instrumentation
+from xetra.common.lease import DateLeaseStore
+from xetra.common.meta_process import MetaProcess
+from xetra.common.constants import ExtractMode, TargetLayout, MetaProcessFormat
+
+
+class XetraShardMixin():
+    """
+    Backfill of XetraETL in date shards, run in parallel or coordinated
+    between several workers through leases
+
+    The shards reuse the extract, transform and load methods of XetraETL on
+    a narrowed date list.
+    """
+
+    def backfill_shards(self, shard_days: int):
+        """
+        Split the dates to process into contiguous shards within the spans of
+        dates missing in the meta file
+
+        Dates already in the meta file between two spans are not processed again.
+
+        :param shard_days: number of dates per shard
+
+        :returns:
+          shards: list of (first date, last date) tuples
+        """
+        return [(dates[start], dates[min(start + shard_days, len(dates)) - 1])
+                for dates in self._missing_span_dates()
+                for start in range(0, len(dates), shard_days)]
+
+    def _missing_span_dates(self):
+        """
+        Helper function splitting the dates to process at the gaps between the
+        contiguous spans of dates missing in the meta file
+
+        :returns:
+          span_dates: list of the sorted dates to process per missing span
+        """
+        spans = MetaProcess.return_missing_date_spans(
+            self.src_args.src_first_extract_date, self.meta_key, self.s3_bucket_trg,
+            df_meta=self._df_meta)
+        dates = self.meta_update_list
+        span_dates = []
+        for span_first, span_last in spans:
+            dates_span = dates[bisect.bisect_left(dates, span_first):
+                               bisect.bisect_right(dates, span_last)]
+            if dates_span:
+                span_dates.append(dates_span)
+        return span_dates
+
+    def etl_report1_shard(self, first_date: str, last_date: str):
+        """
+        Extract, transform and load report 1 for the dates of one backfill shard
+        without updating the meta file
+
+        The shard also extracts the day before first_date, so the change to the
+        previous closing price of first_date is computed like in a single run.
+        The closing state is neither used nor written by shards.
+        The target file key gets first_date appended.
+
+        :param first_date: first date of the shard
+        :param last_date: last date of the shard
+
+        :returns:
+          processed_dates: dates of the shard to be added to the meta file
+          partitions: manifest entries of the written dataset partitions
+        """
+        processed_dates, partitions, _ = self._etl_report1_shard(first_date, last_date)
+        return processed_dates, partitions
+
+    def _etl_report1_shard(self, first_date: str, last_date: str, key_suffix: str = ''):
+        """
+        Helper function for self.etl_report1_shard() also returning the written keys
+
+        :param first_date: first date of the shard
+        :param last_date: last date of the shard
+        :param key_suffix: appended to the written target file or partition files
+
+        :returns:
+          processed_dates: dates of the shard to be added to the meta file
+          partitions: manifest entries of the written dataset partitions
+          keys: keys of the written target files
+        """
+        start = datetime.strptime(first_date, MetaProcessFormat.META_DATE_FORMAT.value)\
+            - timedelta(days=1)
+        end = datetime.strptime(last_date, MetaProcessFormat.META_DATE_FORMAT.value)
+        self.extract_date = first_date
+        self.extract_date_list = [(start + timedelta(days=day))
+                                  .strftime(MetaProcessFormat.META_DATE_FORMAT.value)
+                                  for day in range((end - start).days + 1)]
+        self.meta_update_list = self.extract_date_list[1:]
+        self._previous_closing = None
+        if self.src_args.src_extract_mode == ExtractMode.STREAMING.value:
+            data_frame = self.transform_report1_streaming(self.extract_iter())
+        else:
+            data_frame = self.transform_report1(self.extract())
+        partitions = {}
+        if self.trg_args.trg_layout == TargetLayout.PARTITIONED.value:
+            partitions = self._load_partitioned(data_frame, file_suffix=key_suffix)
+            keys = [file['key'] for partition in partitions.values()
+                    for file in partition['files']]
+        else:
+            target_key = self._load_file(data_frame, key_suffix=f'_{first_date}{key_suffix}')
+            keys = [target_key] if target_key else []
+        self._logger.info('Xetra backfill shard %s to %s successfully written.',
+                          first_date, last_date)
+        return self.meta_update_list, partitions, keys
+
+    def merge_backfill_shards(self, shard_results: list):
+        """
+        Merge the results of all backfill shards into the dataset manifest and the
+        meta file with a single write each
+
+        :param shard_results: list of the return values of etl_report1_shard
+        """
+        processed_dates = sorted({date for dates, _ in shard_results for date in dates})
+        partitions = {}
+        for _, shard_partitions in shard_results:
+            partitions.update(shard_partitions)
+        self._update_dataset_manifest(partitions)
+        MetaProcess.update_meta_file(processed_dates, self.meta_key, self.s3_bucket_trg,
+                                     df_meta=self._df_meta)
+        self._logger.info('Xetra meta file successfully updated with %s backfilled dates.',
+                          len(processed_dates))
+        return True
+
+
+    def coordinated_shards(self, shard_days: int):
+        """
+        Split the dates to process into shards on a fixed grid of shard_days dates
+        starting at src_first_extract_date
+
+        Unlike backfill_shards the grid does not depend on the dates already
+        processed, so workers starting at different times name the shards alike.
+        Every span of dates missing in the meta file is split at the grid cells,
+        dates already processed within a cell are left out. The shard name is
+        the grid cell and the span, so a later run gets a new name for dates of
+        a cell missing then.
+
+        :param shard_days: number of dates of the grid per shard
+
+        :returns:
+          shards: list of (shard name, first date, last date) tuples, the first and
+            last date of a span within a grid cell that are still to be processed
+        """
+        date_format = MetaProcessFormat.META_DATE_FORMAT.value
+        first = datetime.strptime(self.src_args.src_first_extract_date, date_format)
+        shards = []
+        for dates in self._missing_span_dates():
+            for cell, cell_dates in itertools.groupby(
+                    dates, key=lambda date: (datetime.strptime(date, date_format)
+                                             - first).days // shard_days):
+                cell_dates = list(cell_dates)
+                cell_first = first + timedelta(days=cell * shard_days)
+                cell_last = cell_first + timedelta(days=shard_days - 1)
+                shards.append((f'{cell_first.strftime(date_format)}_'
+                               f'{cell_last.strftime(date_format)}/'
+                               f'{cell_dates[0]}_{cell_dates[-1]}',
+                               cell_dates[0], cell_dates[-1]))
+        return shards
+
+    @instrumentation.instrument('etl_report1_coordinated')
+    def etl_report1_coordinated(self, lease_store: DateLeaseStore, shard_days: int):
+        """
+        Extract, transform and load report 1 for the date shards claimed by this
+        worker out of several workers processing the same dates
+
+        Every shard of coordinated_shards is claimed through a lease of lease_store
+        and processed like a backfill shard, its files named after the worker. The
+        holder of the lease merges the dates into the meta file and the dataset
+        manifest with conditional writes and removes partition files of other
+        workers before it marks the lease done. A worker whose lease was taken
+        over deletes the files it wrote and leaves the shard to the new holder.
+
+        :param lease_store: DateLeaseStore with the leases of the shards
+        :param shard_days: number of dates of the grid per shard
+
+        :returns:
+          processed_dates: dates processed and merged into the meta file by this worker
+        """
+        processed_dates = []
+        key_suffix = f'_{lease_store.worker_id}'
+        for shard, first_date, last_date in self.coordinated_shards(shard_days):
+            lease = lease_store.claim(shard, first_date, last_date)
+            if lease is None:
+                continue
+            try:
+                dates, partitions, keys = self._etl_report1_shard(first_date, last_date,
+                                                                  key_suffix=key_suffix)
+            except Exception:
+                lease_store.release(lease)
+                raise
+            # The renewed lease covers the merge with a full lease_ttl_s
+            lease = lease_store.renew(lease)
+            if lease is None:
+                # The new holder writes the shard again
+                self.s3_bucket_trg.delete_files(keys)
+                self._logger.warning('Lost the lease of shard %s, deleted %s written files.',
+                                     shard, len(keys))
+                continue
+            self._update_dataset_manifest(partitions, conditional=True)
+            MetaProcess.update_meta_file(dates, self.meta_key, self.s3_bucket_trg,
+                                         conditional=True)
+            # Files of workers that lost the lease of these dates
+            self.s3_bucket_trg.delete_files(
+                [key for date in partitions
+                 for key in self.s3_bucket_trg.list_files_in_prefix(
+                     f'{self.trg_args.trg_dataset_prefix}date={date}/')
+                 if key not in keys])
+            lease_store.complete(lease)
+            processed_dates.extend(dates)
+        self._logger.info('Xetra coordinated worker %s processed %s dates.',
+                          lease_store.worker_id, len(processed_dates))
+        return processed_dates
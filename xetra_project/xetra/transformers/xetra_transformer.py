@@ -1,15 +1,34 @@
 """
 Xetra ETL Component
 """
+import json
 import logging
-from datetime import datetime
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from typing import NamedTuple
-from memory_profiler import profile
 
+import numpy as np
 import pandas as pd
 
-from xetra.common.s3 import S3BucketConnector
+from xetra.common import instrumentation
+from xetra.common.frames import concat_frames
+from xetra.common.s3 import S3BucketConnector, WriteOptions, update_object_conditional
 from xetra.common.meta_process import MetaProcess
+from xetra.common.custom_exceptions import WrongConfigException
+from xetra.common.constants import ExtractMode, TransformEngine, CsvEngine, TargetLayout,\
+    MetaProcessFormat, S3FileTypes
+from xetra.transformers.xetra_pipeline import XetraPipelineMixin
+from xetra.transformers.xetra_shards import XetraShardMixin
+
+# Helper columns of the partial aggregates used by the streaming transformation
+PARTIAL_COL_FIRST_TIME = 'first_time'
+PARTIAL_COL_LAST_TIME = 'last_time'
+# Manifest of the partitioned target dataset
+DATASET_MANIFEST = '_manifest.json'
+
 
 class XetraSourceConfig(NamedTuple):
     """
@@ -24,6 +43,17 @@ class XetraSourceConfig(NamedTuple):
     src_col_min_price: column name for minimum price in source
     src_col_max_price: column name for maximum price in source
     src_col_traded_vol: column name for daily traded volume in source
+    src_extract_workers: number of source files downloaded concurrently (1 -> sequential)
+    src_extract_mode: 'batch' concatenates all files, 'streaming' folds them file by file,
+      'pipelined' overlaps download, transformation and upload day by day
+    src_dtypes: mapping of source column name to dtype, e.g. 'category' or 'float32'
+    src_csv_engine: csv parser of the source files, 'c' or 'pyarrow'
+    src_key_manifest: key of the source key manifest in the target bucket, None -> no manifest
+    src_pipeline_depth: days buffered between the stages of the 'pipelined' extract mode
+    src_checkpoint_prefix: prefix in the target bucket for the partial aggregates of every
+      completed date of the 'batch' and 'streaming' modes, which then both fold the source
+      files date by date like 'streaming', None -> no checkpoints. The prefix is deleted
+      after a successful run, so it must be a non-empty directory ending with '/'
     """
 
     src_first_extract_date: str
@@ -35,6 +65,13 @@ class XetraSourceConfig(NamedTuple):
     src_col_min_price: str
     src_col_max_price: str
     src_col_traded_vol: str
+    src_extract_workers: int = 1
+    src_extract_mode: str = ExtractMode.BATCH.value
+    src_dtypes: dict = None
+    src_csv_engine: str = CsvEngine.C.value
+    src_key_manifest: str = None
+    src_pipeline_depth: int = 2
+    src_checkpoint_prefix: str = None
 
 class XetraTargetConfig(NamedTuple):
     """
@@ -52,6 +89,23 @@ class XetraTargetConfig(NamedTuple):
     trg_key: basic key of target file
     trg_key_date_format: date format of target file key
     trg_format: file format of the target file
+    trg_transform_engine: 'default' or 'single_pass' aggregation of report 1,
+        single_pass takes the first and last price of equal trade times in file order
+    trg_part_size_mb: part size of a streaming multipart upload in MiB, 0 -> single put
+    trg_upload_concurrency: number of parts uploaded concurrently
+    trg_layout: 'file' writes one file per run, 'partitioned' one partition per date
+    trg_dataset_prefix: prefix of the partitioned dataset
+    trg_isin_buckets: number of files per date partition bucketed by ISIN, 0 -> one file
+    trg_encoded: keep categorical ISIN and date columns until writing, parquet files
+      store them dictionary encoded
+    trg_state_key: key of the parquet file with the last opening price per ISIN,
+      replaces the extraction of the day before, None -> the day before is extracted
+    trg_compression: parquet codec ('snappy', 'zstd', 'gzip' or 'none') or csv compression
+      ('gzip' or 'zstd'), None -> snappy for parquet, uncompressed csv
+    trg_compression_level: level of the codec, None -> default level of the codec
+    trg_row_group_size: rows per parquet row group, None -> pyarrow default
+    trg_use_dictionary: dictionary encoding of the parquet columns
+    trg_sort_by: columns the rows of every target file are sorted by, None -> unsorted
     """
 
     trg_col_date: str
@@ -65,8 +119,37 @@ class XetraTargetConfig(NamedTuple):
     trg_key: str
     trg_key_date_format: str
     trg_format: str
+    trg_transform_engine: str = TransformEngine.DEFAULT.value
+    trg_part_size_mb: int = 0
+    trg_upload_concurrency: int = 4
+    trg_layout: str = TargetLayout.FILE.value
+    trg_dataset_prefix: str = 'report1/dataset/'
+    trg_isin_buckets: int = 0
+    trg_encoded: bool = False
+    trg_state_key: str = None
+    trg_compression: str = None
+    trg_compression_level: int = None
+    trg_row_group_size: int = None
+    trg_use_dictionary: bool = True
+    trg_sort_by: list = None
+
+    def write_options(self):
+        """
+        Layout of the written target files
+        """
+        return WriteOptions(compression=self.trg_compression,
+                            compression_level=self.trg_compression_level,
+                            row_group_size=self.trg_row_group_size,
+                            use_dictionary=self.trg_use_dictionary,
+                            sort_by=self.trg_sort_by)
 
-class XetraETL():
+    def key_extension(self):
+        """
+        Extension of the target keys, e.g. 'parquet' or 'csv.gz'
+        """
+        return self.write_options().key_extension(self.trg_format)
+
+class XetraETL(XetraPipelineMixin, XetraShardMixin):
     """
     Reads the Xetra data, transforms and writes output to target
     """
@@ -86,17 +169,62 @@ class XetraETL():
         """
 
         self._logger = logging.getLogger(__name__)
+        checkpoint_prefix = src_args.src_checkpoint_prefix
+        if checkpoint_prefix is not None \
+                and (not checkpoint_prefix.strip('/') or not checkpoint_prefix.endswith('/')):
+            # The checkpoint prefix is deleted after every run
+            raise WrongConfigException(f'src_checkpoint_prefix {checkpoint_prefix!r} must be '
+                                       'a non-empty prefix ending with /')
         self.s3_bucket_src = s3_bucket_src
         self.s3_bucket_trg = s3_bucket_trg
         self.meta_key = meta_key
         self.src_args = src_args
         self.trg_args = trg_args
+        # The meta data is read once and reused when the meta file is updated
+        self._df_meta = MetaProcess.read_meta_file(self.meta_key, self.s3_bucket_trg)
         self.extract_date,  self.extract_date_list = MetaProcess.return_date_list(
-            self.src_args.src_first_extract_date, self.meta_key, self.s3_bucket_trg)
+            self.src_args.src_first_extract_date, self.meta_key, self.s3_bucket_trg,
+            df_meta=self._df_meta)
+        # Closing state of the previous runs, the day before extract_date is only
+        # extracted if the state does not end on it
+        self._df_state, self._previous_closing = self._read_closing_state()
+        self._df_state_next = None
+        if self._previous_closing is not None:
+            self.extract_date_list = [date for date in self.extract_date_list
+                                      if date >= self.extract_date]
         self.meta_update_list = [date for date in self.extract_date_list\
             if date >= self.extract_date]
 
-    @profile
+    def _read_closing_state(self):
+        """
+        Helper function reading the closing state of trg_state_key
+
+        :returns:
+          df_state: Pandas DataFrame with the last row per ISIN, None if there is no state
+          previous_closing: opening prices of the day before extract_date by ISIN,
+            None if the state does not end on that day
+        """
+        if not self.trg_args.trg_state_key:
+            return None, None
+        try:
+            df_state = self.s3_bucket_trg.read_parquet_to_df(self.trg_args.trg_state_key)
+        except self.s3_bucket_trg.exceptions.NoSuchKey:
+            return None, None
+        if not self.extract_date_list:
+            return df_state, None
+        previous_date = (datetime.strptime(self.extract_date,
+                                           MetaProcessFormat.META_DATE_FORMAT.value)
+                         - timedelta(days=1)).strftime(MetaProcessFormat.META_DATE_FORMAT.value)
+        dates = df_state[self.src_args.src_col_date]
+        if dates.max() != previous_date:
+            self._logger.info('Closing state ends on %s, extracting %s.',
+                              dates.max(), previous_date)
+            return df_state, None
+        self._logger.info('Closing state of %s replaces its extraction.', previous_date)
+        return df_state, df_state[dates == previous_date]\
+            .set_index(self.src_args.src_col_isin)[self.trg_args.trg_col_op_price]
+
+    @instrumentation.instrument('extract')
     def extract(self):
         """
         Read and concatenate source data into master Pandas DataFrame
@@ -105,17 +233,129 @@ class XetraETL():
           data_frame: Pandas DataFrame with the extracted data
         """
         self._logger.info('Extracting Xetra source files started...')
-        files = [key for date in self.extract_date_list\
-                     for key in self.s3_bucket_src.list_files_in_prefix(date)]
+        files = self._list_source_files()
         if not files:
             data_frame = pd.DataFrame()
         else:
-            data_frame = pd.concat([self.s3_bucket_src.read_csv_to_df(file)\
-                for file in files], ignore_index=True)
+            data_frame = concat_frames(list(self._iter_source_files(files)))
+        instrumentation.count(rows=len(data_frame))
         self._logger.info('Extracting Xetra source files finished.')
         return data_frame
 
-    @profile
+    def extract_iter(self):
+        """
+        Read source data file by file without concatenating it
+
+        :yields:
+          data_frame: Pandas DataFrame with the content of one source file
+        """
+        self._logger.info('Extracting Xetra source files started...')
+        files = self._list_source_files()
+        if files:
+            yield from self._iter_source_files(files)
+        self._logger.info('Extracting Xetra source files finished.')
+
+    def _list_source_files(self):
+        """
+        Helper function listing all source files of self.extract_date_list
+
+        :returns:
+          files: list of source file keys in date order
+        """
+        if not self.extract_date_list:
+            return []
+        first_date, last_date = min(self.extract_date_list), max(self.extract_date_list)
+        if self.src_args.src_key_manifest:
+            return self.s3_bucket_src.list_files_with_manifest(
+                first_date, last_date, self.src_args.src_key_manifest, self.s3_bucket_trg)
+        # One paginated listing over the whole date range instead of one per date
+        return self.s3_bucket_src.list_files_in_range(first_date, last_date)
+
+    def _list_source_files_by_date(self):
+        """
+        Helper function listing the source files of self.extract_date_list per date
+
+        :returns:
+          files_by_date: dictionary of date to the list of its source file keys
+        """
+        files_by_date = {}
+        for key in self._list_source_files():
+            files_by_date.setdefault(key.split('/')[0], []).append(key)
+        return files_by_date
+
+    def _iter_source_files(self, files: list):
+        """
+        Helper function reading source files in the order of files
+
+        With src_extract_workers > 1 the files are downloaded concurrently,
+        holding at most src_extract_workers files in flight.
+
+        :param files: list of source file keys
+
+        :yields:
+          data_frame: Pandas DataFrame with the content of one source file
+        """
+        workers = self.src_args.src_extract_workers
+        latencies = []
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = deque()
+                for file in files:
+                    pending.append(executor.submit(self._read_source_file, file))
+                    if len(pending) >= workers:
+                        data_frame, latency = pending.popleft().result()
+                        latencies.append(latency)
+                        yield data_frame
+                while pending:
+                    data_frame, latency = pending.popleft().result()
+                    latencies.append(latency)
+                    yield data_frame
+        else:
+            for file in files:
+                data_frame, latency = self._read_source_file(file)
+                latencies.append(latency)
+                yield data_frame
+        self._logger.info('Read %s source files with %s worker(s): '
+                          'total %.3f s, mean %.3f s, max %.3f s per file.',
+                          len(latencies), workers, sum(latencies),
+                          sum(latencies) / len(latencies), max(latencies))
+        self.s3_bucket_src.log_fetch_histogram()
+
+    def _read_source_file(self, key: str):
+        """
+        Helper function reading one source file and timing the download
+
+        :param key: key of the source file
+
+        :returns:
+          data_frame: Pandas DataFrame with the content of the source file
+          latency: seconds spent reading the source file
+        """
+        start = time.perf_counter()
+        data_frame = self.s3_bucket_src.read_csv_to_df(key,
+                                                      usecols=self.src_args.src_columns,
+                                                      dtype=self._source_dtypes(),
+                                                      engine=self.src_args.src_csv_engine)
+        latency = time.perf_counter() - start
+        self._logger.debug('Source file %s read in %.3f s.', key, latency)
+        return data_frame, latency
+
+    def _source_dtypes(self):
+        """
+        Helper function returning the dtypes the source files are parsed with
+
+        pyarrow infers date32 and time32 columns from untyped dates and times, so
+        with the pyarrow engine the ISIN, date and time columns are read as strings
+        unless src_dtypes types them, like with the c engine.
+        """
+        dtypes = dict(self.src_args.src_dtypes or {})
+        if self.src_args.src_csv_engine == CsvEngine.PYARROW.value:
+            for column in (self.src_args.src_col_isin, self.src_args.src_col_date,
+                           self.src_args.src_col_time):
+                dtypes.setdefault(column, 'str')
+        return dtypes or None
+
+    @instrumentation.instrument('transform_report1')
     def transform_report1(self, data_frame: pd.DataFrame):
         """
         Applies the necessary transformation to create report 1
@@ -130,19 +370,45 @@ class XetraETL():
             return data_frame
         self._logger.info('Applying transformations to Xetra source data for report 1 started...')
 
+        data_frame = self._finalize_report1(self._aggregate_report1(data_frame))
+        instrumentation.count(rows=len(data_frame))
+        self._logger.info('Applying transformations to Xetra source data finished...')
+        return data_frame
+
+    def _aggregate_report1(self, data_frame: pd.DataFrame):
+        """
+        Helper function selecting the source columns and aggregating them per ISIN
+        and day with the configured trg_transform_engine
+
+        :param data_frame: Pandas DataFrame with source data
+        """
         # Filter necessary source columns
         data_frame = data_frame.loc[:, self.src_args.src_columns]
 
         # Removerows with missing values
         data_frame.dropna(inplace=True)
 
+        if self.trg_args.trg_transform_engine == TransformEngine.SINGLE_PASS.value:
+            return self._aggregate_report1_single_pass(data_frame)
+        return self._aggregate_report1_default(data_frame)
+
+    def _aggregate_report1_default(self, data_frame: pd.DataFrame):
+        """
+        Helper function aggregating the source data per ISIN and day
+        with one sort per opening and closing price
+
+        :param data_frame: Pandas DataFrame with the source columns and no missing values
+
+        :returns:
+          data_frame: Pandas DataFrame aggregated per ISIN and day
+        """
         # Calculate opening price per ISIN and day
         data_frame[self.trg_args.trg_col_op_price] = data_frame\
             .sort_values(by=[self.src_args.src_col_time])\
                 .groupby([
                     self.src_args.src_col_isin,
                     self.src_args.src_col_date
-                    ])[self.src_args.src_col_start_price]\
+                    ], observed=True)[self.src_args.src_col_start_price]\
                     .transform('first')
 
         # Calculate closing price per ISIN and day
@@ -151,7 +417,7 @@ class XetraETL():
                 .groupby([
                     self.src_args.src_col_isin,
                     self.src_args.src_col_date
-                    ])[self.src_args.src_col_start_price]\
+                    ], observed=True)[self.src_args.src_col_start_price]\
                         .transform('last')
 
         # Rename columns
@@ -164,19 +430,224 @@ class XetraETL():
         # Aggregate per ISIN and day
         data_frame = data_frame.groupby([
             self.src_args.src_col_isin,
-            self.src_args.src_col_date], as_index=False)\
+            self.src_args.src_col_date], as_index=False, observed=True)\
                 .agg({
                     self.trg_args.trg_col_op_price: 'min',
                     self.trg_args.trg_col_clos_price: 'min',
                     self.trg_args.trg_col_min_price: 'min',
                     self.trg_args.trg_col_max_price: 'max',
                     self.trg_args.trg_col_dail_trad_vol: 'sum'})
+        # Categorical groups come in order of appearance, not sorted
+        return data_frame\
+            .sort_values(by=[self.src_args.src_col_isin, self.src_args.src_col_date])\
+            .reset_index(drop=True)
+
+    def _aggregate_report1_single_pass(self, data_frame: pd.DataFrame):
+        """
+        Helper function aggregating the source data per ISIN and day
+        with a single sort and a single grouped aggregation
 
+        :param data_frame: Pandas DataFrame with the source columns and no missing values
+
+        :returns:
+          data_frame: Pandas DataFrame aggregated per ISIN and day
+        """
+        return data_frame\
+            .sort_values(by=[self.src_args.src_col_time], kind='stable')\
+            .groupby([self.src_args.src_col_isin, self.src_args.src_col_date],
+                     as_index=False, observed=True)\
+            .agg(**{
+                self.trg_args.trg_col_op_price: (self.src_args.src_col_start_price, 'first'),
+                self.trg_args.trg_col_clos_price: (self.src_args.src_col_start_price, 'last'),
+                self.trg_args.trg_col_min_price: (self.src_args.src_col_min_price, 'min'),
+                self.trg_args.trg_col_max_price: (self.src_args.src_col_max_price, 'max'),
+                self.trg_args.trg_col_dail_trad_vol: (self.src_args.src_col_traded_vol, 'sum')})\
+            .sort_values(by=[self.src_args.src_col_isin, self.src_args.src_col_date])\
+            .reset_index(drop=True)
+
+    @instrumentation.instrument('transform_report1_streaming')
+    def transform_report1_streaming(self, data_frames):
+        """
+        Applies the transformation of report 1 to a stream of source DataFrames
+
+        Every DataFrame is folded into partial aggregates per ISIN and day, so
+        memory scales with the number of ISIN-days instead of the source rows.
+        The result is identical to transform_report1 on the concatenated input.
+
+        :param data_frames: iterable of Pandas DataFrames as Input, e.g. self.extract_iter()
+
+        :returns:
+          data_frame: Transformed Pandas DataFrame as Output
+        """
+        return self._finalize_report1_partials(self._fold_report1_partials(data_frames))
+
+    @instrumentation.instrument('transform_report1_checkpointed')
+    def transform_report1_checkpointed(self):
+        """
+        Extracts and transforms report 1 date by date, storing the partial
+        aggregates of every completed date under src_checkpoint_prefix
+
+        The checkpoint manifest lists the source files of every checkpointed date.
+        A restart reuses the checkpoints of dates whose files did not change and
+        resumes with the first unfinished date. The result is identical to
+        transform_report1_streaming.
+
+        :returns:
+          data_frame: Transformed Pandas DataFrame as Output
+        """
+        prefix = self.src_args.src_checkpoint_prefix
+        manifest_key = f'{prefix}{DATASET_MANIFEST}'
+        try:
+            checkpoints = self.s3_bucket_trg.read_json_from_s3(manifest_key)
+        except self.s3_bucket_trg.exceptions.NoSuchKey:
+            checkpoints = {}
+        files_by_date = self._list_source_files_by_date()
+        dates = [date for date in self.extract_date_list if date in files_by_date]
+        partials = []
+        resumed = 0
+        for date in dates:
+            files = files_by_date[date]
+            checkpoint = checkpoints.get(date)
+            if checkpoint is not None and checkpoint['files'] == files:
+                resumed += 1
+                partial = self.s3_bucket_trg.read_parquet_to_df(checkpoint['key']) \
+                    if checkpoint['key'] else pd.DataFrame()
+            else:
+                partial = self._fold_report1_partials(self._iter_source_files(files))
+                if partial is None:
+                    partial = pd.DataFrame()
+                key = f'{prefix}{date}.{S3FileTypes.PARQUET.value}'
+                self.s3_bucket_trg.write_df_to_s3(partial, key, S3FileTypes.PARQUET.value)
+                checkpoints[date] = {'key': key if not partial.empty else None, 'files': files}
+                self.s3_bucket_trg.write_json_to_s3(checkpoints, manifest_key)
+            if not partial.empty:
+                partials.append(partial)
+        self._logger.info('Resumed %s of %s dates from checkpoints.', resumed, len(dates))
+        # Dates do not overlap, the partials of all dates are final aggregates
+        return self._finalize_report1_partials(
+            concat_frames(partials) if partials else None)
+
+    def _fold_report1_partials(self, data_frames):
+        """
+        Helper function folding source DataFrames into partial aggregates per ISIN and day
+
+        :param data_frames: iterable of Pandas DataFrames with source data
+
+        :returns:
+          partials: Pandas DataFrame with partial aggregates, None without source rows
+        """
+        partials = None
+        for data_frame in data_frames:
+            partial = self._aggregate_report1_partial(data_frame)
+            if partial.empty:
+                continue
+            partials = partial if partials is None \
+                else self._merge_report1_partials(concat_frames([partials, partial]))
+        return partials
+
+    def _finalize_report1_partials(self, partials: pd.DataFrame):
+        """
+        Helper function applying the report 1 transformations to merged partial aggregates
+
+        :param partials: Pandas DataFrame with partial aggregates, None without source rows
+
+        :returns:
+          data_frame: Transformed Pandas DataFrame as Output
+        """
+        if partials is None:
+            self._logger.info('The dataframe is empty. No transformations will be applied.')
+            return pd.DataFrame()
+        self._logger.info('Applying transformations to Xetra source data for report 1 started...')
+
+        # Bring the aggregates into the column layout of transform_report1
+        data_frame = partials\
+            .drop(columns=[PARTIAL_COL_FIRST_TIME, PARTIAL_COL_LAST_TIME])\
+            .sort_values(by=[self.src_args.src_col_isin, self.src_args.src_col_date])\
+            .reset_index(drop=True)
+
+        data_frame = self._finalize_report1(data_frame)
+        instrumentation.count(rows=len(data_frame))
+        self._logger.info('Applying transformations to Xetra source data finished...')
+        return data_frame
+
+    def _aggregate_report1_partial(self, data_frame: pd.DataFrame):
+        """
+        Helper function aggregating one source DataFrame per ISIN and day
+
+        :param data_frame: Pandas DataFrame with source data
+
+        :returns:
+          data_frame: Pandas DataFrame with first/last time and StartPrice,
+            minimum, maximum and summed volume per ISIN and day
+        """
+        if data_frame.empty:
+            return pd.DataFrame()
+        data_frame = data_frame.loc[:, self.src_args.src_columns].dropna()
+        return data_frame\
+            .sort_values(by=[self.src_args.src_col_time], kind='stable')\
+            .groupby([self.src_args.src_col_isin, self.src_args.src_col_date],
+                     as_index=False, sort=False, observed=True)\
+            .agg(**{
+                PARTIAL_COL_FIRST_TIME: (self.src_args.src_col_time, 'first'),
+                self.trg_args.trg_col_op_price: (self.src_args.src_col_start_price, 'first'),
+                PARTIAL_COL_LAST_TIME: (self.src_args.src_col_time, 'last'),
+                self.trg_args.trg_col_clos_price: (self.src_args.src_col_start_price, 'last'),
+                self.trg_args.trg_col_min_price: (self.src_args.src_col_min_price, 'min'),
+                self.trg_args.trg_col_max_price: (self.src_args.src_col_max_price, 'max'),
+                self.trg_args.trg_col_dail_trad_vol: (self.src_args.src_col_traded_vol, 'sum')})
+
+    def _merge_report1_partials(self, partials: pd.DataFrame):
+        """
+        Helper function merging concatenated partial aggregates into one row per ISIN and day
+
+        Ties in time are resolved in favour of the earlier row for the opening
+        and the later row for the closing price, as a stable sort would do.
+
+        :param partials: Pandas DataFrame with partial aggregates
+
+        :returns:
+          data_frame: Pandas DataFrame with merged partial aggregates
+        """
+        keys = [self.src_args.src_col_isin, self.src_args.src_col_date]
+        opening = partials.sort_values(by=[PARTIAL_COL_FIRST_TIME], kind='stable')\
+            .drop_duplicates(subset=keys, keep='first')\
+            [keys + [PARTIAL_COL_FIRST_TIME, self.trg_args.trg_col_op_price]]
+        closing = partials.sort_values(by=[PARTIAL_COL_LAST_TIME], kind='stable')\
+            .drop_duplicates(subset=keys, keep='last')\
+            [keys + [PARTIAL_COL_LAST_TIME, self.trg_args.trg_col_clos_price]]
+        totals = partials.groupby(keys, as_index=False, sort=False, observed=True).agg({
+            self.trg_args.trg_col_min_price: 'min',
+            self.trg_args.trg_col_max_price: 'max',
+            self.trg_args.trg_col_dail_trad_vol: 'sum'})
+        return opening.merge(closing, on=keys).merge(totals, on=keys)\
+            [list(partials.columns)]
+
+    def _finalize_report1(self, data_frame: pd.DataFrame):
+        """
+        Helper function for the report 1 transformations after aggregation per ISIN and day
+
+        :param data_frame: Pandas DataFrame aggregated per ISIN and day
+
+        :returns:
+          data_frame: Pandas DataFrame with change to previous day, rounded and
+            restricted to dates from self.extract_date
+        """
+        self._update_closing_state(data_frame)
+        # Sorting, grouping and filtering run on the codes of categorical key columns,
+        # their lexically sorted categories keep the string order
         # Percentage change current day's closing price compared previous day
-        data_frame[self.trg_args.trg_col_ch_prev_clos] = data_frame\
-            .sort_values(by=[self.src_args.src_col_date])\
-                .groupby([self.src_args.src_col_isin])[self.trg_args.trg_col_op_price]\
+        data_frame_sorted = data_frame.sort_values(by=[self.src_args.src_col_date])
+        previous = data_frame_sorted\
+                .groupby([self.src_args.src_col_isin], observed=True)\
+                    [self.trg_args.trg_col_op_price]\
                     .shift(1)
+        if self._previous_closing is not None:
+            # The first row of every ISIN continues from the closing state
+            first = previous.index[~data_frame_sorted[self.src_args.src_col_isin]
+                                   .duplicated().to_numpy()]
+            previous.loc[first] = data_frame.loc[first, self.src_args.src_col_isin].astype(str)\
+                .map(self._previous_closing).to_numpy()
+        data_frame[self.trg_args.trg_col_ch_prev_clos] = previous
         data_frame[self.trg_args.trg_col_ch_prev_clos] = (
             data_frame[self.trg_args.trg_col_op_price] \
             - data_frame[self.trg_args.trg_col_ch_prev_clos]
@@ -186,42 +657,224 @@ class XetraETL():
         data_frame = data_frame.round(decimals=2)
 
         # Remove the day before extract_date
-        data_frame = data_frame[data_frame.Date >= self.extract_date].reset_index(drop=True)
-        self._logger.info('Applying transformations to Xetra source data finished...')
+        dates = data_frame[self.src_args.src_col_date]
+        if isinstance(dates.dtype, pd.CategoricalDtype):
+            keep = np.asarray(dates.cat.categories >= self.extract_date)[dates.cat.codes]
+        else:
+            keep = dates >= self.extract_date
+        data_frame = data_frame[keep].reset_index(drop=True)
+
+        if not self.trg_args.trg_encoded:
+            # Decode categorical key columns to their string values
+            for column in [self.src_args.src_col_isin, self.src_args.src_col_date]:
+                if isinstance(data_frame[column].dtype, pd.CategoricalDtype):
+                    data_frame[column] = data_frame[column]\
+                        .astype(data_frame[column].cat.categories.dtype)
         return data_frame
 
-    @profile
+    def _update_closing_state(self, data_frame: pd.DataFrame):
+        """
+        Helper function merging the last row per ISIN of the aggregated report 1
+        rows into the closing state written by self.load()
+
+        :param data_frame: Pandas DataFrame aggregated per ISIN and day
+        """
+        if not self.trg_args.trg_state_key:
+            return
+        columns = [self.src_args.src_col_isin, self.src_args.src_col_date,
+                   self.trg_args.trg_col_op_price]
+        df_state = data_frame.loc[:, columns].astype({self.src_args.src_col_isin: str,
+                                                      self.src_args.src_col_date: str})
+        df_state_last = self._df_state if self._df_state_next is None else self._df_state_next
+        if df_state_last is not None:
+            df_state = pd.concat([df_state_last, df_state], ignore_index=True)
+        self._df_state_next = df_state\
+            .sort_values(by=[self.src_args.src_col_date], kind='stable')\
+            .drop_duplicates(subset=[self.src_args.src_col_isin], keep='last')\
+            .sort_values(by=[self.src_args.src_col_isin]).reset_index(drop=True)
+
+    def _write_closing_state(self):
+        """
+        Helper function writing the closing state updated by this run to trg_state_key
+        """
+        if self._df_state_next is None:
+            return
+        self.s3_bucket_trg.write_df_to_s3(self._df_state_next, self.trg_args.trg_state_key,
+                                          S3FileTypes.PARQUET.value)
+        self._logger.info('Xetra closing state of %s ISINs successfully written.',
+                          len(self._df_state_next))
+
+    @instrumentation.instrument('load')
     def load(self, data_frame: pd.DataFrame):
         """
         Saves Pandas DataFrame to the target
 
         :param data_frame: Pandas DataFrame as Input
         """
+        if self.trg_args.trg_layout == TargetLayout.PARTITIONED.value:
+            # Writing one partition per date to the target dataset
+            self._update_dataset_manifest(self._load_partitioned(data_frame))
+        else:
+            self._load_file(data_frame)
+        instrumentation.count(rows=len(data_frame))
+        self._logger.info('Xetra target data successfully written.')
+        self._update_state_and_meta()
+        return True
+
+    def _update_state_and_meta(self):
+        """
+        Helper function writing the closing state and the meta file once the
+        target data is written
+        """
+        # The state is written before the meta file, a run failing in between is
+        # repeated with the day before extracted
+        self._write_closing_state()
+        # Updating meta file
+        MetaProcess.update_meta_file(self.meta_update_list, self.meta_key, self.s3_bucket_trg,
+                                     df_meta=self._df_meta)
+        self._logger.info('Xetra meta file successfully updated.')
+
+    def _load_file(self, data_frame: pd.DataFrame, key_suffix: str = ''):
+        """
+        Helper function for self.load() writing the DataFrame to one target file
+
+        :param data_frame: Pandas DataFrame as Input
+        :param key_suffix: appended to the target key, keeps files of parallel shards apart
+
+        :returns:
+          target_key: key of the target file, None if nothing was written
+        """
         # Creating target key
         target_key = (
             f'{self.trg_args.trg_key}'
-            f'{datetime.today().strftime(self.trg_args.trg_key_date_format)}.'
-            f'{self.trg_args.trg_format}'
+            f'{datetime.today().strftime(self.trg_args.trg_key_date_format)}{key_suffix}.'
+            f'{self.trg_args.key_extension()}'
         )
         # Writing to target
-        self.s3_bucket_trg.write_df_to_s3(data_frame, target_key, self.trg_args.trg_format)
-        self._logger.info('Xetra target data successfully written.')
-        # Updating meta file
-        MetaProcess.update_meta_file(self.meta_update_list, self.meta_key, self.s3_bucket_trg)
-        self._logger.info('Xetra meta file successfully updated.')
-        return True
+        if not self.s3_bucket_trg.write_df_to_s3(
+                data_frame, target_key, self.trg_args.trg_format,
+                part_size=self.trg_args.trg_part_size_mb * 2 ** 20,
+                max_concurrency=self.trg_args.trg_upload_concurrency,
+                options=self.trg_args.write_options()):
+            return None
+        return target_key
+
+    def _load_partitioned(self, data_frame: pd.DataFrame, file_suffix: str = ''):
+        """
+        Helper function for self.load() writing a dataset partitioned by date
 
-    @profile
+        Every date is written to trg_dataset_prefix/date=YYYY-MM-DD/, split into
+        trg_isin_buckets files by a stable hash of the ISIN if configured. A rerun
+        of a date replaces only that partition.
+
+        :param data_frame: Pandas DataFrame as Input
+        :param file_suffix: appended to the file names, the partitions are then not
+            cleared before writing and the caller removes the files of other writers
+
+        :returns:
+          partitions: manifest entries of the written partitions by date
+        """
+        if data_frame.empty:
+            self._logger.info('Dataframe is empty. No file to be written!')
+            return {}
+        prefix = self.trg_args.trg_dataset_prefix
+        processed = datetime.today().strftime(MetaProcessFormat.META_PROCESS_DATE_FORMAT.value)
+        partitions = {}
+        for date, partition_frame in data_frame.groupby(self.src_args.src_col_date,
+                                                        observed=True):
+            partition = f'{prefix}date={date}/'
+            if not file_suffix:
+                # Overwrite the partition of reprocessed dates
+                self.s3_bucket_trg.delete_prefix(partition)
+            extension = f'{file_suffix}.{self.trg_args.key_extension()}'
+            if self.trg_args.trg_isin_buckets:
+                buckets = partition_frame[self.src_args.src_col_isin].map(
+                    lambda isin: zlib.crc32(str(isin).encode('utf-8'))
+                    % self.trg_args.trg_isin_buckets)
+                files = [(f'{partition}bucket-{bucket:03d}{extension}',
+                          bucket_frame.reset_index(drop=True))
+                         for bucket, bucket_frame in partition_frame.groupby(buckets,
+                                                                             observed=True)]
+            else:
+                files = [(f'{partition}part-000{extension}',
+                          partition_frame.reset_index(drop=True))]
+            for key, file_frame in files:
+                self.s3_bucket_trg.write_df_to_s3(
+                    file_frame, key, self.trg_args.trg_format,
+                    part_size=self.trg_args.trg_part_size_mb * 2 ** 20,
+                    max_concurrency=self.trg_args.trg_upload_concurrency,
+                    options=self.trg_args.write_options())
+            partitions[date] = {
+                'files': [{'key': key, 'rows': len(file_frame)} for key, file_frame in files],
+                'rows': len(partition_frame),
+                'processed': processed}
+        return partitions
+
+    def _update_dataset_manifest(self, partitions: dict, conditional: bool = False):
+        """
+        Helper function adding partitions to the manifest _manifest.json of the
+        partitioned dataset, which lists the files and row counts per partition
+
+        :param partitions: manifest entries of the written partitions by date
+        :param conditional: write the manifest with a conditional write that is repeated
+            until no other worker changed the manifest in between
+        """
+        if not partitions:
+            return
+        manifest_key = f'{self.trg_args.trg_dataset_prefix}{DATASET_MANIFEST}'
+
+        def add_partitions(manifest: dict):
+            """
+            Manifest with the partitions added, a new manifest if manifest is None
+            """
+            if manifest is None:
+                manifest = {'format': self.trg_args.trg_format,
+                            'isin_buckets': self.trg_args.trg_isin_buckets,
+                            'partitions': {}}
+            manifest['partitions'].update(partitions)
+            manifest['partitions'] = dict(sorted(manifest['partitions'].items()))
+            return manifest
+
+        if conditional:
+            update_object_conditional(
+                self.s3_bucket_trg, manifest_key,
+                lambda body: json.dumps(add_partitions(None if body is None else json.loads(body)),
+                                        indent=2).encode('utf-8'))
+            return
+        try:
+            manifest = self.s3_bucket_trg.read_json_from_s3(manifest_key)
+        except self.s3_bucket_trg.exceptions.NoSuchKey:
+            manifest = None
+        self.s3_bucket_trg.write_json_to_s3(add_partitions(manifest), manifest_key)
+
+    @instrumentation.instrument('etl_report1')
     def etl_report1(self):
         """
         Extract, transform and load to create report 1
         """
-        # Extraction
-        data_frame = self.extract()
+        if self.src_args.src_extract_mode == ExtractMode.PIPELINED.value:
+            # Download, transformation and upload overlapping day by day
+            self.etl_report1_pipelined()
+            return True
+        if self.src_args.src_checkpoint_prefix:
+            # Extraction and transformation date by date with a checkpoint per date
+            self._logger.info('Checkpoints below %s enabled, the %s extract mode folds the '
+                              'source files date by date.', self.src_args.src_checkpoint_prefix,
+                              self.src_args.src_extract_mode)
+            data_frame = self.transform_report1_checkpointed()
+        elif self.src_args.src_extract_mode == ExtractMode.STREAMING.value:
+            # Extraction and transformation file by file
+            data_frame = self.transform_report1_streaming(self.extract_iter())
+        else:
+            # Extraction
+            data_frame = self.extract()
 
-        # Transformation
-        data_frame = self.transform_report1(data_frame)
+            # Transformation
+            data_frame = self.transform_report1(data_frame)
 
         # Load
         self.load(data_frame)
+        if self.src_args.src_checkpoint_prefix:
+            # Checkpoints are only removed once target and meta file are written
+            self.s3_bucket_trg.delete_prefix(self.src_args.src_checkpoint_prefix)
         return True